@@ -0,0 +1,262 @@
+"""
+Bitplane grid backend for the SEQUENCE draw style.
+
+Keeps one bitmap per registered layer and column of the grid, stored as a Python
+int with bit y set if square (x, y) applies the layer. Painting a brush footprint
+ORs a stamp of the footprint into the layer's bitmap of each column it covers,
+and work done for the whole grid (specials, evaluation) is done once per group
+of squares with the same applied set, found by splitting each column with each
+of its bitmaps in turn. Either way the cost follows the number of layers and
+distinct sets, not the number of squares. Keeping a bitmap per column rather than
+one for the whole grid means a single square only ever touches ints of y bits.
+"""
+
+from __future__ import annotations
+import layer_util
+from layer_util import Layer, get_layers
+from layer_store import SequenceLayerStore
+from columnar_grid import ColumnarGrid, make_columnar_grid
+
+class BitplaneSequenceGrid(ColumnarGrid):
+    """
+    SEQUENCE squares as one bitmap per layer index and column.
+    Grid specials (see Grid.special) are caught up with for every square at once, one group of
+    squares with the same applied set at a time, so one epoch is enough for the whole grid.
+    """
+
+    def __init__(self, grid, x: int, y: int) -> None:
+        """
+        Args:
+        -grid: the owning Grid
+        -x, y: dimensions of the grid
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(L*x), L being the number of layer slots
+        """
+        ColumnarGrid.__init__(self, grid, x, y)
+        self.planes = [[0] * x for _ in range(len(layer_util.LAYERS))] #planes[layer index][x]
+        self.full = (1 << y) - 1 #every square of a column
+        self.special_epoch = grid.special_epoch
+        self.stamps = {} #(brush size, py) -> footprint, see stamp
+
+    def catch_up(self) -> None:
+        """
+        Apply the grid specials recorded since the last catch up to every square.
+        Every square missed the same specials, so squares with the same applied set end up with the same set.
+        Complexity:
+        - Worst: O(groups+G*min(missed, L)*(SequenceLayerStore.median_of+C)), G being the number of groups
+        and C the number of columns of a group
+        - Best: O(1), nothing was missed
+        """
+        missed = self.global_specials() - self.special_epoch
+        if missed == 0:
+            return
+        self.special_epoch = self.global_specials()
+        for mask, columns in self.groups():
+            remaining = mask
+            for _ in range(min(missed, mask.bit_count())):
+                remaining ^= 1 << SequenceLayerStore.median_of(remaining)
+            removed = mask ^ remaining
+            while removed:
+                lowest = removed & -removed #lowest set bit
+                plane = self.planes[lowest.bit_length()-1]
+                for x, bits in columns:
+                    plane[x] &= ~bits
+                removed ^= lowest
+
+    def groups(self):
+        """
+        The squares grouped by applied set.
+        Each column starts as a single group of all its squares and is split by every non empty bitmap of the column.
+        Args: None
+        Raises: None
+        Returns: list of (applied set, columns), the applied set being a mask as BSet.elems and columns a list
+        of (x, bitmap of the squares of column x in the group). Squares applying no layer are a group of mask 0
+        if there are any.
+        Complexity:
+        - Always O(catch_up+x*L*G) operations on ints of y bits, G being the number of groups in a column,
+        at most min(y, 2**L)
+        """
+        self.catch_up() #catch_up itself uses the groups, it has updated the epoch by then so this does nothing
+        groups = {} #applied set -> columns
+        if self.y == 0:
+            return []
+        for x in range(self.x):
+            column_groups = [(0, self.full)]
+            for index, plane in enumerate(self.planes):
+                column = plane[x]
+                if column == 0:
+                    continue
+                split = []
+                for mask, bits in column_groups:
+                    inside = bits & column
+                    if inside:
+                        split.append((mask | 1 << index, inside))
+                    if inside != bits:
+                        split.append((mask, bits ^ inside))
+                column_groups = split
+            for mask, bits in column_groups:
+                columns = groups.get(mask)
+                if columns is None:
+                    columns = groups[mask] = []
+                columns.append((x, bits))
+        return list(groups.items())
+
+    def buckets(self):
+        """
+        The squares grouped by applied set, for Grid.get_colors.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, list of flat indices) pairs
+        Complexity:
+        - Always O(groups+x*y) operations on ints of y bits, each set bit is visited once
+        """
+        buckets = []
+        for mask, columns in self.groups():
+            indices = []
+            for x, bits in columns:
+                base = x * self.y
+                while bits:
+                    lowest = bits & -bits #lowest set bit
+                    indices.append(base + lowest.bit_length() - 1)
+                    bits ^= lowest
+            buckets.append((SequenceLayerStore.program_of(mask), indices))
+        return buckets
+
+    def state_key(self, index: int) -> int:
+        """
+        The applied set of the square, as SequenceLayerStore.state_key.
+        """
+        self.catch_up()
+        return self.cell_mask(index)
+
+    def program_for(self, key) -> tuple:
+        return SequenceLayerStore.program_of(key)
+
+    def cell_mask(self, index: int) -> int:
+        """
+        Applied set of the square at the flat index, as BSet.elems.
+        Complexity:
+        - Always O(L) operations on ints of y bits
+        """
+        x, y = divmod(index, self.y)
+        mask = 0
+        for layer_index, plane in enumerate(self.planes):
+            if plane[x] >> y & 1:
+                mask |= 1 << layer_index
+        return mask
+
+    def add(self, index: int, layer: Layer) -> bool:
+        self.catch_up()
+        x, y = divmod(index, self.y)
+        plane = self.planes[layer.index]
+        if plane[x] >> y & 1:
+            return False
+        plane[x] |= 1 << y
+        self.notify(index)
+        return True
+
+    def erase(self, index: int, layer: Layer) -> bool:
+        self.catch_up()
+        x, y = divmod(index, self.y)
+        plane = self.planes[layer.index]
+        if not plane[x] >> y & 1:
+            return False
+        plane[x] &= ~(1 << y)
+        self.notify(index)
+        return True
+
+    def special(self, index: int) -> None:
+        self.catch_up()
+        mask = self.cell_mask(index)
+        if mask == 0:
+            return
+        x, y = divmod(index, self.y)
+        self.planes[SequenceLayerStore.median_of(mask)][x] &= ~(1 << y)
+        self.notify(index)
+
+    def layers(self, index: int):
+        self.catch_up()
+        all_layers = get_layers()
+        mask = self.cell_mask(index)
+        return [all_layers[layer_index] for layer_index in range(len(self.planes)) if mask >> layer_index & 1]
+
+    def compute_color(self, index: int, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Runs the program shared by every square with the same applied set, see SequenceLayerStore.program_of.
+        Complexity:
+        - Always O(L+SequenceLayerStore.program_of+S*apply), S being the number of steps
+        """
+        self.catch_up()
+        color = start
+        for step in SequenceLayerStore.program_of(self.cell_mask(index)):
+            color = step.apply(color, timestamp, x, y)
+        return color
+
+    def stamp(self, brush_size: int, px: int, py: int):
+        """
+        Bitmaps of the columns of the squares within manhattan distance brush_size of (px, py), clipped to the grid.
+        The bitmaps for a brush centred on column 0 are worked out once per brush size and row, then moved to column px.
+        Args:
+        -brush_size: the brush radius
+        -px, py: centre of the brush
+        Raises: None
+        Returns: list of (x, bitmap of column x), in order of x
+        Complexity:
+        - Always O(brush_size) operations on ints of y bits
+        """
+        key = (brush_size, py)
+        footprint = self.stamps.get(key)
+        if footprint is None:
+            footprint = []
+            for dx in range(-brush_size, brush_size + 1):
+                reach = brush_size - abs(dx)
+                low = max(0, py - reach)
+                high = min(self.y - 1, py + reach)
+                if low <= high:
+                    footprint.append((dx, ((1 << (high - low + 1)) - 1) << low))
+            self.stamps[key] = footprint
+        return [(px + dx, bits) for dx, bits in footprint if 0 <= px + dx < self.x]
+
+    def paint(self, layer: Layer, px: int, py: int, brush_size: int):
+        """
+        Add the layer to every square the brush covers with a single OR into the layer's bitmap of each column.
+        Args:
+        -layer: the layer being applied
+        -px, py: centre of the brush
+        -brush_size: the brush radius
+        Raises: None
+        Returns: list of (x, y) of the squares which changed, in order of x then y
+        Complexity:
+        - Always O(stamp+C*Grid.mark_dirty) plus operations on ints of y bits, C being the number of changed squares
+        """
+        self.catch_up()
+        plane = self.planes[layer.index]
+        cells = []
+        for x, footprint in self.stamp(brush_size, px, py):
+            changed = footprint & ~plane[x]
+            plane[x] |= footprint
+            while changed:
+                lowest = changed & -changed #lowest set bit, so squares come out in order of y
+                y = lowest.bit_length() - 1
+                cells.append((x, y))
+                self.notify(x * self.y + y)
+                changed ^= lowest
+        return cells
+
+def make_bitplane_grid(grid, draw_style, x, y) -> ColumnarGrid:
+    """
+    The bitplane backend for SEQUENCE grids. Other draw styles have no use for bitplanes and get the columnar backend.
+    Args:
+    -grid: the owning Grid
+    -draw_style: one of Grid.DRAW_STYLE_OPTIONS
+    -x, y: dimensions of the grid
+    Raises: Exception if the draw style is unknown
+    Returns: ColumnarGrid
+    Complexity:
+    - Always O(make_columnar_grid) or O(L)
+    """
+    if draw_style == 'SEQUENCE':
+        return BitplaneSequenceGrid(grid, x, y)
+    return make_columnar_grid(grid, draw_style, x, y)
@@ -0,0 +1,520 @@
+"""
+Columnar grid backend.
+
+Stores every square of a grid in a few flat typed arrays, one entry per square,
+instead of one LayerStore object per square:
+- SET: the index of the layer of each square and a bitmap of inverted squares.
+- SEQUENCE: the applied set of each square as a 32 bit mask.
+- ADD: the layers of every square in one flat array, each square owning a
+  segment of it (a CSR style ragged array which leaves room to grow).
+
+grid[x][y] gives a short lived view with the LayerStore interface,
+so the rest of the application does not need to know about the backend.
+Square (x, y) is entry x*Y + y of every array, so each column is contiguous.
+"""
+
+from __future__ import annotations
+from array import array
+from layer_util import Layer, get_layers, compile_layers, compile_runs
+from layer_store import SequenceLayerStore
+from data_structures.bset import BSet
+from layers import invert
+
+class CellView:
+    """
+    One square of a columnar grid, with the interface of a LayerStore.
+    Holds no state of its own, every call is forwarded to the columns.
+    """
+    __slots__ = ("columns", "index")
+
+    def __init__(self, columns: ColumnarGrid, index: int) -> None:
+        self.columns = columns
+        self.index = index
+
+    def add(self, layer: Layer) -> bool:
+        return self.columns.add(self.index, layer)
+
+    def erase(self, layer: Layer) -> bool:
+        return self.columns.erase(self.index, layer)
+
+    def special(self) -> None:
+        self.columns.special(self.index)
+
+    def layers(self):
+        return self.columns.layers(self.index)
+
+    def is_animated(self) -> bool:
+        return any(layer.time_dependent for layer in self.layers())
+
+    def time_key(self, timestamp, x, y):
+        keys = tuple(layer.time_key(timestamp, x, y) for layer in self.layers() if layer.time_dependent)
+        return keys if len(keys) > 0 else None
+
+    def state_key(self):
+        return self.columns.state_key(self.index)
+
+    def compiled_program(self) -> tuple:
+        return self.columns.program_for(self.columns.state_key(self.index))
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.columns.get_color(self.index, start, timestamp, x, y)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.columns.compute_color(self.index, start, timestamp, x, y)
+
+class ColumnView:
+    """
+    Column x of a columnar grid, so that grid[x][y] works as with the ArrayR of rows.
+    """
+    __slots__ = ("columns", "x")
+
+    def __init__(self, columns: ColumnarGrid, x: int) -> None:
+        self.columns = columns
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.columns.y
+
+    def __getitem__(self, y: int) -> CellView:
+        if not 0 <= y < self.columns.y:
+            raise IndexError("Grid index out of range")
+        return CellView(self.columns, self.x * self.columns.y + y)
+
+class ColumnarGrid:
+    """
+    Base of the columnar backends: maps views to flat indices and reports changes to the owning grid.
+    Subclasses implement add, erase, special, layers and compute_color for a flat index.
+    """
+
+    def __init__(self, grid, x: int, y: int) -> None:
+        """
+        Args:
+        -grid: the owning Grid, which keeps the dirty squares and the special epoch
+        -x, y: dimensions of the grid
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.grid = grid
+        self.x = x
+        self.y = y
+        self.size = x * y
+        self.programs = {} #state_key -> compiled program, see program_for
+        self.colors = {} #state_key -> (start, colour) of the states whose colour is the same everywhere and always, see get_color
+
+    def __len__(self) -> int:
+        return self.x
+
+    def __getitem__(self, x: int) -> ColumnView:
+        if not 0 <= x < self.x:
+            raise IndexError("Grid index out of range")
+        return ColumnView(self, x)
+
+    def notify(self, index: int) -> None:
+        """
+        Report that the square at the flat index changed.
+        Complexity:
+        - Always O(Grid.mark_dirty)
+        """
+        self.grid.mark_dirty(index // self.y, index % self.y)
+
+    def global_specials(self) -> int:
+        """
+        How many specials the owning grid has recorded, see Grid.special.
+        """
+        return self.grid.special_epoch
+
+    def buckets(self):
+        """
+        The squares grouped by state_key, for Grid.get_colors.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, list of flat indices) pairs, one per distinct state
+        Complexity:
+        - Always O(x*y*state_key+S*program_for), S being the number of distinct states
+        """
+        groups = {}
+        for index in range(self.size):
+            key = self.state_key(index)
+            cells = groups.get(key)
+            if cells is None:
+                cells = groups[key] = []
+            cells.append(index)
+        return [(self.program_for(key), cells) for key, cells in groups.items()]
+
+    def get_color(self, index: int, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        The colour of the square. The state key says everything the colour depends on apart from the start colour,
+        timestamp and position, so the colour of a state whose steps are all uniform and static is kept in colors
+        for every square in that state, rather than a colour per square. See LayerStore.get_color.
+        Complexity:
+        - Worst: O(state_key+program_for+S*apply), S being the number of steps of the square's program
+        - Best: O(state_key), the colour of the state is known
+        """
+        key = self.state_key(index)
+        start = tuple(start)
+        entry = self.colors.get(key)
+        if entry is not None and entry[0] == start:
+            return entry[1]
+        program = self.program_for(key)
+        color = start
+        for step in program:
+            color = step.apply(color, timestamp, x, y)
+        if all(step.uniform and not step.time_dependent for step in program):
+            self.colors[key] = (start, color)
+        return color
+
+    def program_for(self, key) -> tuple:
+        """
+        The compiled program of squares in the given state, remembered in programs.
+        Complexity:
+        - Worst: O(compile_layers(layers_for(key))), the first time the state is seen
+        - Best: O(1)
+        """
+        program = self.programs.get(key)
+        if program is None:
+            program = self.programs[key] = compile_layers(self.layers_for(key))
+        return program
+
+class ColumnarSetGrid(ColumnarGrid):
+    """
+    SET squares: a signed byte per square holding the layer index (-1 for none), and a bitmap of
+    the squares inverted by their own special. A grid special inverts every square, so instead of
+    touching the bitmap the parity of the grid's special epoch is applied on top of it.
+    """
+
+    def __init__(self, grid, x: int, y: int) -> None:
+        ColumnarGrid.__init__(self, grid, x, y)
+        self.layer = array("b", [-1]) * self.size
+        self.inverted = bytearray((self.size + 7) // 8)
+
+    def is_inverted(self, index: int) -> bool:
+        """
+        Whether the square's output is inverted.
+        Complexity:
+        - Always O(1)
+        """
+        return bool((self.inverted[index >> 3] >> (index & 7) & 1) ^ (self.global_specials() & 1))
+
+    def add(self, index: int, layer: Layer) -> bool:
+        if self.layer[index] == layer.index:
+            return False
+        self.layer[index] = layer.index
+        self.notify(index)
+        return True
+
+    def erase(self, index: int, layer: Layer) -> bool:
+        if self.layer[index] == -1:
+            return False
+        self.layer[index] = -1
+        self.notify(index)
+        return True
+
+    def special(self, index: int) -> None:
+        self.inverted[index >> 3] ^= 1 << (index & 7)
+        self.notify(index)
+
+    def layers(self, index: int):
+        """
+        The layer followed by invert if the square is inverted, as SetLayerStore.layers.
+        """
+        return self.layers_for(self.state_key(index))
+
+    def state_key(self, index: int):
+        """
+        (layer index or -1, inverted), all the colour of the square depends on.
+        """
+        return (self.layer[index], self.is_inverted(index))
+
+    def layers_for(self, key):
+        layer_index, inverted = key
+        layers = []
+        if layer_index != -1:
+            layers.append(get_layers()[layer_index])
+        if inverted:
+            layers.append(invert)
+        return layers
+
+    def compute_color(self, index: int, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Same colour as SetLayerStore.compute_color.
+        Complexity:
+        - Always O(apply)
+        """
+        color = start
+        if self.layer[index] != -1:
+            color = get_layers()[self.layer[index]].apply(color, timestamp, x, y)
+        if self.is_inverted(index):
+            color = invert.apply(color, timestamp, x, y)
+        return color
+
+class ColumnarSequenceGrid(ColumnarGrid):
+    """
+    SEQUENCE squares: the applied set of each square as a 32 bit mask, bit i standing for the layer with index i
+    (BSet.elems of a SequenceLayerStore). A grid special removes a different layer from each square,
+    so like a SequenceLayerStore each square records the special epoch it has caught up with.
+    """
+
+    def __init__(self, grid, x: int, y: int) -> None:
+        ColumnarGrid.__init__(self, grid, x, y)
+        self.mask = array("I", [0]) * self.size
+        self.epoch = array("I", [grid.special_epoch]) * self.size
+
+    def catch_up(self, index: int) -> None:
+        """
+        Apply the grid specials the square has missed, see LayerStore.catch_up.
+        Complexity:
+        - Worst: O(min(missed, N)*SequenceLayerStore.median_of), N being the number of applied layers
+        - Best: O(1), the square is up to date
+        """
+        missed = self.global_specials() - self.epoch[index]
+        if missed == 0:
+            return
+        self.epoch[index] = self.global_specials()
+        mask = self.mask[index]
+        for _ in range(min(missed, mask.bit_count())):
+            mask ^= 1 << SequenceLayerStore.median_of(mask)
+        self.mask[index] = mask
+
+    def add(self, index: int, layer: Layer) -> bool:
+        self.catch_up(index)
+        bit = 1 << layer.index
+        if self.mask[index] & bit:
+            return False
+        self.mask[index] |= bit
+        self.notify(index)
+        return True
+
+    def erase(self, index: int, layer: Layer) -> bool:
+        self.catch_up(index)
+        bit = 1 << layer.index
+        if not self.mask[index] & bit:
+            return False
+        self.mask[index] ^= bit
+        self.notify(index)
+        return True
+
+    def special(self, index: int) -> None:
+        self.catch_up(index)
+        mask = self.mask[index]
+        if mask == 0:
+            return
+        self.mask[index] = mask ^ (1 << SequenceLayerStore.median_of(mask))
+        self.notify(index)
+
+    def layers(self, index: int):
+        return self.layers_for(self.state_key(index))
+
+    def state_key(self, index: int):
+        """
+        The applied set, as SequenceLayerStore.state_key.
+        """
+        self.catch_up(index)
+        return self.mask[index]
+
+    def layers_for(self, key):
+        all_layers = get_layers()
+        return [all_layers[item-1] for item in BSet.from_mask(key)]
+
+    def program_for(self, key) -> tuple:
+        return SequenceLayerStore.program_of(key)
+
+    def compute_color(self, index: int, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Runs the program shared by every square with the same applied set, see SequenceLayerStore.program_of.
+        Complexity:
+        - Always O(SequenceLayerStore.program_of+S*apply), S being the number of steps
+        """
+        self.catch_up(index)
+        color = start
+        for step in SequenceLayerStore.program_of(self.mask[index]):
+            color = step.apply(color, timestamp, x, y)
+        return color
+
+class ColumnarAdditiveGrid(ColumnarGrid):
+    """
+    ADD squares: the layer indices of every square in one flat signed byte array.
+    Square i owns data[start[i] : start[i]+capacity[i]], used as a circular buffer of length[i]
+    layers beginning at offset front[i]. A full segment moves to the end of data with twice the capacity;
+    the space it leaves behind is reclaimed by compacting once it is more than half of data.
+
+    A square is reversed (see AdditiveLayerStore.special) when its own flipped bit differs
+    from the parity of the grid's special epoch, so a grid special is a single flip.
+    """
+    MIN_SEGMENT = 4 #capacity given to a square by its first add
+
+    def __init__(self, grid, x: int, y: int) -> None:
+        ColumnarGrid.__init__(self, grid, x, y)
+        self.data = array("b")
+        self.start = array("i", [0]) * self.size
+        self.capacity = array("i", [0]) * self.size
+        self.front = array("i", [0]) * self.size
+        self.length = array("i", [0]) * self.size
+        self.flipped = bytearray((self.size + 7) // 8)
+        self.garbage = 0 #entries of data no square owns any more
+
+    def is_backwards(self, index: int) -> bool:
+        """
+        Whether the square's layers are read from the end of its segment towards the front.
+        Complexity:
+        - Always O(1)
+        """
+        return bool((self.flipped[index >> 3] >> (index & 7) & 1) ^ (self.global_specials() & 1))
+
+    def add(self, index: int, layer: Layer) -> bool:
+        """
+        Add a layer after the square's others, see AdditiveLayerStore.add.
+        Complexity:
+        - O(1) amortised, O(N) when the segment of the square moves
+        """
+        length = self.length[index]
+        if length == self.capacity[index]:
+            self._move(index, max(self.MIN_SEGMENT, 2 * length))
+        capacity = self.capacity[index]
+        if self.is_backwards(index): #the rear is before the front
+            self.front[index] = (self.front[index] - 1) % capacity
+            self.data[self.start[index] + self.front[index]] = layer.index
+        else:
+            self.data[self.start[index] + (self.front[index] + length) % capacity] = layer.index
+        self.length[index] = length + 1
+        self.notify(index)
+        return True
+
+    def erase(self, index: int, layer: Layer) -> bool:
+        """
+        Remove the square's first layer, see AdditiveLayerStore.erase.
+        Complexity:
+        - Always O(1)
+        """
+        if self.length[index] == 0:
+            return False
+        if not self.is_backwards(index):
+            self.front[index] = (self.front[index] + 1) % self.capacity[index]
+        self.length[index] -= 1
+        self.notify(index)
+        return True
+
+    def special(self, index: int) -> None:
+        self.flipped[index >> 3] ^= 1 << (index & 7)
+        if self.length[index] > 1:
+            self.notify(index)
+
+    def layers(self, index: int):
+        """
+        The square's layers from first to last.
+        Complexity:
+        - Always O(N)
+        """
+        all_layers = get_layers()
+        start, front, capacity = self.start[index], self.front[index], self.capacity[index]
+        layers = [all_layers[self.data[start + (front + i) % capacity]] for i in range(self.length[index])]
+        if self.is_backwards(index):
+            layers.reverse()
+        return layers
+
+    def state_key(self, index: int):
+        """
+        The runs of the square's layers from the last opaque one onwards, the ones before are painted over,
+        as AdditiveLayerStore.state_key. Read from the last layer backwards, so the layers before are never read.
+        Returns: tuple of (layer index, count) pairs, an opaque run counting once
+        Complexity:
+        - Always O(N'), N' being the number of layers after the last opaque one
+        """
+        length = self.length[index]
+        start, front, capacity = self.start[index], self.front[index], self.capacity[index]
+        order = range(length) if self.is_backwards(index) else range(length - 1, -1, -1) #last layer first
+        all_layers = get_layers()
+        runs = []
+        for i in order:
+            layer_index = self.data[start + (front + i) % capacity]
+            if len(runs) > 0 and runs[-1][0] == layer_index:
+                if not all_layers[layer_index].opaque:
+                    runs[-1][1] += 1
+                continue
+            if len(runs) > 0 and all_layers[runs[-1][0]].opaque:
+                break
+            runs.append([layer_index, 1])
+        runs.reverse()
+        return tuple((layer_index, count) for layer_index, count in runs)
+
+    def layers_for(self, key):
+        all_layers = get_layers()
+        return [all_layers[layer_index] for layer_index, count in key for _ in range(count)]
+
+    def program_for(self, key) -> tuple:
+        """
+        The compiled program of squares with the given runs, remembered in programs.
+        Compiled from the runs, so a run of a pointwise layer costs O(log count) table compositions.
+        Complexity:
+        - Worst: O(compile_runs(key)), the first time the runs are seen
+        - Best: O(1)
+        """
+        program = self.programs.get(key)
+        if program is None:
+            all_layers = get_layers()
+            program = self.programs[key] = compile_runs([(all_layers[layer_index], count) for layer_index, count in key])
+        return program
+
+    def compute_color(self, index: int, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Runs the program shared by every square with the same runs, see program_for.
+        Complexity:
+        - Always O(state_key+program_for+S*apply), S being the number of steps
+        """
+        color = start
+        for step in self.program_for(self.state_key(index)):
+            color = step.apply(color, timestamp, x, y)
+        return color
+
+    def _move(self, index: int, capacity: int) -> None:
+        """
+        Give the square a new segment of the given capacity at the end of data, its layers starting at offset 0.
+        Complexity:
+        - Always O(capacity), O(size+len(data)) if data is compacted first
+        """
+        if self.garbage > len(self.data) // 2:
+            self._compact()
+        start, front, old_capacity, length = self.start[index], self.front[index], self.capacity[index], self.length[index]
+        segment = array("b", [-1]) * capacity
+        for i in range(length):
+            segment[i] = self.data[start + (front + i) % old_capacity]
+        self.garbage += old_capacity
+        self.start[index] = len(self.data)
+        self.capacity[index] = capacity
+        self.front[index] = 0
+        self.data.extend(segment)
+
+    def _compact(self) -> None:
+        """
+        Copy every segment, in order, into a new data array without the space no square owns.
+        Complexity:
+        - Always O(size+len(data))
+        """
+        data = array("b")
+        for index in range(self.size):
+            start, capacity = self.start[index], self.capacity[index]
+            self.start[index] = len(data)
+            data.extend(self.data[start:start + capacity])
+        self.data = data
+        self.garbage = 0
+
+def make_columnar_grid(grid, draw_style, x, y) -> ColumnarGrid:
+    """
+    The columnar backend for the draw style.
+    Args:
+    -grid: the owning Grid
+    -draw_style: one of Grid.DRAW_STYLE_OPTIONS
+    -x, y: dimensions of the grid
+    Raises: Exception if the draw style is unknown
+    Returns: ColumnarGrid
+    Complexity:
+    - Always O(x*y), a few array entries per square
+    """
+    if draw_style == 'SET':
+        return ColumnarSetGrid(grid, x, y)
+    elif draw_style == 'ADD':
+        return ColumnarAdditiveGrid(grid, x, y)
+    elif draw_style == 'SEQUENCE':
+        return ColumnarSequenceGrid(grid, x, y)
+    raise Exception('wrong draw style')
@@ -49,6 +49,24 @@ class ArraySortedList(SortedList[T]):
             # the list isn't empty and the item's position is wrong wrt. its neighbours
             raise IndexError('Element should be inserted in sorted order')
 
+    def __iter__(self):
+        """ Iterates over the items in sorted order, leaving the list unchanged. """
+        for i in range(len(self)):
+            yield self.array[i]
+
+    def __reversed__(self):
+        """ Iterates over the items in reverse sorted order, leaving the list unchanged. """
+        for i in range(len(self) - 1, -1, -1):
+            yield self.array[i]
+
+    def peek(self, index: int) -> ListItem:
+        """ Return the item at a given position, checking that it is in the list.
+        :raises IndexError: if there is no such position
+        """
+        if not 0 <= index < len(self):
+            raise IndexError('No such index in the list')
+        return self.array[index]
+
     def __contains__(self, item: ListItem):
         """ Checks if value is in the list. """
         for i in range(len(self)):
@@ -3,6 +3,8 @@
 """
 
 from __future__ import annotations
+import unittest
+from typing import Iterable, Iterator
 from data_structures.set_adt import Set
 
 class BSet(Set[int]):
@@ -18,6 +20,27 @@ class BSet(Set[int]):
         """ Initialization. """
         Set.__init__(self)
 
+    @classmethod
+    def from_mask(cls, mask: int) -> BSet:
+        """ Set whose bit-vector is mask, item i being in it if bit i-1 is set.
+        :raises TypeError: if mask is not a non-negative integer.
+        """
+        if not isinstance(mask, int) or mask < 0:
+            raise TypeError('Set mask should be a non-negative integer')
+        res = cls()
+        res.elems = mask
+        return res
+
+    @classmethod
+    def from_iterable(cls, items: Iterable[int]) -> BSet:
+        """ Set of the given items.
+        :raises TypeError: if an item is not integer or if not positive.
+        """
+        res = cls()
+        for item in items:
+            res.add(item)
+        return res
+
     def clear(self) -> None:
         """ Makes the set empty. """
         self.elems = 0
@@ -35,15 +58,20 @@ class BSet(Set[int]):
         return (self.elems >> (item - 1)) & 1
 
     def __len__(self) -> int:
+        """ Size computation, the number of set bits.
+        :complexity: O(1) for sets of machine word size, int.bit_count
         """
-        Size computation. The most expensive operation.
-        Use int.bit_length(your_integer) to calculate the bit length.
+        return self.elems.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        """ Iterates over the elements in increasing order.
+        :complexity: O(1) per element, only the set bits are visited
         """
-        res = 0
-        for item in range(1, int.bit_length(self.elems) + 1):
-            if item in self:
-                res += 1
-        return res
+        remaining = self.elems
+        while remaining:
+            lowest = remaining & -remaining # lowest set bit
+            yield lowest.bit_length()
+            remaining ^= lowest
 
     def add(self, item: int) -> None:
         """ Adds an element to the set.
@@ -65,6 +93,28 @@ class BSet(Set[int]):
         else:
             raise KeyError(item)
 
+    def add_unchecked(self, item: int) -> bool:
+        """ Adds an element to the set without checking its type.
+        :pre: item is a positive integer
+        :returns: True if the item was not in the set before
+        """
+        bit = 1 << (item - 1)
+        if self.elems & bit:
+            return False
+        self.elems |= bit
+        return True
+
+    def remove_unchecked(self, item: int) -> bool:
+        """ Removes an element from the set if it is there, without checking its type.
+        :pre: item is a positive integer
+        :returns: True if the item was in the set before
+        """
+        bit = 1 << (item - 1)
+        if not self.elems & bit:
+            return False
+        self.elems ^= bit
+        return True
+
     def union(self, other: BSet[int]) -> BSet[int]:
         """ Creates a new set equal to the union with another one,
         i.e. the result set should contains the elements of self and other.
@@ -93,15 +143,33 @@ class BSet(Set[int]):
 
     def __str__(self):
         """ Construct a nice string representation. """
-        bit_elems = self.elems
-        out_elems = []
-        current = 0
-        while bit_elems:
-            if bit_elems & (1 << current):
-                out_elems.append(str(current+1))
-                bit_elems &= ~(1 << current)
-            current += 1
-        return '{' + ', '.join(out_elems) + '}'
+        return '{' + ', '.join(str(item) for item in self) + '}'
+
+class TestBSet(unittest.TestCase):
+    """ Tests for BSet."""
+
+    def test_len_and_iter(self):
+        s = BSet.from_iterable([5, 1, 64, 200, 5])
+        self.assertEqual(len(s), 4)
+        self.assertEqual(list(s), [1, 5, 64, 200])
+        self.assertEqual(str(s), '{1, 5, 64, 200}')
+        self.assertEqual(list(BSet()), [])
+        self.assertEqual(len(BSet()), 0)
+
+    def test_from_mask(self):
+        s = BSet.from_mask(0b101001)
+        self.assertEqual(list(s), [1, 4, 6])
+        self.assertRaises(TypeError, BSet.from_mask, -1)
+        self.assertRaises(TypeError, BSet.from_iterable, [1, 0])
+
+    def test_unchecked(self):
+        s = BSet()
+        self.assertTrue(s.add_unchecked(3))
+        self.assertFalse(s.add_unchecked(3))
+        self.assertIn(3, s)
+        self.assertFalse(s.remove_unchecked(2))
+        self.assertTrue(s.remove_unchecked(3))
+        self.assertTrue(s.is_empty())
 
 if __name__ == '__main__':
     s = BSet(3)
@@ -93,6 +93,30 @@ class CircularQueue(Queue[T]):
         """ True if the queue is full and no element can be appended. """
         return len(self) == len(self.array)
 
+    def peek(self, index: int = 0) -> T:
+        """ Returns the element `index` places behind the front, without serving anything.
+        peek() is the element serve would return.
+        :complexity: O(1)
+        :raises IndexError: if there is no such element
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Queue index out of range")
+        return self.array[(self.front + index) % len(self.array)]
+
+    def __iter__(self):
+        """ Iterates over the elements from front to rear, leaving the queue unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(len(self)):
+            yield self.array[(self.front + index) % len(self.array)]
+
+    def __reversed__(self):
+        """ Iterates over the elements from rear to front, leaving the queue unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(len(self) - 1, -1, -1):
+            yield self.array[(self.front + index) % len(self.array)]
+
     def clear(self) -> None:
         """ Clears all elements from the queue. """
         Queue.__init__(self)
@@ -100,6 +124,144 @@ class CircularQueue(Queue[T]):
         self.rear = 0
 
 
+class GrowableCircularQueue(CircularQueue[T]):
+    """ Circular queue which is never full: the array doubles when it runs out of space.
+    If `shrink` is set, the array also halves once it is no more than a quarter used,
+    but never below the initial capacity.
+
+    Attributes:
+         initial_capacity (int): smallest size of the array
+         shrink (bool): whether serve can shrink the array
+         (and those of CircularQueue)
+    """
+
+    def __init__(self, initial_capacity: int = 1, shrink: bool = False) -> None:
+        CircularQueue.__init__(self, initial_capacity)
+        self.initial_capacity = len(self.array)
+        self.shrink = shrink
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue, doubling the array first if it is full.
+        :complexity: O(1) amortised, O(N) when the array is resized
+        """
+        if len(self) == len(self.array):
+            self._resize(2 * len(self.array))
+        CircularQueue.append(self, item)
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front, halving the array if shrinking is on and it is mostly empty.
+        :complexity: O(1) amortised, O(N) when the array is resized
+        :raises Exception: if the queue is empty
+        """
+        item = CircularQueue.serve(self)
+        self.array[(self.front - 1) % len(self.array)] = None # don't keep the served item alive
+        self._shrink_if_sparse()
+        return item
+
+    def is_full(self) -> bool:
+        """ Never full, the array grows instead. """
+        return False
+
+    def _shrink_if_sparse(self) -> None:
+        """ Halves the array if shrinking is on and no more than a quarter of it is used. """
+        if self.shrink and len(self.array) > self.initial_capacity and len(self) <= len(self.array) // 4:
+            self._resize(max(self.initial_capacity, len(self.array) // 2))
+
+    def _resize(self, capacity: int) -> None:
+        """ Moves the elements, front first, into a new array of the given capacity.
+        :pre: capacity >= len(self)
+        """
+        new_array = ArrayR(capacity)
+        for index in range(len(self)):
+            new_array[index] = self.array[(self.front + index) % len(self.array)]
+        self.array = new_array
+        self.front = 0
+        self.rear = len(self) % capacity
+
+
+class ReversibleQueue(GrowableCircularQueue[T]):
+    """ Growable queue that can reverse the order of its elements in constant time.
+    The array is used from both ends: while `backwards` is set the logical front is the
+    last occupied slot, append writes before `front` and serve takes from before `rear`.
+
+    Attributes:
+         backwards (bool): whether the elements are read from `rear` towards `front`
+         (and those of GrowableCircularQueue)
+    """
+
+    def __init__(self, initial_capacity: int = 1, shrink: bool = False) -> None:
+        GrowableCircularQueue.__init__(self, initial_capacity, shrink)
+        self.backwards = False
+
+    def reverse(self) -> None:
+        """ Reverses the order of the elements, the front becomes the rear.
+        :complexity: O(1), nothing is moved
+        """
+        self.backwards = not self.backwards
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue, doubling the array first if it is full.
+        :complexity: O(1) amortised, O(N) when the array is resized
+        """
+        if not self.backwards:
+            GrowableCircularQueue.append(self, item)
+            return
+        if len(self) == len(self.array):
+            self._resize(2 * len(self.array))
+        self.front = (self.front - 1) % len(self.array)
+        self.array[self.front] = item
+        self.length += 1
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front.
+        :complexity: O(1) amortised, O(N) when the array is resized
+        :raises Exception: if the queue is empty
+        """
+        if not self.backwards:
+            return GrowableCircularQueue.serve(self)
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.rear = (self.rear - 1) % len(self.array)
+        item = self.array[self.rear]
+        self.array[self.rear] = None
+        self.length -= 1
+        self._shrink_if_sparse()
+        return item
+
+    def peek(self, index: int = 0) -> T:
+        """ Returns the element `index` places behind the front, without serving anything.
+        :complexity: O(1)
+        :raises IndexError: if there is no such element
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Queue index out of range")
+        return self.array[self._slot(index)]
+
+    def __iter__(self):
+        """ Iterates over the elements from front to rear, leaving the queue unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(len(self)):
+            yield self.array[self._slot(index)]
+
+    def __reversed__(self):
+        """ Iterates over the elements from rear to front, leaving the queue unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(len(self) - 1, -1, -1):
+            yield self.array[self._slot(index)]
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue. """
+        GrowableCircularQueue.clear(self)
+        self.backwards = False
+
+    def _slot(self, index: int) -> int:
+        """ Array index of the element `index` places behind the logical front. """
+        if self.backwards:
+            return (self.front + len(self) - 1 - index) % len(self.array)
+        return (self.front + index) % len(self.array)
+
 class TestQueue(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
@@ -184,6 +346,86 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+    def test_iter_and_peek(self):
+        queue = CircularQueue(self.ROOMY)
+        for i in range(self.ROOMY):
+            queue.append(i)
+        queue.serve()
+        queue.serve()
+        queue.append(5) # wraps around the end of the array
+        self.assertEqual(list(queue), [2, 3, 4, 5])
+        self.assertEqual(list(reversed(queue)), [5, 4, 3, 2])
+        self.assertEqual([queue.peek(i) for i in range(len(queue))], [2, 3, 4, 5])
+        self.assertEqual(len(queue), 4) # nothing was served
+        self.assertRaises(IndexError, queue.peek, 4)
+        self.assertEqual(list(self.empty_queue), [])
+
+class TestGrowableQueue(unittest.TestCase):
+    """ Tests for GrowableCircularQueue."""
+
+    def test_grows(self):
+        queue = GrowableCircularQueue(2)
+        for i in range(100):
+            queue.append(i)
+        self.assertFalse(queue.is_full())
+        self.assertEqual(len(queue), 100)
+        self.assertEqual(len(queue.array), 128)
+        self.assertEqual(list(queue), list(range(100)))
+
+    def test_wrapped_grow(self):
+        queue = GrowableCircularQueue(4)
+        for i in range(4):
+            queue.append(i)
+        queue.serve()
+        queue.serve()
+        for i in range(4, 9):
+            queue.append(i)
+        self.assertEqual([queue.serve() for _ in range(len(queue))], list(range(2, 9)))
+
+    def test_shrinks(self):
+        queue = GrowableCircularQueue(2, shrink=True)
+        for i in range(64):
+            queue.append(i)
+        for i in range(60):
+            self.assertEqual(queue.serve(), i)
+        self.assertLessEqual(len(queue.array), 16)
+        self.assertEqual(list(queue), [60, 61, 62, 63])
+        for i in range(4):
+            queue.serve()
+        self.assertEqual(len(queue.array), 2)
+        self.assertRaises(Exception, queue.serve)
+
+class TestReversibleQueue(unittest.TestCase):
+    """ Tests for ReversibleQueue."""
+
+    def test_reverse(self):
+        queue = ReversibleQueue(2)
+        expected = []
+        for i in range(50):
+            if i % 7 == 6:
+                queue.reverse()
+                expected.reverse()
+            if i % 5 == 4:
+                self.assertEqual(queue.serve(), expected.pop(0))
+            queue.append(i)
+            expected.append(i)
+            self.assertEqual(list(queue), expected)
+            self.assertEqual(list(reversed(queue)), expected[::-1])
+            self.assertEqual(queue.peek(len(queue) - 1), expected[-1])
+
+    def test_shrinks_backwards(self):
+        queue = ReversibleQueue(2, shrink=True)
+        for i in range(32):
+            queue.append(i)
+        queue.reverse()
+        for i in range(31, 2, -1):
+            self.assertEqual(queue.serve(), i)
+        self.assertLessEqual(len(queue.array), 8)
+        self.assertEqual(list(queue), [2, 1, 0])
+        queue.append(-1)
+        queue.reverse()
+        self.assertEqual(list(queue), [-1, 0, 1, 2])
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -90,14 +90,32 @@ class ArrayStack(Stack[T]):
         self.length -= 1
         return self.array[self.length]
 
-    def peek(self) -> T:
-        """ Returns the element at the top, without popping it from stack.
+    def peek(self, index: int = 0) -> T:
+        """ Returns the element `index` places below the top, without popping it from stack.
+        peek() is the element at the top.
         :pre: stack is not empty
         :raises Exception: if the stack is empty
+        :raises IndexError: if there is no such element
         """
         if self.is_empty():
             raise Exception("Stack is empty")
-        return self.array[self.length-1]
+        if not 0 <= index < len(self):
+            raise IndexError("Stack index out of range")
+        return self.array[self.length-1-index]
+
+    def __iter__(self):
+        """ Iterates over the elements from top to bottom (the order pop would give), leaving the stack unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(self.length - 1, -1, -1):
+            yield self.array[index]
+
+    def __reversed__(self):
+        """ Iterates over the elements from bottom to top, leaving the stack unchanged.
+        :complexity: O(1) per element
+        """
+        for index in range(self.length):
+            yield self.array[index]
 
 class TestStack(unittest.TestCase):
     """ Tests for the above class."""
@@ -183,6 +201,15 @@ class TestStack(unittest.TestCase):
             self.assertEqual(len(stack), 0)
             self.assertTrue(stack.is_empty())
 
+    def test_iter_and_peek(self):
+        self.assertEqual(list(self.roomy_stack), [4, 3, 2, 1, 0])
+        self.assertEqual(list(reversed(self.roomy_stack)), [0, 1, 2, 3, 4])
+        self.assertEqual(self.roomy_stack.peek(), 4)
+        self.assertEqual(self.roomy_stack.peek(3), 1)
+        self.assertEqual(len(self.roomy_stack), self.ROOMY) # nothing was popped
+        self.assertRaises(IndexError, self.roomy_stack.peek, self.ROOMY)
+        self.assertEqual(list(self.empty_stack), [])
+
 if __name__ == '__main__':
     testtorun = TestStack()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -1,6 +1,12 @@
 from __future__ import annotations
 from data_structures.referential_array import ArrayR
 from layer_store import SetLayerStore,AdditiveLayerStore,SequenceLayerStore
+from columnar_grid import make_columnar_grid
+from bitplane_grid import make_bitplane_grid
+from sparse_grid import SparseGrid
+from tiled_grid import TiledGrid
+from quadtree_grid import QuadtreeGrid, Areas
+from layer_util import run_batch
 class Grid:
     DRAW_STYLE_SET = "SET"
     DRAW_STYLE_ADD = "ADD"
@@ -11,11 +17,26 @@ class Grid:
         DRAW_STYLE_SEQUENCE
     )
 
+    STORAGE_OBJECTS = "OBJECTS" #a LayerStore object per square
+    STORAGE_COLUMNAR = "COLUMNAR" #flat arrays for the whole grid, see columnar_grid
+    STORAGE_BITPLANES = "BITPLANES" #a bitmap per layer for SEQUENCE grids, see bitplane_grid. COLUMNAR for the others
+    STORAGE_SPARSE = "SPARSE" #a LayerStore object per painted square only, see sparse_grid
+    STORAGE_TILED = "TILED" #LayerStore objects in tiles made when first painted, see tiled_grid
+    STORAGE_QUADTREE = "QUADTREE" #a LayerStore object per region of squares holding the same layers, see quadtree_grid
+    STORAGE_OPTIONS = (
+        STORAGE_OBJECTS,
+        STORAGE_COLUMNAR,
+        STORAGE_BITPLANES,
+        STORAGE_SPARSE,
+        STORAGE_TILED,
+        STORAGE_QUADTREE
+    )
+
     DEFAULT_BRUSH_SIZE = 2
     MAX_BRUSH = 5
     MIN_BRUSH = 0
 
-    def __init__(self, draw_style, x, y) -> None:
+    def __init__(self, draw_style, x, y, storage=STORAGE_OBJECTS) -> None:
         """
         Initialise the grid object.
         - draw_style:
@@ -23,20 +44,50 @@ class Grid:
             Should be one of DRAW_STYLE_OPTIONS
             This draw style determines the LayerStore used on each grid square.
         - x, y: The dimensions of the grid.
+        - storage:
+            How the squares are stored, one of STORAGE_OPTIONS.
+            Either way grid[x][y] has the LayerStore interface.
         Should also intialise the brush size to the DEFAULT provided as a class variable.
 
-        Args: draw_style, x, y
-        Raises: None
+        Args: draw_style, x, y, storage
+        Raises: Exception if the draw style or storage is unknown
         Returns: None, just initializing variables
         Complexity:
         - Worst case: O(x*y), where x and y are the dimensions of the grid
         - Best case: O(1*1), when x=1 and y=1. Having x=0 or y=0 means no grid will be made.
+        Always O(1) with STORAGE_SPARSE and STORAGE_TILED, the squares only get a store when first painted,
+        and with STORAGE_QUADTREE, the whole grid starts as one region.
         """
         self.brush_size=self.DEFAULT_BRUSH_SIZE
         self.draw_style=draw_style
         self.x=x
         self.y=y
-        self.grid= self.make_grid(draw_style,x,y)
+        self.dirty=set() #(x, y) of every square changed since the last clear_dirty
+        self.dirty_areas=[] #(x0, x1, y0, y1) rectangles of squares changed since the last clear_dirty, see mark_dirty_area
+        self.all_dirty=True #nothing has been drawn yet, so every square counts as changed
+        self.special_epoch=0 #number of specials so far, stores apply the ones they missed when next used
+        self.changes=0 #increases on every mark_dirty and mark_all_dirty, unlike the dirty squares it is never cleared
+        self.bucket_list=None #result of buckets, valid while changes is bucket_changes
+        self.bucket_changes=-1
+        self.colors=None #result of get_colors for colors_buckets and colors_start
+        self.colors_buckets=None
+        self.colors_start=None
+        self.color_keys=None #time key each bucket of bucket_list was last evaluated for, see get_colors
+        self.storage=storage
+        if storage == self.STORAGE_OBJECTS:
+            self.grid= self.make_grid(draw_style,x,y)
+        elif storage == self.STORAGE_COLUMNAR:
+            self.grid= make_columnar_grid(self,draw_style,x,y)
+        elif storage == self.STORAGE_BITPLANES:
+            self.grid= make_bitplane_grid(self,draw_style,x,y)
+        elif storage == self.STORAGE_SPARSE:
+            self.grid= SparseGrid(self,draw_style,x,y)
+        elif storage == self.STORAGE_TILED:
+            self.grid= TiledGrid(self,draw_style,x,y)
+        elif storage == self.STORAGE_QUADTREE:
+            self.grid= QuadtreeGrid(self,draw_style,x,y)
+        else:
+            raise Exception('wrong storage')
 
     def __getitem__(self, key): #this for [x][y]
         """ Returns the object in position index.
@@ -64,8 +115,222 @@ class Grid:
                 else:
                     raise Exception('wrong draw style')
                 grid[vert_in][hor_in]=layer_store_type()#adding layer stores
+                grid[vert_in][hor_in].attach(self,vert_in,hor_in) #so the store reports its changes to this grid
         return grid
 
+    def mark_dirty(self, x, y) -> None:
+        """
+        Record that the colour of the square at (x, y) may have changed.
+        Called by the layer stores of this grid whenever they are mutated.
+        Args: x, y which are the coordinates of the square
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1), set insertion
+        """
+        self.changes+=1
+        if not self.all_dirty: #no need to remember single squares if everything is dirty already
+            self.dirty.add((x,y))
+
+    def mark_dirty_area(self, x0, x1, y0, y1) -> None:
+        """
+        Record that the colour of every square x0 <= x < x1, y0 <= y < y1 may have changed.
+        Called by backends which change a whole region at once, the rectangle is only turned into squares by dirty_cells.
+        Args: x0, x1, y0, y1 which are the bounds of the rectangle
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.changes+=1
+        if not self.all_dirty:
+            self.dirty_areas.append((x0,x1,y0,y1))
+
+    def mark_all_dirty(self) -> None:
+        """
+        Record that every square may have changed.
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.changes+=1
+        self.all_dirty=True
+        self.dirty=set()
+        self.dirty_areas=[]
+
+    def dirty_cells(self):
+        """
+        The squares changed since the last clear_dirty.
+        Args: None
+        Raises: None
+        Returns: set of (x, y) tuples. Every square of the grid if all_dirty is set.
+        Complexity:
+        - Worst: O(x*y), when every square is dirty
+        - Best: O(1), when only individual dirty squares were recorded, which are returned as they are.
+        Otherwise O(D+A), A being the number of squares in the dirty rectangles
+        """
+        if self.all_dirty:
+            return set((x,y) for x in range(self.x) for y in range(self.y))
+        if len(self.dirty_areas) == 0:
+            return self.dirty
+        cells=set(self.dirty)
+        for x0,x1,y0,y1 in self.dirty_areas:
+            cells.update((x,y) for x in range(x0,x1) for y in range(y0,y1))
+        return cells
+
+    def clear_dirty(self) -> None:
+        """
+        Forget every dirty square. Should be called once the changes have been consumed, e.g. after a frame is drawn.
+        The dirty squares are a single cursor: the ColorPyramid of the renderer is the one consumer which calls this,
+        after each update. Anything else wanting to know whether the grid changed compares changes instead (see buckets),
+        clearing the dirty squares behind the pyramid's back would leave it out of date.
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1), plus the backend's own clear_dirty if it has one (O(T) for a tiled grid with T tiles made)
+        """
+        self.all_dirty=False
+        self.dirty=set()
+        self.dirty_areas=[]
+        if hasattr(self.grid, "clear_dirty"): #backends keeping dirty flags of their own, e.g. the tiles of a tiled grid
+            self.grid.clear_dirty()
+
+    def paint(self, layer, px, py):
+        """
+        Add the layer to every square within manhattan distance brush_size of (px, py).
+        Squares outside the grid are ignored.
+        Args:
+        -layer: the layer being applied
+        -px, py: centre of the brush
+        Raises: None
+        Returns: list of (x, y) of the squares which changed, in order of x then y
+        Complexity:
+        - Always O(brush_size^2*add), only the squares under the brush are visited.
+        A bitplane grid ORs the whole footprint into one bitmap instead, see BitplaneSequenceGrid.paint,
+        and a quadtree grid adds the layer once per region, see QuadtreeGrid.paint
+        """
+        if self.storage == self.STORAGE_BITPLANES and self.draw_style == self.DRAW_STYLE_SEQUENCE:
+            return self.grid.paint(layer, px, py, self.brush_size)
+        if self.storage == self.STORAGE_QUADTREE:
+            return self.grid.paint(layer, px, py, self.brush_size)
+        changed=[]
+        for x in range(max(0,px-self.brush_size), min(self.x,px+self.brush_size+1)):
+            reach=self.brush_size-abs(px-x) #the footprint is a diamond, narrower away from px
+            for y in range(max(0,py-reach), min(self.y,py+reach+1)):
+                if self.grid[x][y].add(layer):
+                    changed.append((x,y))
+        return changed
+
+    def buckets(self):
+        """
+        The squares grouped by the state of their layer store, see LayerStore.state_key.
+        The list is kept until the grid next changes (see changes), so it must not be modified.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, cells) pairs, one per distinct state. cells is a list of the flat indices
+        x*self.y+y of the squares, or for a quadtree grid the Areas of the squares (see bucket_indices)
+        Complexity:
+        - Worst: O(group_squares), the grid changed since the last call
+        - Best: O(1)
+        """
+        if self.bucket_changes != self.changes:
+            self.bucket_list=self.group_squares()
+            self.bucket_changes=self.changes
+        return self.bucket_list
+
+    def group_squares(self):
+        """
+        Work out buckets from the stores, or ask the backend to.
+        Args: None
+        Raises: None
+        Returns: see buckets
+        Complexity:
+        - Always O(x*y*LayerStore.state_key+S*LayerStore.compiled_program), S being the number of distinct states
+        """
+        if self.storage != self.STORAGE_OBJECTS:
+            return self.grid.buckets()
+        groups = {} #state -> (store with the state, squares with the state)
+        for x in range(self.x):
+            for y in range(self.y):
+                store = self.grid[x][y]
+                key = store.state_key()
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = (store, [])
+                group[1].append(x*self.y+y)
+        return [(store.compiled_program(), cells) for store, cells in groups.values()]
+
+    def bucket_indices(self, cells):
+        """
+        The flat indices of the squares of a bucket, see buckets.
+        Args: cells of a bucket
+        Raises: None
+        Returns: list of flat indices, cells itself unless it is Areas
+        Complexity:
+        - Worst: O(number of squares), cells is Areas
+        - Best: O(1)
+        """
+        if not isinstance(cells, Areas):
+            return cells
+        indices=[]
+        for x0,x1,y0,y1 in cells:
+            for x in range(x0,x1):
+                indices.extend(range(x*self.y+y0,x*self.y+y1))
+        return indices
+
+    def get_colors(self, start, timestamp, area=None):
+        """
+        The colour of every square, evaluating each group of squares with the same state together
+        (see layer_util.run_batch): once if nothing in it depends on time or position, otherwise with one
+        batch call per step over the group's squares.
+        Only the squares of area are evaluated if it leaves some out, each through its own get_color,
+        as grouping the squares would visit the whole grid.
+        Args:
+        -start: background colour
+        -timestamp: time
+        -area: (x0, x1, y0, y1) to only get the squares x0 <= x < x1 and y0 <= y < y1, e.g. Viewport.visible
+        Raises: None
+        The colours of the whole grid are kept from call to call. While the buckets stay the same, a bucket
+        is only evaluated again if its time key changed: None if none of its steps depend on time, the timestamp
+        otherwise, as the time keys of the layers (see Layer.time_key) differ from square to square.
+        Returns: list of colours in order of x then y, the colour of (x, y) at index x*self.y+y for the whole grid.
+        The list of the whole grid is kept for the next call, so it must not be modified.
+        Complexity:
+        - Worst: O(buckets+x*y+S*run_batch), S being the number of distinct states, the grid changed
+        - Best: O(S), nothing changed and nothing is animated. O(S+A*run_batch) if A squares are animated
+        - O(A*LayerStore.get_color) with an area, A being the number of squares in area
+        """
+        if area is not None and area != (0,self.x,0,self.y):
+            x0,x1,y0,y1=area
+            return [self.grid[x][y].get_color(start,timestamp,x,y) for x in range(x0,x1) for y in range(y0,y1)]
+        buckets=self.buckets()
+        start=tuple(start)
+        if self.colors_buckets is not buckets or self.colors_start != start:
+            self.colors=[None]*(self.x*self.y)
+            self.colors_buckets=buckets
+            self.colors_start=start
+            self.color_keys=[()]*len(buckets) #() is never a time key, so every bucket gets evaluated
+        for i, (program, cells) in enumerate(buckets):
+            key=timestamp if any(step.time_dependent for step in program) else None
+            if self.color_keys[i] == key:
+                continue
+            self.color_keys[i]=key
+            if isinstance(cells, Areas) and all(step.uniform for step in program):
+                color=run_batch(program, start, timestamp, [cells[0][0]], [cells[0][2]])[0]
+                for x0,x1,y0,y1 in cells: #a slice of each column of each rectangle
+                    for x in range(x0,x1):
+                        self.colors[x*self.y+y0:x*self.y+y1]=[color]*(y1-y0)
+                continue
+            cells=self.bucket_indices(cells)
+            xs=[index//self.y for index in cells]
+            ys=[index%self.y for index in cells]
+            for index, color in zip(cells, run_batch(program, start, timestamp, xs, ys)):
+                self.colors[index]=color
+        return self.colors
+
     def increase_brush_size(self): #complexity O(1) only adding 1
         """
         Increases the size of the brush by 1,
@@ -96,16 +361,15 @@ class Grid:
         if self.brush_size>Grid.MIN_BRUSH:
             self.brush_size=self.brush_size-1
 
-    def special(self): #complexity O(N^2) because for loop inside for loop
+    def special(self):
         """
         Activate the special affect on all grid squares.
+        The special is only recorded here, each layer store applies it the next time it is read or changed (see LayerStore.catch_up).
         Args: None
         Raises: None
-        Returns: None, but does special method on every layer store
+        Returns: None, but every layer store will do its special method
         Complexity:
-        - Worst: O(X*Y), needs to loop through all the layer stores
-        - Best: 0(1), when x=1 and y=1 so only loop through one layer store
+        - Always O(1), no layer store is visited
         """
-        for x in range(self.x): #looping through all the squares and calling the method special in each square
-            for y in range(self.y):
-                self.grid[x][y].special()
+        self.mark_all_dirty() #every square is affected, stores do not need to be tracked one by one
+        self.special_epoch+=1
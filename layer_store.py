@@ -1,16 +1,98 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from layer_util import Layer,get_layers
+from copy import copy
+from dataclasses import dataclass, replace
+import layer_util
+from layer_util import Layer,get_layers,compile_layers,compile_runs,extend_program
 from layers import invert
-from data_structures.queue_adt import CircularQueue
-from data_structures.stack_adt import ArrayStack
-from data_structures.array_sorted_list import ArraySortedList
-from data_structures.sorted_list_adt import ListItem
+from data_structures.queue_adt import ReversibleQueue
 from data_structures.bset import BSet
 class LayerStore(ABC):
 
     def __init__(self) -> None:
-        pass
+        """
+        Initializing the owner of the store. A store made outside a grid has no owner.
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.grid = None
+        self.position = None
+        self.special_epoch = 0 #Grid.special_epoch this store has caught up with
+        self.version = 0 #increases on every change of the store
+        self.cache_key = None #(version, start, x, y, time key) the cached colour was computed for
+        self.cache_color = None
+        self.program = () #compiled steps of the stored layers, see layer_util.compile_layers
+        self.program_version = -1 #version the program was compiled for
+        self.state = None #state_key of the store
+        self.state_version = -1 #version the state was worked out for
+
+    def attach(self, grid, x, y) -> None:
+        """
+        Set the grid which owns this store, and where in the grid the store is.
+        Mutations of the store are reported to this grid.
+        Args:
+        -grid: the owning Grid
+        -x, y: coordinates of the store in the grid
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.grid = grid
+        self.position = (x, y)
+        self.special_epoch = grid.special_epoch
+
+    def notify(self) -> None:
+        """
+        Record that the colour of this store may have changed.
+        Bumps the version, which invalidates the cached colour, and reports the change to the owning grid (if any).
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(Grid.mark_dirty)
+        """
+        self.version += 1
+        if self.grid is not None:
+            self.grid.mark_dirty(self.position[0], self.position[1])
+
+    def catch_up(self) -> None:
+        """
+        Apply the specials the owning grid recorded (see Grid.special) since this store last caught up.
+        Called before every read or mutation of the store. The grid already marked every square dirty when the
+        special was done, so the change is not reported to it again: only the version moves on (see notify).
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Worst: O(apply_specials), specials are pending
+        - Best: O(1), the store is up to date or has no owner
+        """
+        if self.grid is None or self.special_epoch == self.grid.special_epoch:
+            return
+        count = self.grid.special_epoch - self.special_epoch
+        self.special_epoch = self.grid.special_epoch #first, so the special calls below do not catch up again
+        grid = self.grid
+        self.grid = None #so that notify does not report the change, a read would dirty the square after Grid.clear_dirty
+        try:
+            self.apply_specials(count)
+        finally:
+            self.grid = grid
+
+    def apply_specials(self, count) -> None:
+        """
+        Do special count times in a row. Stores for which this repeats override it with something cheaper.
+        Args: count which is the number of specials
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(count*special)
+        """
+        for _ in range(count):
+            self.special()
 
     @abstractmethod
     def add(self, layer: Layer) -> bool:
@@ -20,14 +102,164 @@ class LayerStore(ABC):
         """
         pass
 
-    @abstractmethod
     def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:#look at color apply. Does x and y matter ? read test set layer and main to find out
         """
         Returns the colour this square should show, given the current layers.
+        The colour is remembered until the store changes, or until one of its animated layers moves on to its next time step.
+        Args:
+        -start: starting color
+        -timestamp: time
+        -x: x coordinate
+        -y: y coordinate
+        Raises: None
+        Returns: color which is a tuple containg 3 integers.
+        Complexity:
+        - Worst: O(time_key+compute_color), the cache is out of date
+        - Best: O(time_key+comp), the cached colour is returned
         """
         #returns the color which is a tuple containing 3 values at coordinate x and y
         #start is the starting color which is at the bottom of the stack
         #timestamp,if for example it is rainbow need timestamp at time ... what is the color of that square
+        self.catch_up()
+        key = (self.version, tuple(start), x, y, self.time_key(timestamp, x, y))
+        if key != self.cache_key:
+            self.cache_color = self.compute_color(start, timestamp, x, y)
+            self.cache_key = key
+        return self.cache_color
+
+    @abstractmethod
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Computes the colour this square should show by applying the current layers. Used by get_color.
+        """
+        pass
+
+    def run_program(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        """
+        Apply the compiled program of the store to the start colour, compiling it first if the store changed since.
+        Args:
+        -start: starting color
+        -timestamp: time
+        -x: x coordinate
+        -y: y coordinate
+        Raises: None
+        Returns: color which is a tuple containg 3 integers.
+        Complexity:
+        - Worst: O(compile_layers(layers)+S*apply), the program is out of date. S is the number of steps.
+        - Best: O(S*apply), S is at most the number of stored layers, runs of pointwise layers being one step.
+        """
+        color = start
+        for step in self.compiled_program():
+            color = step.apply(color, timestamp, x, y)
+        return color
+
+    @abstractmethod
+    def layers(self):
+        """
+        The stored layers, in the order they are applied.
+        """
+        pass
+
+    def contributing_layers(self):
+        """
+        The stored layers which can affect the colour, in the order they are applied.
+        All of them, unless a store knows better.
+        """
+        return self.layers()
+
+    def state_key(self):
+        """
+        Hashable summary of everything the colour of the store depends on, apart from the start colour,
+        timestamp and position. Stores of the same kind with equal keys show the same colour
+        wherever their layers would, so the grid can evaluate them together (see Grid.get_colors).
+        Args: None
+        Raises: None
+        Returns: tuple of (layer index, count) pairs of the contributing runs
+        Complexity:
+        - Worst: O(contributing_runs), the store changed since the key was last worked out
+        - Best: O(catch_up)
+        """
+        self.catch_up()
+        if self.state_version != self.version:
+            self.state = tuple((layer.index, count) for layer, count in self.contributing_runs())
+            self.state_version = self.version
+        return self.state
+
+    def content_key(self):
+        """
+        Hashable summary of everything the store holds, unlike state_key this includes layers which are painted over.
+        Stores of the same kind with equal keys behave the same from now on, whatever is done to them.
+        Args: None
+        Raises: None
+        Returns: tuple of the indices of the stored layers, in order
+        Complexity:
+        - Always O(layers)
+        """
+        return tuple(layer.index for layer in self.layers())
+
+    def clone(self) -> LayerStore:
+        """
+        A copy of the store which can be changed without changing this one. The copy is not attached to any grid.
+        Stores with containers of their own copy them on top of this.
+        Args: None
+        Raises: None
+        Returns: LayerStore of the same kind
+        Complexity:
+        - Always O(1), a shallow copy
+        """
+        self.catch_up() #the copy is detached and could not catch up later
+        store = copy(self)
+        store.grid = None
+        store.position = None
+        store.special_epoch = 0
+        return store
+
+    def compiled_program(self) -> tuple:
+        """
+        The compiled program of the store, compiling it first if the store changed since.
+        Args: None
+        Raises: None
+        Returns: tuple of steps, see layer_util.compile_runs
+        Complexity:
+        - Worst: O(compile_program), the program is out of date
+        - Best: O(1)
+        """
+        if self.program_version != self.version:
+            self.program = self.compile_program()
+            self.program_version = self.version
+        return self.program
+
+    def compile_program(self) -> tuple:
+        """
+        Compile the layers which can affect the colour into the steps run_program applies.
+        Args: None
+        Raises: None
+        Returns: tuple of steps, see layer_util.compile_runs
+        Complexity:
+        - Always O(compile_runs(contributing_runs))
+        """
+        return compile_runs(self.contributing_runs())
+
+    def contributing_runs(self):
+        """
+        contributing_layers as (layer, count) pairs, see layer_util.compile_runs.
+        Stores which keep repeated layers together override this.
+        """
+        return [(layer, 1) for layer in self.contributing_layers()]
+
+    @abstractmethod
+    def is_animated(self) -> bool:
+        """
+        True if any stored layer depends on the timestamp.
+        """
+        pass
+
+    @abstractmethod
+    def time_key(self, timestamp, x, y):
+        """
+        The time keys (see Layer.time_key) of the stored animated layers, or None if there are none.
+        The colour of the store stays the same while this does not change.
+        """
         pass
 
     @abstractmethod
@@ -61,6 +293,7 @@ class SetLayerStore(LayerStore):
         Complexity:
         - Always 0(1) because initializing variables
         """
+        LayerStore.__init__(self)
         self.layer_store = None #initializing. O(1)
         self.invert = False #initializing. O(1)
 
@@ -73,9 +306,11 @@ class SetLayerStore(LayerStore):
         Complexity:
         - Always 0(comp). only checking, no loop or recursion
         """
+        self.catch_up()
         if self.layer_store==layer: #checking if there any changes. O(comp).
             return False
         self.layer_store=layer #assigning the layer store to new layer. O(1)
+        self.notify()
         return True
 
     def erase(self, layer: Layer) -> bool:
@@ -88,12 +323,68 @@ class SetLayerStore(LayerStore):
         Complexity:
         - Always 0(comp). only checking no loop or recursion.
         """
+        self.catch_up()
         if self.layer_store == None: #checking if the layer is empty. O(1).
             return False
         self.layer_store=None #assigning variable. O(1).
+        self.notify()
         return True
 
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+    def layers(self):
+        """
+        The set layer followed by invert if special is on.
+        Args: None
+        Raises: None
+        Returns: list of Layer
+        Complexity:
+        - Always O(1)
+        """
+        self.catch_up()
+        layers = []
+        if self.layer_store is not None:
+            layers.append(self.layer_store)
+        if self.invert:
+            layers.append(invert)
+        return layers
+
+    def content_key(self):
+        """
+        The set layer and whether special is on, layers() cannot tell a set invert layer from special.
+        Args: None
+        Raises: None
+        Returns: tuple (layer index or None, bool)
+        Complexity:
+        - Always O(1)
+        """
+        self.catch_up()
+        return (None if self.layer_store is None else self.layer_store.index, self.invert)
+
+    def is_animated(self) -> bool:
+        """
+        Whether the set layer depends on the timestamp.
+        Args: None
+        Raises: None
+        Returns: bool. False if there is no layer, invert does not depend on the timestamp either.
+        Complexity:
+        - Always O(comp)
+        """
+        self.catch_up()
+        return self.layer_store is not None and self.layer_store.time_dependent
+
+    def time_key(self, timestamp, x, y):
+        """
+        Time key of the set layer.
+        Args: timestamp, x, y
+        Raises: None
+        Returns: Layer.time_key of the layer, None if there is no layer.
+        Complexity:
+        - Always O(Layer.time_key)
+        """
+        if self.layer_store is None:
+            return None
+        return self.layer_store.time_key(timestamp, x, y)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
         """
         getting current color of the layer store.
         Args:
@@ -123,7 +414,33 @@ class SetLayerStore(LayerStore):
         Complexity:
         - Always 0(1). Only assigning variable.
         """
+        self.catch_up()
         self.invert= not self.invert
+        self.notify()
+
+    def apply_specials(self, count) -> None:
+        """
+        Do special count times in a row. Two specials undo each other, so only the parity of count matters.
+        Args: count which is the number of specials
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(special), O(1)
+        """
+        if count % 2 == 1:
+            self.special()
+
+@dataclass
+class LayerRun:
+    """
+    count copies of the same layer in a row, one entry of AdditiveLayerStore.layer_store.
+    The copies have the ordinals low..high (see AdditiveLayerStore).
+    """
+
+    layer: Layer
+    count: int
+    low: int
+    high: int
 
 class AdditiveLayerStore(LayerStore):
     """
@@ -131,7 +448,11 @@ class AdditiveLayerStore(LayerStore):
     - add: Add a new layer to be added last.
     - erase: Remove the first layer that was added. Ignore what is currently selected.
     - special: Reverse the order of current layers (first becomes last, etc.)
+    The same layer added several times in a row is stored once, as a LayerRun.
     """
+    INITIAL_CAPACITY = 4 #size of the queue created by the first add
+    SHRINK = True #whether erase gives memory back
+
     def __init__(self):
         """
         Initializing objects and attributes to be used
@@ -139,37 +460,135 @@ class AdditiveLayerStore(LayerStore):
         Raises: None
         Returns: None
         Complexity:
-        - Always 0(CircularQueue.__init__) because only initializing variables and initializing queue with fixed capacity
+        - Always O(1), the queue is only created by the first add so empty squares cost no layer slots
         """
-        layer_store=CircularQueue(100*20)
-        self.layer_store = layer_store
+        LayerStore.__init__(self)
+        self.layer_store = None #ReversibleQueue of LayerRun once a layer has been added
         self.color = None
         self.reverse = False
+        self.animated = {} #index of each stored layer that depends on the timestamp -> how many times it is stored
+        self.last_opaque = None #position (from the front) of the last opaque layer, None if there is none
+        # Every stored layer gets an ordinal that never changes, layers are numbered head..tail-1 in the order they
+        # sit in the queue when it is not backwards. Ordinals survive a reversal where positions from the front do not.
+        self.head = 0
+        self.tail = 0
+        self.opaque_runs = None #the runs of opaque layers, in the same order as layer_store
+
+    def __len__(self) -> int:
+        """
+        Number of stored layers, each copy in a run counting once.
+        Args: None
+        Raises: None
+        Returns: int
+        Complexity:
+        - Always O(1)
+        """
+        return self.tail - self.head
 
     def add(self, layer: Layer) -> bool:
         """
         Add a new layer to be added last.
         Args: layer which is a Layer object
-        Raises: from CircularQueue will raise is full if the queue is full
-        Returns: bool. True if the added layer is added succesfully. if fails then raise exception queue is full.
+        Raises: None, the queue grows when it runs out of space
+        Returns: bool. Always True, there is no limit on how many layers are stored.
         Complexity:
-        - Always O(CircularQueue.append) only adding to queue.
-        """
-        self.layer_store.append(layer)
+        - Worst: O(ReversibleQueue.append), O(1) amortised. The layer starts a new run.
+        - Best: O(ReversibleQueue.peek), the last run is of the same layer and only its count changes.
+        """
+        self.catch_up()
+        program_up_to_date = self.program_version == self.version
+        if self.layer_store is None:
+            self.layer_store = ReversibleQueue(self.INITIAL_CAPACITY, shrink=self.SHRINK)
+            self.opaque_runs = ReversibleQueue(shrink=self.SHRINK)
+        backwards = self.layer_store.backwards
+        if backwards: #the rear of a reversed queue is below the lowest ordinal
+            self.head -= 1
+            ordinal = self.head
+        else:
+            ordinal = self.tail
+            self.tail += 1
+        last = None if self.layer_store.is_empty() else self.layer_store.peek(len(self.layer_store) - 1)
+        if last is not None and last.layer is layer:
+            last.count += 1
+            if backwards:
+                last.low = ordinal
+            else:
+                last.high = ordinal
+        else:
+            run = LayerRun(layer, 1, ordinal, ordinal)
+            self.layer_store.append(run)
+            if layer.opaque:
+                self.opaque_runs.append(run)
+        if layer.time_dependent:
+            self.animated[layer.index] = self.animated.get(layer.index, 0) + 1
+        if layer.opaque:
+            self.last_opaque = len(self) - 1
+        self.notify()
+        if program_up_to_date: #extending the program is cheaper than compiling every layer again
+            self.program = extend_program(self.program, layer)
+            self.program_version = self.version
         return True
 
     def erase(self, layer: Layer) -> bool:
         """
         Remove the first layer that was added. Ignore what is currently selected.
         Args: layer which is a Layer object
-        Raises: from CircularQueue will raise queue is empty if queue is empty
+        Raises: None
         Returns: True if layer erased succesfully. False if layer store is empty
-        - Always O(CircularQueue.serve) only serving queue.
+        Complexity:
+        - Always O(ReversibleQueue.serve), O(1) amortised. The queue shrinks once it is mostly empty.
         """
-        self.layer_store.serve()
+        self.catch_up()
+        if self.layer_store is None or self.layer_store.is_empty():
+            return False
+        first = self.layer_store.peek()
+        first.count -= 1
+        if self.layer_store.backwards:
+            self.tail -= 1
+            first.high -= 1
+        else:
+            self.head += 1
+            first.low += 1
+        if first.count == 0:
+            self.layer_store.serve()
+            if first.layer.opaque: #it was the first opaque run
+                self.opaque_runs.serve()
+        removed = first.layer
+        if removed.time_dependent:
+            self.animated[removed.index] -= 1
+            if self.animated[removed.index] == 0:
+                del self.animated[removed.index]
+        self._update_last_opaque()
+        self.notify()
         return True
 
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+    def is_animated(self) -> bool:
+        """
+        Whether any stored layer depends on the timestamp.
+        Args: None
+        Raises: None
+        Returns: bool
+        Complexity:
+        - Always O(1), the counts are kept up to date by add and erase
+        """
+        self.catch_up()
+        return len(self.animated) > 0
+
+    def time_key(self, timestamp, x, y):
+        """
+        Time keys of the distinct animated layers in the store.
+        Args: timestamp, x, y
+        Raises: None
+        Returns: tuple of Layer.time_key, None if no layer is animated.
+        Complexity:
+        - Always O(A*Layer.time_key), A being the number of distinct animated layers (at most the number of registered layers)
+        """
+        if len(self.animated) == 0:
+            return None
+        layers = get_layers()
+        return tuple(layers[index].time_key(timestamp, x, y) for index in self.animated)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
         """
         getting current color of the layer store.
         Args:
@@ -180,22 +599,109 @@ class AdditiveLayerStore(LayerStore):
         Raises: None
         Returns: color which is a tuple containg 3 integers.
         Complexity:
-        - N is len(self.layer_store)
-        - Worst: O(CircularQueue.__init__+N*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append + N*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append)=
-        O(CircularQueue.__init__+N*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append). this happens when there are a lot of elements in self.layer_store
-        - Best: O(CircularQueue.__init__+1*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append + 1*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append)=
-        O(1*CircularQueue.is_empty*comp*CircularQueue.serve*apply*CircularQueue.append). this happens when there is only 1 element in self.layer_store
-        """
-        color=start
-        temp_queue = CircularQueue(len(self.layer_store)) #creating temporary queue
-        while self.layer_store.is_empty() == False:  # serving it and applying color one by one, this loop empties the self.layer_store
-            layer = self.layer_store.serve() #complexity of this loop is O(N*CircularQueue.serve). N is how many layers are in self.layer_store.
-            color = layer.apply(color, timestamp, x, y)
-            temp_queue.append(layer) #adding color to temp_queue
-        while temp_queue.is_empty() == False: #complexity of this loop is O(N*CircularQueue.serve). N is how many layers are in temp_queue which is the same amount as how many layers are in self.layer_store.
-            layer = temp_queue.serve()
-            self.layer_store.append(layer) # storing all the colors back into self.layer_store
-        return color
+        - Always O(run_program). Consecutive lighten/darken/invert layers are applied as one lookup.
+        """
+        return self.run_program(start, timestamp, x, y)
+
+    def layers(self):
+        """
+        The stored layers from first to last, a run giving each of its copies.
+        Args: None
+        Raises: None
+        Returns: list of Layer
+        Complexity:
+        - Always O(N), iterating over the queue without serving anything
+        """
+        self.catch_up()
+        if self.layer_store is None:
+            return []
+        return [run.layer for run in self.layer_store for _ in range(run.count)]
+
+    def runs(self):
+        """
+        The stored runs from first to last.
+        Args: None
+        Raises: None
+        Returns: list of (layer, count) tuples
+        Complexity:
+        - Always O(R), R being the number of runs
+        """
+        self.catch_up()
+        if self.layer_store is None:
+            return []
+        return [(run.layer, run.count) for run in self.layer_store]
+
+    def content_key(self):
+        """
+        The stored runs in order, see LayerStore.content_key.
+        Args: None
+        Raises: None
+        Returns: tuple of (layer index, count) pairs
+        Complexity:
+        - Always O(R), R being the number of runs
+        """
+        return tuple((layer.index, count) for layer, count in self.runs())
+
+    def clone(self) -> AdditiveLayerStore:
+        """
+        A copy with queues and runs of its own, see LayerStore.clone.
+        The runs are appended in the order they sit in the queue when it is not backwards, so the ordinals stay valid.
+        Args: None
+        Raises: None
+        Returns: AdditiveLayerStore
+        Complexity:
+        - Always O(R), R being the number of runs
+        """
+        store = LayerStore.clone(self)
+        store.animated = dict(self.animated)
+        if self.layer_store is None:
+            return store
+        backwards = self.layer_store.backwards
+        runs = reversed(self.layer_store) if backwards else iter(self.layer_store)
+        store.layer_store = ReversibleQueue(self.INITIAL_CAPACITY, shrink=self.SHRINK)
+        store.opaque_runs = ReversibleQueue(shrink=self.SHRINK)
+        for run in runs:
+            run = replace(run)
+            store.layer_store.append(run)
+            if run.layer.opaque:
+                store.opaque_runs.append(run)
+        if backwards:
+            store.layer_store.reverse()
+            store.opaque_runs.reverse()
+        return store
+
+    def contributing_runs(self):
+        """
+        The stored runs from the last opaque layer onwards, anything before it is painted over.
+        Only one copy of an opaque run counts, the others are painted over by the last one.
+        Args: None
+        Raises: None
+        Returns: list of (layer, count) tuples
+        Complexity:
+        - Always O(R'), R' being the number of runs after the last opaque one. The runs before are never read
+        """
+        self.catch_up()
+        if self.last_opaque is None:
+            return self.runs()
+        runs = []
+        for run in reversed(self.layer_store):
+            if run.layer.opaque:
+                runs.append((run.layer, 1))
+                break
+            runs.append((run.layer, run.count))
+        runs.reverse()
+        return runs
+
+    def contributing_layers(self):
+        """
+        The stored layers from the last opaque one onwards, anything before it is painted over.
+        Args: None
+        Raises: None
+        Returns: list of Layer
+        Complexity:
+        - Always O(N-last_opaque)
+        """
+        return [layer for layer, count in self.contributing_runs() for _ in range(count)]
 
     def special(self):
         """
@@ -204,19 +710,46 @@ class AdditiveLayerStore(LayerStore):
         Raises: None
         Returns: nothing. But reverses the order of the layers
         Complexity:
-        - N being how many layers are stored in self.layer_store.
-        - Worst: O(ArrayStack.__init__+N*CircularQueue.is_empty*comp*CircularQueue.serve*ArrayStack.push+N*ArrayStack.is_empty*comp*ArrayStack.pop*CircularQueue.append)
-        this happens when there are many elements in layer store.
-        - Best: O(ArrayStack.__init__+CircularQueue.is_empty*comp*CircularQueue.serve*ArrayStack.push+ArrayStack.is_empty*comp*ArrayStack.pop*CircularQueue.append).
-        Meaning only 1 layer in self.layer_store.
+        - Always O(ReversibleQueue.reverse), O(1). Only the direction of the queues is flipped, no layer is moved.
+        """
+        self.catch_up()
+        if self.layer_store is None:
+            return
+        self.layer_store.reverse()
+        self.opaque_runs.reverse()
+        self._update_last_opaque()
+        if len(self.layer_store) > 1: #reversing a single run changes nothing
+            self.notify()
+
+    def apply_specials(self, count) -> None:
+        """
+        Do special count times in a row. Reversing twice changes nothing, so only the parity of count matters.
+        Args: count which is the number of specials
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(special), O(1)
+        """
+        if count % 2 == 1:
+            self.special()
+
+    def _update_last_opaque(self):
         """
-        temp_stack = ArrayStack(len(self.layer_store)) #creating a temporary stack. reverse queue using stack.
-        while self.layer_store.is_empty() == False: #serving until queue is empty
-            layer = self.layer_store.serve() #complexity of this loop is O(N*CircularQueue.serve). N is how many layers are in self.layer_store.
-            temp_stack.push(layer)
-        while temp_stack.is_empty() == False: #complexity of this loop is O(N*CircularQueue.serve). N is how many layers are in temp_stack which is the same amount as how many layers are in self.layer_store.
-            layer = temp_stack.pop()
-            self.layer_store.append(layer)
+        Recompute last_opaque from the ordinals of the last opaque run.
+        Args: None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(ReversibleQueue.peek)
+        """
+        if self.opaque_runs is None or self.opaque_runs.is_empty():
+            self.last_opaque = None
+            return
+        run = self.opaque_runs.peek(len(self.opaque_runs) - 1)
+        if self.layer_store.backwards: #the front is the highest ordinal
+            self.last_opaque = self.tail - 1 - run.low
+        else:
+            self.last_opaque = run.high - self.head
 
 class SequenceLayerStore(LayerStore):
     """
@@ -227,6 +760,9 @@ class SequenceLayerStore(LayerStore):
         Of all currently applied layers, remove the one with median `name`.
         In the event of two layers being the median names, pick the lexicographically smaller one.
     """
+    programs = {} #applied set (BSet.elems) -> compiled program, shared by every store since it only depends on the set
+    medians = {} #applied set -> index of the layer special removes from it
+
     def __init__(self):
         """
         Initializing object to be used
@@ -236,6 +772,7 @@ class SequenceLayerStore(LayerStore):
         Complexity:
         - Always 0(1) because initializing set with fixed size
         """
+        LayerStore.__init__(self)
         self.layer_store=BSet()
 
     def add(self, layer: Layer) -> bool:
@@ -245,10 +782,11 @@ class SequenceLayerStore(LayerStore):
         Raises: none
         Returns: bool. if the added layer is added succesfully. if fails then raise exception queue is full.
         Complexity:
-        - Always O(BSet.__contains__+comp+BSet.add).
+        - Always O(BSet.add_unchecked).
         """
-        if layer.index+1 not in self.layer_store:
-            self.layer_store.add(layer.index+1)
+        self.catch_up()
+        if self.layer_store.add_unchecked(layer.index+1): #layer indices are trusted, no type check needed
+            self.notify()
             return True
         return False
 
@@ -259,14 +797,47 @@ class SequenceLayerStore(LayerStore):
         Raises: none
         Returns: bool. True if the added layer is erased succesfully. False if layer not in layer store.
         Complexity:
-        - Always O( BSet.__contains__+BSet.remove ).
+        - Always O(BSet.remove_unchecked).
         """
-        if layer.index in self.layer_store:
-            self.layer_store.remove(layer.index+1)
+        self.catch_up()
+        if self.layer_store.remove_unchecked(layer.index+1):
+            self.notify()
             return True
         return False
 
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+    def is_animated(self) -> bool:
+        """
+        Whether any applied layer depends on the timestamp.
+        Args: None
+        Raises: None
+        Returns: bool
+        Complexity:
+        - Always O(1), one bitwise and of the applied set with the time dependent layers
+        """
+        self.catch_up()
+        return self.layer_store.elems & layer_util.time_dependent_mask != 0
+
+    def time_key(self, timestamp, x, y):
+        """
+        Time keys of the applied animated layers.
+        Args: timestamp, x, y
+        Raises: None
+        Returns: tuple of Layer.time_key in index order, None if no layer is animated.
+        Complexity:
+        - Always O(A*Layer.time_key), A being the number of applied animated layers
+        """
+        animated = self.layer_store.elems & layer_util.time_dependent_mask
+        if animated == 0:
+            return None
+        layers = get_layers()
+        keys = []
+        while animated:
+            lowest = animated & -animated #lowest set bit
+            keys.append(layers[lowest.bit_length()-1].time_key(timestamp, x, y))
+            animated ^= lowest
+        return tuple(keys)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
         """
         Ensure this layer type is applied.
         Args: layer which is a Layer object
@@ -274,34 +845,147 @@ class SequenceLayerStore(LayerStore):
         Returns: color which is a tuple containg 3 integers.
         Complexity:
         -N is how many layer in layer store.
-        - Worst: O( N*__contains__*apply ). This happens when there are a lot of elements in self.layer_store.
-        - Best: O(__contains__*apply). This happens when there is only 1 element in self.layer_store.
+        - Always O(run_program). Consecutive lighten/darken/invert layers are applied as one lookup.
         """
-        color=start
-        for item in range(1, self.layer_store.elems.bit_length() + 1):
-            if item in self.layer_store:
-                color = get_layers()[item-1].apply(color, timestamp,x,y)
-        return color
+        return self.run_program(start, timestamp, x, y)
+
+    def layers(self):
+        """
+        The applied layers in order of index.
+        Args: None
+        Raises: None
+        Returns: list of Layer
+        Complexity:
+        - Always O(N), N being the number of applied layers. Only the set bits are visited
+        """
+        self.catch_up()
+        all_layers = get_layers()
+        return [all_layers[item-1] for item in self.layer_store]
+
+    def state_key(self):
+        """
+        The applied set, which is all the colour depends on. See LayerStore.state_key.
+        Args: None
+        Raises: None
+        Returns: int, BSet.elems
+        Complexity:
+        - Always O(catch_up)
+        """
+        self.catch_up()
+        return self.layer_store.elems
+
+    def content_key(self):
+        """
+        The applied set is everything the store holds, so this is state_key.
+        """
+        return self.state_key()
+
+    def clone(self) -> SequenceLayerStore:
+        """
+        A copy with a set of its own, see LayerStore.clone.
+        Args: None
+        Raises: None
+        Returns: SequenceLayerStore
+        Complexity:
+        - Always O(1), the set is a single int
+        """
+        store = LayerStore.clone(self)
+        store.layer_store = BSet.from_mask(self.layer_store.elems)
+        return store
+
+    def compile_program(self) -> tuple:
+        """
+        The compiled program of the applied set, shared with every other store applying the same set.
+        Args: None
+        Raises: None
+        Returns: tuple of steps, see layer_util.compile_runs
+        Complexity:
+        - Always O(program_of)
+        """
+        return SequenceLayerStore.program_of(self.layer_store.elems)
+
+    @staticmethod
+    def program_of(mask) -> tuple:
+        """
+        The compiled program applying the layers of the set in order of index, remembered in programs.
+        Args: mask which is the applied set (BSet.elems)
+        Raises: None
+        Returns: tuple of steps, see layer_util.compile_runs
+        Complexity:
+        - Worst: O(compile_layers(layers)), no store has used this set before
+        - Best: O(1), one dictionary lookup
+        """
+        program = SequenceLayerStore.programs.get(mask)
+        if program is None:
+            all_layers = get_layers()
+            program = compile_layers([all_layers[item-1] for item in BSet.from_mask(mask)])
+            SequenceLayerStore.programs[mask] = program
+        return program
 
     def special(self):
         """
-        Ensure this layer type is applied.
-        Args: layer which is a Layer object
-        Raises: none
-        Returns: bool. if the added layer is added succesfully. if fails then raise exception queue is full.
+        Of all currently applied layers, remove the one with median `name`.
+        Args: None
+        Raises: None
+        Returns: None
         Complexity:
-        - N is how many layer in layer store.
-        - Worst: O(ArraySortedList.__init__+BSet.is_empty+comp*sorted_layer.add+BSet.remove). This happens when there are a lot of element in self.layer_store.
-        - Best: The same because the amount of layer in get_layers is the same
-        """
-        sorted_layer=ArraySortedList(len(self.layer_store))
-        if not self.layer_store.is_empty():
-            for layer in get_layers():
-                if layer!=None and layer.index+1 in self.layer_store:
-                    layer_list_item=ListItem(layer,layer.name) #making list item with value layer and key layer.name. O(1).
-                    sorted_layer.add(layer_list_item) #adding to sorted list so it is automatically sorted. O(sorted_layer.add(layer_list_item))
-            median_index=int( (len(sorted_layer)/2)-0.5)
-            self.layer_store.remove(sorted_layer[median_index].value.index + 1)
+        - Worst: O(median_index+BSet.remove_unchecked), no store has done special on this set before
+        - Best: O(BSet.remove_unchecked), the median of the set is remembered in medians
+        """
+        self.catch_up()
+        mask = self.layer_store.elems
+        if mask == 0:
+            return
+        self.layer_store.remove_unchecked(SequenceLayerStore.median_of(mask) + 1)
+        self.notify()
+
+    @staticmethod
+    def median_of(mask) -> int:
+        """
+        median_index of the applied set, remembered in medians. Shared with the columnar grid backend.
+        Args: mask which is the applied set (BSet.elems), not empty
+        Raises: None
+        Returns: int, the layer index
+        Complexity:
+        - Worst: O(median_index), the first time this set is seen
+        - Best: O(1), one dictionary lookup
+        """
+        index = SequenceLayerStore.medians.get(mask)
+        if index is None:
+            index = SequenceLayerStore.median_index(mask)
+            SequenceLayerStore.medians[mask] = index
+        return index
+
+    @staticmethod
+    def median_index(mask) -> int:
+        """
+        Index of the applied layer with the median name, the smaller one of the two if there is an even number.
+        The set is rewritten with one bit per name rank (see layer_util.name_rank), then the lowest
+        bits are cleared until the median is the lowest one left.
+        Args: mask which is the applied set (BSet.elems), not empty
+        Raises: None
+        Returns: int, the layer index
+        Complexity:
+        - Always O(N), N being the number of applied layers
+        """
+        ranked = 0
+        for item in BSet.from_mask(mask):
+            ranked |= 1 << layer_util.name_rank[item-1]
+        for _ in range((mask.bit_count() - 1) // 2):
+            ranked &= ranked - 1 #clear the lowest set bit
+        return layer_util.name_order[(ranked & -ranked).bit_length()-1]
+
+    def apply_specials(self, count) -> None:
+        """
+        Do special count times in a row. Each special removes a layer, so once the store is empty the rest do nothing.
+        Args: count which is the number of specials
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(min(count, N)*special), N being how many layers are stored
+        """
+        for _ in range(min(count, len(self.layer_store))):
+            self.special()
 
 
 
@@ -10,6 +10,11 @@ from data_structures.referential_array import ArrayR
 
 LAYERS: ArrayR[Layer] = ArrayR(20)
 cur_layer_index = 0
+# Bit i is set if the layer with index i depends on the timestamp.
+time_dependent_mask = 0
+# Indices of the registered layers sorted by name, and the position of each index in that order.
+name_order: tuple[int, ...] = ()
+name_rank: tuple[int, ...] = ()
 
 @dataclass
 class Layer:
@@ -18,12 +23,197 @@ class Layer:
     apply: function
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
+    time_dependent: bool = field(init=False, default=True)
+    tick: function | None = field(init=False, default=None, repr=False, compare=False)
+    period: int | None = field(init=False, default=None)
+    lut: tuple[int, ...] | None = field(init=False, default=None, repr=False, compare=False)
+    opaque: bool = field(init=False, default=False)
+    choice: tuple | None = field(init=False, default=None, repr=False, compare=False)
+    uniform: bool = field(init=False, default=False)
+    apply_batch: function = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
+        self.time_dependent = not getattr(self.apply, "__static__", False)
+        if hasattr(self.apply, "__animated__"):
+            self.tick, self.period = self.apply.__animated__
+        self.opaque = getattr(self.apply, "__opaque__", False)
+        self.choice = getattr(self.apply, "__choice__", None)
+        self.uniform = getattr(self.apply, "__uniform__", False) or getattr(self.apply, "__pointwise__", False)
+        if getattr(self.apply, "__pointwise__", False):
+            self.lut = tuple(self.apply((c, c, c), 0, 0, 0)[0] for c in range(256))
+        self.apply_batch = getattr(self.apply, "__batch__", None) or loop_batch(self.apply)
         self.name = self.apply.__name__
 
+    def time_key(self, timestamp, x, y):
+        """
+        The part of the timestamp this layer's output at (x, y) depends on.
+        Two timestamps with the same key give the same colour, so the key can be used for caching.
+        None for static layers, and the timestamp itself for animated layers without a declared tick.
+        """
+        if not self.time_dependent:
+            return None
+        if self.tick is None:
+            return timestamp
+        step = self.tick(timestamp, x, y)
+        if self.period is None:
+            return step
+        return step % self.period
+
+class ChannelTable:
+    """
+    Stands in for a run of pointwise layers: the same 256-entry lookup table is applied to each channel.
+    Has the apply / apply_batch interface of a Layer.
+    """
+
+    uniform = True
+    time_dependent = False
+
+    def __init__(self, table: tuple[int, ...]) -> None:
+        self.table = table
+
+    def apply(self, color, timestamp, x, y):
+        table = self.table
+        return (table[color[0]], table[color[1]], table[color[2]])
+
+    def apply_batch(self, colors, timestamp, xs, ys):
+        if hasattr(colors, "shape"): # NumPy array, index the table with it in one go
+            import numpy as np
+            return np.asarray(self.table)[colors]
+        return [self.apply(color, timestamp, x, y) for color, x, y in zip(colors, xs, ys)]
+
+class ChoiceTables:
+    """
+    Stands in for a run of a choice layer (see choice): each square picks one of the layer's pointwise options
+    the same way for every copy, so the run is that option's lookup table applied count times.
+    Has the apply / apply_batch / time_key interface of a Layer.
+    """
+
+    uniform = False
+    time_dependent = True
+
+    def __init__(self, layer: Layer, count: int, tables=None) -> None:
+        self.layer = layer
+        self.count = count
+        options, self.pick, self.pick_batch = layer.choice
+        self.tables = tables if tables is not None else tuple(table_power(option.lut, count) for option in options())
+
+    def once_more(self) -> ChoiceTables:
+        """The step for a run one copy longer, one table composition per option."""
+        options = self.layer.choice[0]()
+        return ChoiceTables(self.layer, self.count + 1, tuple(compose_tables(table, option.lut) for table, option in zip(self.tables, options)))
+
+    def time_key(self, timestamp, x, y):
+        return self.layer.time_key(timestamp, x, y)
+
+    def apply(self, color, timestamp, x, y):
+        table = self.tables[self.pick(timestamp, x, y)]
+        return (table[color[0]], table[color[1]], table[color[2]])
+
+    def apply_batch(self, colors, timestamp, xs, ys):
+        if self.pick_batch is not None and hasattr(colors, "shape"): # NumPy array, one table row per square
+            import numpy as np
+            tables = np.asarray(self.tables)[self.pick_batch(timestamp, xs, ys)]
+            return np.take_along_axis(tables, colors, axis=1)
+        return [self.apply(color, timestamp, x, y) for color, x, y in zip(_as_list(colors), _as_list(xs), _as_list(ys))]
+
+def compose_tables(first: tuple[int, ...], second: tuple[int, ...]) -> tuple[int, ...]:
+    """Lookup table doing `first` then `second`."""
+    return tuple(second[c] for c in first)
+
+def table_power(table: tuple[int, ...], count: int) -> tuple[int, ...]:
+    """
+    Lookup table doing `table` count times in a row, by repeated squaring:
+    O(log count) compositions rather than count of them.
+    """
+    result = tuple(range(256))
+    while count > 0:
+        if count & 1:
+            result = compose_tables(result, table)
+        table = compose_tables(table, table)
+        count >>= 1
+    return result
+
+def compile_layers(layers, program=()) -> tuple:
+    """
+    Steps applying the given layers in order, after the steps of an already compiled program.
+    Every run of consecutive pointwise layers becomes a single ChannelTable, so it costs
+    one lookup per channel however many layers the run has.
+    Steps before an opaque layer are dropped, as they can't affect the result.
+    """
+    return compile_runs(((layer, 1) for layer in layers), program)
+
+def compile_runs(runs, program=()) -> tuple:
+    """
+    Same as compile_layers, for (layer, count) pairs standing for count copies of a layer in a row.
+    A pointwise layer repeated count times costs O(log count) table compositions, as does a choice layer
+    (a ChoiceTables step), and an opaque one is applied once. Only other layers need a step per copy.
+    """
+    steps = list(program)
+    for layer, count in runs:
+        if layer.opaque:
+            steps = [layer]
+        elif layer.lut is None:
+            if layer.choice is not None and count > 1:
+                steps.append(ChoiceTables(layer, count))
+            else:
+                steps.extend([layer] * count)
+        else:
+            table = layer.lut if count == 1 else table_power(layer.lut, count)
+            if len(steps) > 0 and isinstance(steps[-1], ChannelTable):
+                steps[-1] = ChannelTable(compose_tables(steps[-1].table, table))
+            else:
+                steps.append(ChannelTable(table))
+    return tuple(steps)
+
+def extend_program(program, layer) -> tuple:
+    """
+    Same as compile_layers((layer,), program), but a choice layer continuing the run the program ends with
+    grows that run's step instead of adding one, so the result is the compile_runs of the longer run.
+    """
+    last = program[-1] if len(program) > 0 else None
+    if layer.choice is not None and last is layer:
+        return program[:-1] + (ChoiceTables(layer, 2),)
+    if isinstance(last, ChoiceTables) and last.layer is layer:
+        return program[:-1] + (last.once_more(),)
+    return compile_layers((layer,), program)
+
+def run_batch(program, start, timestamp, xs, ys) -> list:
+    """
+    Colours of the squares at (xs[i], ys[i]) which all run the same compiled program from the same start colour.
+    If every step is uniform the colour is the same everywhere and is worked out once,
+    otherwise each step makes one apply_batch call over all the squares.
+    """
+    if len(xs) == 0:
+        return []
+    start = tuple(start)
+    if all(step.uniform for step in program):
+        color = start
+        for step in program:
+            color = step.apply(color, timestamp, xs[0], ys[0])
+        return [color] * len(xs)
+    colors = [start] * len(xs)
+    for step in program:
+        colors = step.apply_batch(colors, timestamp, xs, ys)
+    return [tuple(int(v) for v in color) for color in _as_list(colors)]
+
+def _as_list(values):
+    """Plain python list from either a list or a NumPy array."""
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+def loop_batch(func):
+    """
+    Batch form of a layer function which has none of its own.
+    Applies the function to each colour in turn and returns a list of colours.
+    """
+    def apply_batch(colors, timestamp, xs, ys):
+        return [
+            func(tuple(color), timestamp, x, y)
+            for color, x, y in zip(_as_list(colors), _as_list(xs), _as_list(ys))
+        ]
+    return apply_batch
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,6 +233,159 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
+def static(layer: function|Layer):
+    """Simple decorator marking a layer whose output ignores the timestamp.
+    Layers without it are assumed to animate.
+
+    Usage:  @register
+            @static
+            def my_still_layer(...):
+    """
+    global time_dependent_mask
+    # This could be applied before or after registration
+    if isinstance(layer, Layer):
+        layer.apply.__static__ = True
+        layer.time_dependent = False
+        time_dependent_mask &= ~(1 << layer.index)
+    else:
+        layer.__static__ = True
+    return layer
+
+class batch(object):
+    """Simple decorator to give a layer an array form.
+
+    The batch function takes N colours (an N x 3 array), one timestamp,
+    and the N x and y coordinates, and returns the N resulting colours.
+    Layers without one loop over their scalar function instead.
+
+    Usage:  @register
+            @batch(my_special_layer_batch)
+            def my_special_layer(...):
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            layer.apply.__batch__ = self.func
+            layer.apply_batch = self.func
+        else:
+            layer.__batch__ = self.func
+        return layer
+
+def opaque(layer: function|Layer):
+    """Simple decorator marking a layer whose output ignores the colour it is applied to,
+    so any layer applied before it has no effect.
+
+    Usage:  @register
+            @opaque
+            def my_paint_layer(...):
+    """
+    # This could be applied before or after registration
+    if isinstance(layer, Layer):
+        layer.apply.__opaque__ = True
+        layer.opaque = True
+    else:
+        layer.__opaque__ = True
+    return layer
+
+def uniform(layer: function|Layer):
+    """Simple decorator marking a layer whose output only depends on the colour it is applied to,
+    ignoring the timestamp and the position. Implies static.
+    Squares with the same uniform layers all get the same colour, so it is worked out once (see run_batch).
+
+    Usage:  @register
+            @uniform
+            def my_flat_layer(...):
+    """
+    global time_dependent_mask
+    # This could be applied before or after registration
+    if isinstance(layer, Layer):
+        layer.apply.__uniform__ = True
+        layer.apply.__static__ = True
+        layer.uniform = True
+        layer.time_dependent = False
+        time_dependent_mask &= ~(1 << layer.index)
+    else:
+        layer.__uniform__ = True
+        layer.__static__ = True
+    return layer
+
+def pointwise(layer: function|Layer):
+    """Simple decorator marking a layer which applies the same function 0..255 -> 0..255
+    to each channel, regardless of the timestamp and position. Implies uniform.
+    Runs of such layers are composed into one lookup table (see compile_layers).
+
+    Usage:  @register
+            @pointwise
+            def my_channel_layer(...):
+    """
+    global time_dependent_mask
+    # This could be applied before or after registration
+    if isinstance(layer, Layer):
+        layer.apply.__pointwise__ = True
+        layer.apply.__static__ = True
+        layer.uniform = True
+        layer.time_dependent = False
+        layer.lut = tuple(layer.apply((c, c, c), 0, 0, 0)[0] for c in range(256))
+        time_dependent_mask &= ~(1 << layer.index)
+    else:
+        layer.__pointwise__ = True
+        layer.__static__ = True
+    return layer
+
+class choice(object):
+    """Simple decorator to declare a layer which, at each square, applies one of a few pointwise layers,
+    picked by the timestamp and position and never by the colour.
+    A run of such a layer then applies the picked layer count times, so it is compiled into lookup tables
+    (see ChoiceTables) rather than a step per copy.
+
+    options() gives the pointwise layers, it is only called when compiling so they can be defined later.
+    pick(timestamp, x, y) gives the position of the picked one in options(),
+    and pick_batch(timestamp, xs, ys), if given, the positions for many squares as a NumPy array.
+
+    Usage:  @register
+            @choice(lambda: (darken, lighten), lambda timestamp, x, y: int(timestamp) % 2)
+            def my_flickering_layer(...):
+    """
+    def __init__(self, options, pick, pick_batch=None):
+        self.val = (options, pick, pick_batch)
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.choice = self.val
+        else:
+            func = layer
+        func.__choice__ = self.val
+        return layer
+
+class animated(object):
+    """Simple decorator to declare how an animated layer changes over time.
+
+    tick(timestamp, x, y) gives the time step (quantum of time) the square is in,
+    and the layer's output only changes when the tick does.
+    If the output repeats every `period` ticks, only the tick modulo period matters.
+
+    Usage:  @register
+            @animated(lambda timestamp, x, y: int(timestamp * 4), period=10)
+            def my_flashing_layer(...):
+    """
+    def __init__(self, tick, period=None):
+        self.val = (tick, period)
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.tick, layer.period = self.val
+        else:
+            func = layer
+        func.__animated__ = self.val
+        return layer
+
 def register(func):
     """
     Layer register function.
@@ -53,9 +396,17 @@ def register(func):
     In order to actually confirm this registration,
     you'll need to import the file containing the layer definition
     """
-    global cur_layer_index
+    global cur_layer_index, time_dependent_mask, name_order, name_rank
     LAYERS[cur_layer_index] = Layer(cur_layer_index, func)
+    if LAYERS[cur_layer_index].time_dependent:
+        time_dependent_mask |= 1 << cur_layer_index
     cur_layer_index += 1
+    # Names never change once registered, so the order is only worked out here.
+    name_order = tuple(sorted(range(cur_layer_index), key=lambda index: (LAYERS[index].name, index)))
+    ranks = [0] * cur_layer_index
+    for rank, index in enumerate(name_order):
+        ranks[index] = rank
+    name_rank = tuple(ranks)
     return LAYERS[cur_layer_index-1]
 
 def get_layers():
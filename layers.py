@@ -3,23 +3,156 @@ All layers are defined here.
 """
 
 import colorsys
-from layer_util import background, register
+import math
+from layer_util import animated, background, batch, choice, opaque, pointwise, register, uniform
 
-@register
-@background(200, 0, 120)
-def rainbow(color, timestamp, x, y):
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, layers then fall back to looping over their scalar form.
+    np = None
+
+def numpy_batch(kernel):
+    """Decorator using a NumPy kernel as the batch form of a layer, if NumPy is installed."""
+    if np is None:
+        return lambda layer: layer
+    return batch(kernel)
+
+def rainbow_hue(timestamp, x, y):
+    """Hue of the rainbow layer at (x, y)."""
+    return (timestamp/20 + x/20 + y/20)%1
+
+def _rainbow_hls(hue):
     return tuple(
         int(255*x)
-        for x in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6)
+        for x in colorsys.hls_to_rgb(hue, 0.6, 0.6)
     )
 
+# Rainbow colours at its fixed lightness and saturation, for hues i/RAINBOW_TABLE_SIZE <= hue < (i+1)/RAINBOW_TABLE_SIZE.
+# Each channel only goes up then down (or down then up) over such a small range of hues, so when both ends of
+# the range give the same colour every hue in between does too. The few ranges where a channel steps to the next
+# integer hold None, and their hues are worked out in full. The table size is a power of two so that
+# hue*RAINBOW_TABLE_SIZE is exact and picks the range the hue is really in.
+RAINBOW_TABLE_SIZE = 1 << 14
+rainbow_table = tuple(
+    rgb if rgb == _rainbow_hls(math.nextafter((i + 1)/RAINBOW_TABLE_SIZE, 0)) else None
+    for i, rgb in ((i, _rainbow_hls(i/RAINBOW_TABLE_SIZE)) for i in range(RAINBOW_TABLE_SIZE))
+)
+
+def rainbow_rgb(hue):
+    """Rainbow colour of a hue, looked up in rainbow_table. The same as colorsys.hls_to_rgb(hue, 0.6, 0.6) scaled to 0..255."""
+    rgb = rainbow_table[int(hue*RAINBOW_TABLE_SIZE)]
+    if rgb is None:
+        return _rainbow_hls(hue)
+    return rgb
+
+if np is not None:
+    _rainbow_array = np.array([(-1, -1, -1) if rgb is None else rgb for rgb in rainbow_table], dtype=np.int64)
+
+def _rainbow_batch(colors, timestamp, xs, ys):
+    # The same sums as rainbow_hue, on every square at once, then one lookup in the table per square.
+    hue = (timestamp/20 + np.asarray(xs)/20 + np.asarray(ys)/20)%1
+    rgb = _rainbow_array[(hue*RAINBOW_TABLE_SIZE).astype(np.int64)]
+    for i in np.flatnonzero(rgb[:, 0] < 0).tolist(): #hues the table has no single colour for
+        rgb[i] = _rainbow_hls(float(hue[i]))
+    return rgb
+
+# Sparkle's linear congruential generator: x -> (LCG_MULT*x + LCG_INC) % LCG_MOD.
+LCG_MULT = 1103515245
+LCG_INC = 12345
+LCG_MOD = 1 << 31
+
+def lcg_jump(steps):
+    """
+    Multiplier and increment of the generator applied `steps` times in a row,
+    so that x -> (mult*x + inc) % LCG_MOD gives the same number as `steps` single steps.
+    Squares the affine map, so it takes O(log steps) multiplications.
+    """
+    mult, inc = 1, 0
+    step_mult, step_inc = LCG_MULT, LCG_INC
+    while steps:
+        if steps & 1:
+            mult, inc = (step_mult*mult) % LCG_MOD, (step_mult*inc + step_inc) % LCG_MOD
+        step_mult, step_inc = (step_mult*step_mult) % LCG_MOD, (step_mult*step_inc + step_inc) % LCG_MOD
+        steps >>= 1
+    return mult, inc
+
+# Sparkle runs the generator 10 + (ts*31 % 17) times, so only 17 jumps are ever needed.
+SPARKLE_JUMPS = tuple(lcg_jump(10 + k) for k in range(17))
+
+def _sparkle_tick(timestamp, x, y):
+    """Sparkle changes three times per time unit, with each square offset by x/3 + y/5."""
+    return int((timestamp + x/3 + y/5) * 3)
+
+def _sparkle_lights(timestamp, x, y):
+    """Whether sparkle lightens (rather than darkens) the square at this time."""
+    ts = _sparkle_tick(timestamp, x, y)
+    mult, inc = SPARKLE_JUMPS[ts * 31 % 17]
+    other = (mult * x + inc) % LCG_MOD
+    other += y
+    other = (mult * other + inc) % LCG_MOD
+    other = (other & (LCG_MOD-1)) >> 16
+    return other/(1 << 15) < 0.1
+
+def _sparkle_pick(timestamp, x, y):
+    """Position of the layer sparkle applies at the square in (darken, lighten)."""
+    return 1 if _sparkle_lights(timestamp, x, y) else 0
+
+def _sparkle_lights_batch(timestamp, xs, ys):
+    """_sparkle_lights of every square at once, as a NumPy array of bools."""
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    ts = np.trunc((timestamp + xs/3 + ys/5) * 3).astype(np.int64)
+    jumps = np.array(SPARKLE_JUMPS, dtype=np.int64)[ts * 31 % 17]
+    mult, inc = jumps[:, 0], jumps[:, 1]
+    # Both factors stay below 2^32, so the products fit in int64.
+    other = (mult * xs + inc) % LCG_MOD
+    other += ys
+    other = (mult * other + inc) % LCG_MOD
+    other = (other & (LCG_MOD-1)) >> 16
+    return other/(1 << 15) < 0.1
+
+def _sparkle_pick_batch(timestamp, xs, ys):
+    return _sparkle_lights_batch(timestamp, xs, ys).astype(np.int64)
+
+def _sparkle_batch(colors, timestamp, xs, ys):
+    lights = _sparkle_lights_batch(timestamp, xs, ys).reshape(-1, 1)
+    return np.where(lights, _lighten_batch(colors, timestamp, xs, ys), _darken_batch(colors, timestamp, xs, ys))
+
+def _fill_batch(color):
+    """Batch form of a layer which always returns the same colour."""
+    def kernel(colors, timestamp, xs, ys):
+        return np.tile(np.array(color, dtype=np.int64), (len(colors), 1))
+    return kernel
+
+def _lighten_batch(colors, timestamp, xs, ys):
+    return np.minimum(np.asarray(colors, dtype=np.int64) + 40, 255)
+
+def _invert_batch(colors, timestamp, xs, ys):
+    return 255 - np.asarray(colors, dtype=np.int64)
+
+def _darken_batch(colors, timestamp, xs, ys):
+    return np.maximum(np.asarray(colors, dtype=np.int64) - 40, 0)
+
+@register
+@background(200, 0, 120)
+@animated(rainbow_hue)
+@opaque
+@numpy_batch(_rainbow_batch)
+def rainbow(color, timestamp, x, y):
+    return rainbow_rgb(rainbow_hue(timestamp, x, y))
+
 @register
 @background(170, 170, 170)
+@uniform
+@opaque
+@numpy_batch(_fill_batch((0, 0, 0)))
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
 @register
 @background(240, 240, 240)
+@pointwise
+@numpy_batch(_lighten_batch)
 def lighten(color, timestamp, x, y):
     return tuple(
         min(255, x + 40)
@@ -28,6 +161,8 @@ def lighten(color, timestamp, x, y):
 
 @register
 @background(0, 255, 255)
+@pointwise
+@numpy_batch(_invert_batch)
 def invert(color, timestamp, x, y):
     return tuple(
         255 - c
@@ -36,37 +171,42 @@ def invert(color, timestamp, x, y):
 
 @register
 @background(255, 0, 0)
+@uniform
+@opaque
+@numpy_batch(_fill_batch((255, 0, 0)))
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
 @register
 @background(0, 255, 0)
+@uniform
+@opaque
+@numpy_batch(_fill_batch((0, 255, 0)))
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
 @register
 @background(0, 0, 255)
+@uniform
+@opaque
+@numpy_batch(_fill_batch((0, 0, 255)))
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
 @register
 @background(100, 170, 255)
+@animated(_sparkle_tick, period=17)
+@choice(lambda: (darken, lighten), _sparkle_pick, _sparkle_pick_batch if np is not None else None)
+@numpy_batch(_sparkle_batch)
 def sparkle(color, timestamp, x, y):
-    ts = int((timestamp + x/3 + y/5) * 3)
-    other = x
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    other += y
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    ts = int((timestamp + x/10 + y/20) * 3)
-    other = (other & ((1 << 31)-1)) >> 16
-    if other/(1 << 15) < 0.1:
+    if _sparkle_lights(timestamp, x, y):
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
 @register
 @background(30, 30, 30)
+@pointwise
+@numpy_batch(_darken_batch)
 def darken(color, timestamp, x, y):
     return tuple(
         max(0, x - 40)
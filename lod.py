@@ -0,0 +1,229 @@
+"""
+Level of detail pyramid of the grid colours.
+
+Level 0 has the colour of every square. Each level above it has half the
+squares in each direction, every entry being the average of the (up to) four
+entries below it, until a single entry is left. Once squares are smaller than
+a screen pixel the renderer draws a level where an entry is about one pixel,
+so the cost of a frame follows the size of the screen and not of the grid.
+
+The pyramid is kept up to date from the grid's dirty squares (see
+Grid.dirty_cells): only the changed squares and the entries above them are
+worked out again. Squares with animated layers change without being dirtied.
+Rather than working all of them out again on every frame, which would cost as
+much as the animated part of the grid, an entry of the level being drawn with
+animated squares below it shows the square at its corner, worked out when it
+is read (see colors). A frame then costs one evaluation per entry drawn at most.
+"""
+
+from __future__ import annotations
+from layer_util import run_batch
+
+class ColorPyramid:
+
+    def __init__(self, grid) -> None:
+        """
+        Args:
+        -grid: the Grid whose colours are kept, the pyramid clears its dirty squares
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1), the levels are built by the first update
+        """
+        self.grid = grid
+        self.levels = [] #flat colour lists, entry (x, y) of level k at index x*sizes[k][1]+y
+        self.sizes = [] #(width, height) of each level
+        self.animated = set() #(x, y) of the squares with animated layers
+        self.animated_counts = [] #per level, entry (x, y) -> number of animated squares below it, for the entries with any
+        self.start = None #background colour the levels were built with
+
+    def update(self, start, timestamp) -> None:
+        """
+        Bring the levels up to date with the grid's changes, then clear the grid's dirty squares.
+        Animated squares are not worked out again here, see colors.
+        A grid special changes every square, so it rebuilds the whole pyramid.
+        Args:
+        -start: background colour
+        -timestamp: time, for the dirty squares which are animated
+        Raises: None
+        Returns: None
+        Complexity:
+        - Worst: O(Grid.get_colors+x*y), every square is dirty (e.g. after Grid.special) or the background changed
+        - Best: O(D*(LayerStore.state_key+apply+log(max(x, y)))), D being the number of dirty squares
+        """
+        if self.grid.all_dirty or start != self.start:
+            self.rebuild(start, timestamp)
+        else:
+            dirty = self.grid.dirty_cells()
+            groups = {} #state_key -> (program, (x, y) of the dirty squares with the state)
+            for x, y in dirty:
+                store = self.grid[x][y]
+                key = store.state_key()
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = (store.compiled_program(), [])
+                group[1].append((x, y))
+            for program, cells in groups.values():
+                self.evaluate(program, cells, start, timestamp)
+                animated = any(step.time_dependent for step in program)
+                for x, y in cells:
+                    self.set_animated(x, y, animated)
+            self.propagate(dirty)
+        self.grid.clear_dirty()
+
+    def evaluate(self, program, cells, start, timestamp) -> None:
+        """
+        Set the entries of level 0 for squares running the same program, in one batch.
+        Args:
+        -program: compiled program of the squares, see layer_util.run_batch
+        -cells: (x, y) of the squares
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(run_batch), O(S*C), S being the number of steps and C the number of squares
+        """
+        xs = [x for x, y in cells]
+        ys = [y for x, y in cells]
+        base = self.levels[0]
+        height = self.sizes[0][1]
+        for x, y, color in zip(xs, ys, run_batch(program, start, timestamp, xs, ys)):
+            base[x * height + y] = color
+
+    def set_animated(self, x, y, animated: bool) -> None:
+        """
+        Record whether the square at (x, y) is animated, counting it in the entry above it at every level.
+        Complexity:
+        - Worst: O(log(max(x, y))), the square became animated or stopped being
+        - Best: O(1)
+        """
+        if ((x, y) in self.animated) == animated:
+            return
+        if animated:
+            self.animated.add((x, y))
+        else:
+            self.animated.discard((x, y))
+        for level, counts in enumerate(self.animated_counts):
+            entry = (x >> level, y >> level)
+            count = counts.get(entry, 0) + (1 if animated else -1)
+            if count == 0:
+                del counts[entry]
+            else:
+                counts[entry] = count
+
+    def rebuild(self, start, timestamp) -> None:
+        """
+        Build every level from scratch.
+        Level 0 is worked out like Grid.get_colors, one group of squares with the same state at a time,
+        which also tells which squares are animated without asking each of them.
+        Complexity:
+        - Always O(Grid.get_colors+x*y+A*log(max(x, y))), the levels above level 0 add up to a third of it,
+        A being the number of animated squares
+        """
+        self.start = start
+        width, height = self.grid.x, self.grid.y
+        base = [None] * (width * height)
+        animated = []
+        for program, cells in self.grid.buckets():
+            cells = self.grid.bucket_indices(cells)
+            xs = [index // height for index in cells]
+            ys = [index % height for index in cells]
+            for index, color in zip(cells, run_batch(program, start, timestamp, xs, ys)):
+                base[index] = color
+            if any(step.time_dependent for step in program):
+                animated.extend(zip(xs, ys))
+        self.levels = [base]
+        self.sizes = [(width, height)]
+        while width > 1 or height > 1:
+            width = (width + 1) // 2
+            height = (height + 1) // 2
+            self.levels.append([None] * (width * height))
+            self.sizes.append((width, height))
+            for x in range(width):
+                for y in range(height):
+                    self.average(len(self.levels) - 1, x, y)
+        self.animated = set()
+        self.animated_counts = [{} for _ in self.levels]
+        for x, y in animated:
+            self.set_animated(x, y, True)
+
+    def propagate(self, changed) -> None:
+        """
+        Work out again the entries above the changed entries of level 0, one level at a time.
+        Args:
+        -changed: set of (x, y) of level 0
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(C*log(max(x, y))), C being the number of changed entries
+        """
+        for level in range(1, len(self.levels)):
+            changed = set((x // 2, y // 2) for x, y in changed)
+            for x, y in changed:
+                self.average(level, x, y)
+
+    def average(self, level: int, x: int, y: int) -> None:
+        """
+        Set entry (x, y) of the level to the average of the entries below it.
+        Complexity:
+        - Always O(1), at most four entries are read
+        """
+        below = self.levels[level - 1]
+        width, height = self.sizes[level - 1]
+        red = green = blue = count = 0
+        for bx in range(2 * x, min(2 * x + 2, width)):
+            for by in range(2 * y, min(2 * y + 2, height)):
+                color = below[bx * height + by]
+                red += color[0]
+                green += color[1]
+                blue += color[2]
+                count += 1
+        self.levels[level][x * self.sizes[level][1] + y] = (red // count, green // count, blue // count)
+
+    def level_for(self, square_width, square_height) -> int:
+        """
+        The lowest level whose entries are at least a pixel on the screen.
+        Args:
+        -square_width, square_height: size of a grid square on the screen
+        Raises: None
+        Returns: int, 0 if the squares are a pixel or more
+        Complexity:
+        - Always O(log(max(x, y)))
+        """
+        level = 0
+        size = min(square_width, square_height)
+        while size < 1 and level < len(self.levels) - 1:
+            size *= 2
+            level += 1
+        return level
+
+    def colors(self, level: int, area, timestamp):
+        """
+        The entries of the level covering area. An entry with animated squares below it is the colour at timestamp
+        of the square at its corner, like a pixel sampling the grid there, the others are the kept averages.
+        Args:
+        -level: the level to read
+        -area: (x0, x1, y0, y1) in level 0 squares, see Viewport.visible
+        -timestamp: time, for the animated entries
+        Raises: None
+        Returns: (x0, x1, y0, y1) of the entries in the level, and their colours in order of x then y
+        Complexity:
+        - Always O(E+N*LayerStore.get_color), E being the number of entries returned and N the number of them
+        with animated squares below them
+        """
+        x0, x1, y0, y1 = area
+        scale = 1 << level
+        x0, y0 = x0 // scale, y0 // scale
+        x1, y1 = -(-x1 // scale), -(-y1 // scale)
+        entries = self.levels[level]
+        height = self.sizes[level][1]
+        colors = [entries[x * height + y] for x in range(x0, x1) for y in range(y0, y1)]
+        counts = self.animated_counts[level]
+        if len(counts) > 0:
+            index = 0
+            for x in range(x0, x1):
+                for y in range(y0, y1):
+                    if (x, y) in counts:
+                        sx, sy = x * scale, y * scale
+                        colors[index] = self.grid[sx][sy].get_color(self.start, timestamp, sx, sy)
+                    index += 1
+        return (x0, x1, y0, y1), colors
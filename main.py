@@ -7,6 +7,8 @@ from layers import lighten
 from undo import UndoTracker
 from replay import ReplayTracker
 from action import PaintStep,PaintAction
+from renderer import GridRenderer
+from viewport import Viewport
 
 class MyWindow(arcade.Window):
     """ Painter Window """
@@ -22,6 +24,15 @@ class MyWindow(arcade.Window):
     GRID_SIZE_X = 32
     GRID_SIZE_Y = 32
 
+    # Draw the grid as one vertex buffer per frame instead of one rectangle per square.
+    BATCHED_RENDER = True
+    # How the grid stores its squares. Sparse grids are made in constant time and only keep the painted squares,
+    # Grid.STORAGE_COLUMNAR uses far less memory on large, heavily painted grids.
+    GRID_STORAGE = Grid.STORAGE_SPARSE
+    # Zoom factor of one mouse wheel step and distance in pixels of one arrow key press, see Viewport.
+    ZOOM_STEP = 1.25
+    PAN_STEP = 50
+
     BG = [255, 255, 255]
 
     # SCAFFOLD PART
@@ -45,7 +56,7 @@ class MyWindow(arcade.Window):
 
     def reset(self) -> None:
         """Reset the screen."""
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y, storage=self.GRID_STORAGE)
         self.timestamp = 0
 
         self.selected_layer_index = -1
@@ -59,6 +70,8 @@ class MyWindow(arcade.Window):
         self.GRID_SQ_WIDTH = self.DRAW_PANEL / self.GRID_SIZE_X
         self.GRID_SQ_HEIGHT = self.SCREEN_HEIGHT / self.GRID_SIZE_Y
         self.LAYER_BUTTON_SIZE = self.SIDEBAR_WIDTH / 2
+        self.viewport = Viewport(self.DRAW_PANEL, self.SCREEN_HEIGHT, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.grid_renderer = GridRenderer(self.GRID_SIZE_X, self.GRID_SIZE_Y, self.GRID_SQ_WIDTH, self.GRID_SQ_HEIGHT)
         # Action button sprites
         self.action_buttons = arcade.SpriteList()
         self.draw_mode_button = arcade.Sprite(
@@ -108,6 +121,22 @@ class MyWindow(arcade.Window):
     def on_draw(self) -> None:
         """Draw everything"""
         self.clear()
+        # Grid, first so that squares partly outside the view are covered by the UI
+        if self.BATCHED_RENDER:
+            self.grid_renderer.draw(self.grid, self.BG[:], self.timestamp, self.viewport)
+        else:
+            width, height = self.viewport.square_size()
+            x0, x1, y0, y1 = self.viewport.visible()
+            for x in range(x0, x1):
+                for y in range(y0, y1):
+                    left, bottom = self.viewport.to_screen(x, y)
+                    arcade.draw_lrtb_rectangle_filled(
+                        left,
+                        left + width,
+                        bottom + height,
+                        bottom,
+                        self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y) #print('self.grid[x][y] is bool'+isinstance(self.grid[x][y],bool) )
+                    )
         # UI - Layers
         for i, layer in enumerate(get_layers()):
             if layer is None: break
@@ -125,16 +154,6 @@ class MyWindow(arcade.Window):
             arcade.draw_text(str(i), xstart, (ystart+yend)/2, (0, 0, 0), 18, width=xend-xstart, align="center", bold=True, anchor_y="center")
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
-        # Grid
-        for x in range(self.GRID_SIZE_X):
-            for y in range(self.GRID_SIZE_Y):
-                arcade.draw_lrtb_rectangle_filled(
-                    self.GRID_SQ_WIDTH * x,
-                    self.GRID_SQ_WIDTH * (x+1),
-                    self.GRID_SQ_HEIGHT * (y+1),
-                    self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y) #print('self.grid[x][y] is bool'+isinstance(self.grid[x][y],bool) )
-                )
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
@@ -192,6 +211,12 @@ class MyWindow(arcade.Window):
         self.prev_drawn = None
         self.prev_pos = None
 
+    def on_mouse_scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
+        """Called when the mouse wheel is turned, zooms the grid around the pointer."""
+        if x > self.DRAW_PANEL:
+            return
+        self.viewport.zoom_at(self.ZOOM_STEP ** scroll_y, x, y)
+
     def on_mouse_motion(self, x, y, dx, dy) -> None:
         """Called when the mouse moves."""
         if not self.dragging:
@@ -204,6 +229,15 @@ class MyWindow(arcade.Window):
 
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
+        # Arrow keys pan the grid, which only changes the view
+        if symbol == keys.LEFT:
+            self.viewport.pan(-self.PAN_STEP, 0)
+        elif symbol == keys.RIGHT:
+            self.viewport.pan(self.PAN_STEP, 0)
+        elif symbol == keys.UP:
+            self.viewport.pan(0, self.PAN_STEP)
+        elif symbol == keys.DOWN:
+            self.viewport.pan(0, -self.PAN_STEP)
         if not self.enable_ui:
             return
         self.z_pressed = keys.Z == symbol and (modifiers & keys.MOD_CTRL)
@@ -234,14 +268,10 @@ class MyWindow(arcade.Window):
                 distance = min(d * increment / mhat_dist, 1)
                 nx = distance * (x - self.prev_pos[0]) + self.prev_pos[0]
                 ny = distance * (y - self.prev_pos[1]) + self.prev_pos[1]
-                nx_pos = int(nx // self.GRID_SQ_WIDTH)
-                ny_pos = int(ny // self.GRID_SQ_HEIGHT)
-                points_to_draw.append((nx_pos, ny_pos))
+                points_to_draw.append(self.viewport.to_grid(nx, ny))
         else:
-            x_pos = int(x // self.GRID_SQ_WIDTH)
-            y_pos = int(y // self.GRID_SQ_HEIGHT)
             points_to_draw = [
-                (x_pos, y_pos)
+                self.viewport.to_grid(x, y)
             ]
         for px, py in points_to_draw:
             if self.prev_drawn is None or (px, py) != self.prev_drawn:
@@ -253,7 +283,7 @@ class MyWindow(arcade.Window):
     def start_replay(self) -> None:
         """Begin the replay mode."""
         self.enable_ui = False
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y, storage=self.GRID_STORAGE)
         self.replay_timer = self.REPLAY_TIMER_DELTA
         self.on_replay_start()
 
@@ -325,20 +355,13 @@ class MyWindow(arcade.Window):
         Raises: None
         Returns: Nothing. But paints the layer stores.
         Complexity:
-        - worst: O(self.grid.x*self.grid.y(comp+layer_store.add+PaintAction.add_step) + undo_tracker.add_action+replay_tracker.add_action).
-        x and y are the dimensions of the grid. meaning it needs to loop through each layer stores.
-        - best: O( comp+layer_store.add+PaintAction.add_step + undo_tracker.add_action+replay_tracker.add_action )
-        when self.grid.x=1 and self.grid.y=1. meaning only need to loop through one layer store.
+        - Always O(Grid.paint+C*PaintAction.add_step + undo_tracker.add_action+replay_tracker.add_action).
+        C being the number of squares which changed, only the squares under the brush are visited.
         """
         paint_step_list=PaintAction()
-        for x in range( self.grid.x):
-            for y in range(self.grid.y):
-                man_dist=abs(px-x)+abs(py-y)
-                if man_dist<=self.grid.brush_size:
-                    painted_square=self.grid[x][y].add(layer)
-                    if painted_square:
-                        paint_square_step=PaintStep((x,y),layer)
-                        paint_step_list.add_step(paint_square_step)
+        for x, y in self.grid.paint(layer, px, py):
+            paint_square_step=PaintStep((x,y),layer)
+            paint_step_list.add_step(paint_square_step)
         self.undo_tracker.add_action(paint_step_list)
         self.replay_tracker.add_action(paint_step_list)
 
@@ -0,0 +1,361 @@
+"""
+Quadtree grid backend.
+
+Keeps the grid as a quadtree of rectangular regions. A leaf is a region whose
+squares all hold the same layers and is given a single LayerStore for all of
+them. Painting a region which the brush covers whole adds the layer to its
+store once. A region the brush only partly covers is split into quarters
+first, and quarters which end up holding the same layers are merged back.
+Splitting does not copy the store: the quarters share it, and a quarter only
+copies it when it is changed (see LayerStore.clone).
+
+grid[x][y] gives a short lived handle with the LayerStore interface, as with the columnar backend.
+"""
+
+from __future__ import annotations
+from layer_util import Layer
+from layer_store import LayerStore, SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+
+class Areas(list):
+    """
+    The squares of a bucket of a quadtree grid, as (x0, x1, y0, y1) rectangles of squares
+    x0 <= x < x1 and y0 <= y < y1, one per leaf. See Grid.buckets.
+    """
+
+class QuadCell:
+    """
+    One square of a quadtree grid, with the interface of a LayerStore.
+    Reads go to the store of the leaf the square is in, changes first split the square off into a leaf of its own.
+    """
+    __slots__ = ("tree", "x", "y")
+
+    def __init__(self, tree: QuadtreeGrid, x: int, y: int) -> None:
+        self.tree = tree
+        self.x = x
+        self.y = y
+
+    def store(self) -> LayerStore:
+        return self.tree.leaf_at(self.x, self.y).store
+
+    def add(self, layer: Layer) -> bool:
+        return self.tree.own_square(self.x, self.y).add(layer)
+
+    def erase(self, layer: Layer) -> bool:
+        return self.tree.own_square(self.x, self.y).erase(layer)
+
+    def special(self) -> None:
+        self.tree.own_square(self.x, self.y).special()
+
+    def layers(self):
+        return self.store().layers()
+
+    def is_animated(self) -> bool:
+        return self.store().is_animated()
+
+    def time_key(self, timestamp, x, y):
+        return self.store().time_key(timestamp, x, y)
+
+    def state_key(self):
+        return self.store().state_key()
+
+    def compiled_program(self) -> tuple:
+        return self.store().compiled_program()
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.store().get_color(start, timestamp, x, y)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.store().compute_color(start, timestamp, x, y)
+
+class QuadColumn:
+    """
+    Column x of a quadtree grid, so that grid[x][y] works as with the ArrayR of rows.
+    """
+    __slots__ = ("tree", "x")
+
+    def __init__(self, tree: QuadtreeGrid, x: int) -> None:
+        self.tree = tree
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.tree.y
+
+    def __getitem__(self, y: int) -> QuadCell:
+        if not 0 <= y < self.tree.y:
+            raise IndexError("Grid index out of range")
+        return QuadCell(self.tree, self.x, y)
+
+class QuadNode:
+    """
+    The region x0 <= x < x1, y0 <= y < y1 of a quadtree grid.
+    A leaf has a store and no children, any other node has children and no store.
+    The store of a leaf is attached to the leaf, so a change to it marks every square of the region dirty.
+    """
+    __slots__ = ("tree", "x0", "y0", "x1", "y1", "store", "owned", "children")
+
+    def __init__(self, tree: QuadtreeGrid, x0: int, y0: int, x1: int, y1: int, store: LayerStore, owned: bool) -> None:
+        self.tree = tree
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.store = store
+        self.owned = owned #False while the store may be shared with other leaves, it is copied before a change
+        self.children = None
+
+    @property
+    def special_epoch(self) -> int:
+        """
+        The owning grid's special epoch, read by the store of the leaf when catching up.
+        """
+        return self.tree.grid.special_epoch
+
+    def mark_dirty(self, x, y) -> None:
+        """
+        Record that the store of the leaf changed, which changes every square of the region.
+        Complexity:
+        - Always O(Grid.mark_dirty_area), O(1), the region is recorded as a rectangle
+        """
+        self.tree.grid.mark_dirty_area(self.x0, self.x1, self.y0, self.y1)
+
+    def size(self) -> int:
+        return (self.x1 - self.x0) * (self.y1 - self.y0)
+
+class QuadtreeGrid:
+    """
+    The squares of a grid as a quadtree of regions holding the same layers.
+    """
+
+    def __init__(self, grid, draw_style, x: int, y: int) -> None:
+        """
+        Args:
+        -grid: the owning Grid
+        -draw_style: one of Grid.DRAW_STYLE_OPTIONS
+        -x, y: dimensions of the grid
+        Raises: Exception if the draw style is unknown
+        Returns: None
+        Complexity:
+        - Always O(1), the whole grid starts as one region
+        """
+        if draw_style == 'SET':
+            self.store_type = SetLayerStore
+        elif draw_style == 'ADD':
+            self.store_type = AdditiveLayerStore
+        elif draw_style == 'SEQUENCE':
+            self.store_type = SequenceLayerStore
+        else:
+            raise Exception('wrong draw style')
+        self.grid = grid
+        self.x = x
+        self.y = y
+        self.root = self.new_leaf(0, 0, x, y)
+
+    def __len__(self) -> int:
+        return self.x
+
+    def __getitem__(self, x: int) -> QuadColumn:
+        if not 0 <= x < self.x:
+            raise IndexError("Grid index out of range")
+        return QuadColumn(self, x)
+
+    def new_leaf(self, x0: int, y0: int, x1: int, y1: int) -> QuadNode:
+        """
+        A leaf for the region with a new empty store.
+        Complexity:
+        - Always O(1)
+        """
+        leaf = QuadNode(self, x0, y0, x1, y1, None, True)
+        leaf.store = self.store_type()
+        leaf.store.attach(leaf, x0, y0)
+        return leaf
+
+    def leaves(self):
+        """
+        Every leaf of the tree.
+        Args: None
+        Raises: None
+        Returns: list of QuadNode
+        Complexity:
+        - Always O(N), N being the number of nodes
+        """
+        leaves = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.children is None:
+                leaves.append(node)
+            else:
+                stack.extend(node.children)
+        return leaves
+
+    def leaf_at(self, x: int, y: int) -> QuadNode:
+        """
+        The leaf whose region has the square at (x, y).
+        Complexity:
+        - Always O(depth), O(log(max(x, y)))
+        """
+        node = self.root
+        while node.children is not None:
+            node = self.child_at(node, x, y)
+        return node
+
+    def child_at(self, node: QuadNode, x: int, y: int) -> QuadNode:
+        for child in node.children:
+            if child.x0 <= x < child.x1 and child.y0 <= y < child.y1:
+                return child
+
+    def split(self, leaf: QuadNode) -> None:
+        """
+        Split the region of the leaf into quarters (halves for regions one square wide) sharing its store.
+        Args:
+        -leaf: a leaf of more than one square
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1), the store is not copied
+        """
+        mx = (leaf.x0 + leaf.x1) // 2
+        my = (leaf.y0 + leaf.y1) // 2
+        leaf.children = []
+        for x0, x1 in [(leaf.x0, mx), (mx, leaf.x1)]:
+            for y0, y1 in [(leaf.y0, my), (my, leaf.y1)]:
+                if x0 < x1 and y0 < y1:
+                    leaf.children.append(QuadNode(self, x0, y0, x1, y1, leaf.store, False))
+        leaf.store = None
+
+    def own(self, leaf: QuadNode) -> LayerStore:
+        """
+        The store of the leaf, copied first if other leaves may share it.
+        Complexity:
+        - Worst: O(LayerStore.clone)
+        - Best: O(1)
+        """
+        if not leaf.owned:
+            leaf.store = leaf.store.clone()
+            leaf.store.attach(leaf, leaf.x0, leaf.y0)
+            leaf.owned = True
+        return leaf.store
+
+    def own_square(self, x: int, y: int) -> LayerStore:
+        """
+        The store of the square at (x, y), splitting it off into a leaf of its own first.
+        The leaves this leaves behind are merged again by the next compact.
+        Complexity:
+        - Always O(depth+LayerStore.clone)
+        """
+        node = self.root
+        while node.children is not None or node.size() > 1:
+            if node.children is None:
+                self.split(node)
+            node = self.child_at(node, x, y)
+        return self.own(node)
+
+    def merge(self, node: QuadNode) -> bool:
+        """
+        Turn the node back into a leaf if its children are leaves holding the same layers.
+        The store of a child which owns its store is kept, the others are dropped.
+        Args:
+        -node: a node of the tree
+        Raises: None
+        Returns: True if the node is a leaf afterwards
+        Complexity:
+        - Always O(LayerStore.content_key) for each child
+        """
+        if node.children is None:
+            return True
+        key = None
+        keep = None
+        for child in node.children:
+            if child.children is not None:
+                return False
+            child_key = child.store.content_key()
+            if key is None:
+                key = child_key
+            elif child_key != key:
+                return False
+            if keep is None or (child.owned and not keep.owned):
+                keep = child
+        node.store = keep.store
+        node.owned = keep.owned
+        if node.owned: #a store still shared stays attached to the node it came from
+            node.store.attach(node, node.x0, node.y0)
+        node.children = None
+        return True
+
+    def compact(self, node: QuadNode = None) -> bool:
+        """
+        Merge every region of the subtree whose squares hold the same layers, from the bottom up.
+        Args:
+        -node: root of the subtree, the whole tree by default
+        Raises: None
+        Returns: True if the node is a leaf afterwards
+        Complexity:
+        - Always O(N*LayerStore.content_key), N being the number of nodes in the subtree
+        """
+        if node is None:
+            node = self.root
+        if node.children is None:
+            return True
+        merged = True
+        for child in node.children:
+            merged = self.compact(child) and merged
+        return merged and self.merge(node)
+
+    def paint(self, layer: Layer, px: int, py: int, brush_size: int):
+        """
+        Add the layer to every square within manhattan distance brush_size of (px, py).
+        Regions the brush covers whole get the layer once, regions it partly covers are split.
+        Args:
+        -layer: the layer being applied
+        -px, py: centre of the brush
+        -brush_size: the brush radius
+        Raises: None
+        Returns: list of (x, y) of the squares which changed, in order of x then y
+        Complexity:
+        - Always O(R*add+C*log(C)), R being the number of regions the edge of the brush goes through
+        and C the number of changed squares
+        """
+        changed = []
+        self.paint_node(self.root, layer, px, py, brush_size, changed)
+        changed.sort()
+        return changed
+
+    def paint_node(self, node: QuadNode, layer: Layer, px: int, py: int, brush_size: int, changed) -> None:
+        """
+        paint for the subtree of node, adding the changed squares to changed. Merges the subtree afterwards.
+        """
+        # The square of the region nearest to the centre, and the corner furthest from it.
+        near = abs(px - min(max(px, node.x0), node.x1 - 1)) + abs(py - min(max(py, node.y0), node.y1 - 1))
+        if near > brush_size:
+            return
+        far = max(abs(px - node.x0), abs(px - (node.x1 - 1))) + max(abs(py - node.y0), abs(py - (node.y1 - 1)))
+        if node.children is None:
+            if far <= brush_size:
+                if self.own(node).add(layer):
+                    for x in range(node.x0, node.x1):
+                        changed.extend((x, y) for y in range(node.y0, node.y1))
+                return
+            self.split(node)
+        for child in node.children:
+            self.paint_node(child, layer, px, py, brush_size, changed)
+        self.merge(node)
+
+    def buckets(self):
+        """
+        The squares grouped by store state, for Grid.get_colors, after merging what can be merged.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, Areas) pairs, the rectangles of the leaves with each state
+        Complexity:
+        - Always O(compact+L*LayerStore.state_key+S*LayerStore.compiled_program),
+        L being the number of leaves and S the number of distinct states
+        """
+        self.compact()
+        groups = {} #state -> (store with the state, leaves with the state)
+        for leaf in self.leaves():
+            key = leaf.store.state_key()
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (leaf.store, Areas())
+            group[1].append((leaf.x0, leaf.x1, leaf.y0, leaf.y1))
+        return [(store.compiled_program(), cells) for store, cells in groups.values()]
@@ -0,0 +1,120 @@
+"""
+Batched grid renderer.
+
+Draws every grid square with a single vertex buffer, rather than one
+immediate-mode rectangle call per square. The buffer is kept from frame to
+frame and only made again when the view moves or a colour in it changes.
+"""
+
+from __future__ import annotations
+import arcade
+from grid import Grid
+from viewport import Viewport
+from lod import ColorPyramid
+
+class GridRenderer:
+
+    def __init__(self, grid_x, grid_y, sq_width, sq_height) -> None:
+        """
+        Args:
+        -grid_x, grid_y: dimensions of the grid
+        -sq_width, sq_height: size of a grid square on the screen
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1), the corners of the squares are worked out for the view when it is drawn
+        """
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.viewport = Viewport(sq_width * grid_x, sq_height * grid_y, grid_x, grid_y) #the whole grid, for draw without a viewport
+        self.pyramid = None #ColorPyramid of the grid last drawn with squares smaller than a pixel
+        self.points = None #corners of the last frame, see view_points
+        self.points_key = None #where the viewport was for the points
+        self.shape = None #vertex buffer of the last frame
+        self.shape_key = None #(points_key, colours) the shape was made with
+
+    def draw(self, grid: Grid, start, timestamp, viewport: Viewport = None) -> None:
+        """
+        Draw the grid with one batched draw call, of the shape of the last frame if nothing in it changed.
+        Args:
+        -grid: the grid to draw
+        -start: background colour
+        -timestamp: time
+        -viewport: the part of the grid to draw, the whole grid at the size given to the renderer if None
+        Raises: None
+        Returns: None
+        Complexity:
+        - Worst: O(frame+A), the view moved or a colour changed, A being the number of squares in the view
+        - Best: O(frame), the shape is drawn again
+        """
+        points_key, points, colors = self.frame(grid, start, timestamp, viewport)
+        if self.shape is None or self.shape_key != (points_key, colors):
+            corner_colors = []
+            for color in colors: #same order as the points, x then y
+                corner_colors += (color, color, color, color) #every corner of the square has the same colour
+            self.shape = self.make_shape(points, corner_colors)
+            self.shape_key = (points_key, colors)
+        self.shape.draw()
+
+    def make_shape(self, points, colors):
+        """
+        The vertex buffer of the rectangles, see arcade.create_rectangles_filled_with_colors.
+        """
+        return arcade.create_rectangles_filled_with_colors(points, colors)
+
+    def frame(self, grid: Grid, start, timestamp, viewport: Viewport = None):
+        """
+        What draw puts on the screen: the squares of the view, or the level of the colour pyramid whose entries
+        are about a pixel once squares are smaller than one. The pyramid is kept from frame to frame and only
+        updated with the squares changed since, see ColorPyramid.update.
+        Args: as draw
+        Raises: None
+        Returns: (where the viewport is, 4 corners per square or entry, colour per square or entry), both in order of x then y.
+        The corners are kept for the next frame, so they must not be modified.
+        Complexity:
+        - Worst: O(Grid.get_colors+A), the whole grid is shown and the view moved, A being the number of squares in the view
+        - Best: O(A*LayerStore.get_color), only part of the grid is shown.
+        O(ColorPyramid.update+P) once squares are smaller than a pixel, P being the number of pixels of the view
+        """
+        if viewport is None:
+            viewport = self.viewport
+        width, height = viewport.square_size()
+        if min(width, height) < 1:
+            if self.pyramid is None or self.pyramid.grid is not grid: #the window made a new grid
+                self.pyramid = ColorPyramid(grid)
+            self.pyramid.update(start, timestamp)
+            level = self.pyramid.level_for(width, height)
+            area, colors = self.pyramid.colors(level, viewport.visible(), timestamp)
+        else:
+            level = 0
+            area = viewport.visible()
+            colors = list(grid.get_colors(start, timestamp, area)) #a copy, the grid changes its list of the whole grid
+        points_key = (level, area, width, height, viewport.left, viewport.bottom)
+        if self.points_key != points_key:
+            self.points = self.view_points(viewport, area, 1 << level)
+            self.points_key = points_key
+        return points_key, self.points, colors
+
+    def view_points(self, viewport: Viewport, area, scale=1):
+        """
+        The corners of the squares of area where the viewport puts them.
+        Args:
+        -viewport: the viewport
+        -area: (x0, x1, y0, y1), see Viewport.visible
+        -scale: number of grid squares across each square of area, for the levels of a ColorPyramid
+        Raises: None
+        Returns: list of 4 corners per square, in order of x then y and in the order create_rectangles_filled_with_colors expects
+        Complexity:
+        - Always O(A), A being the number of squares in area
+        """
+        x0, x1, y0, y1 = area
+        width, height = viewport.square_size()
+        width, height = width * scale, height * scale
+        points = []
+        for x in range(x0, x1):
+            for y in range(y0, y1):
+                left, bottom = viewport.to_screen(x * scale, y * scale)
+                right = left + width
+                top = bottom + height
+                points += [(left, top), (right, top), (right, bottom), (left, bottom)]
+        return points
@@ -0,0 +1,187 @@
+"""
+Sparse grid backend.
+
+Only squares which have been painted get a LayerStore, kept in a dictionary
+by position. Every other square reads from one empty store shared by the
+whole grid, so making a grid takes constant time and memory follows the
+painted area.
+
+grid[x][y] is the square's store once it has one, and otherwise a LazyCell
+handle which creates the store the first time the square is changed.
+"""
+
+from __future__ import annotations
+from layer_util import Layer
+from layer_store import LayerStore, SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+
+class LazyCell:
+    """
+    A square without a store of its own. Reads are answered by the grid's shared empty store,
+    the first add or special creates the square's store and every call after that goes to it.
+    """
+    __slots__ = ("sparse", "x", "y")
+
+    def __init__(self, sparse: SparseGrid, x: int, y: int) -> None:
+        self.sparse = sparse
+        self.x = x
+        self.y = y
+
+    def store(self) -> LayerStore:
+        """
+        The square's own store if it has one, the shared empty store otherwise.
+        """
+        store = self.sparse.store_at(self.x, self.y)
+        if store is None:
+            return self.sparse.empty_store()
+        return store
+
+    def add(self, layer: Layer) -> bool:
+        return self.sparse.materialize(self.x, self.y).add(layer)
+
+    def erase(self, layer: Layer) -> bool:
+        store = self.sparse.store_at(self.x, self.y)
+        if store is None: #nothing to erase from an empty square
+            return False
+        return store.erase(layer)
+
+    def special(self) -> None:
+        self.sparse.materialize(self.x, self.y).special()
+
+    def layers(self):
+        return self.store().layers()
+
+    def is_animated(self) -> bool:
+        return self.store().is_animated()
+
+    def time_key(self, timestamp, x, y):
+        return self.store().time_key(timestamp, x, y)
+
+    def state_key(self):
+        return self.store().state_key()
+
+    def compiled_program(self) -> tuple:
+        return self.store().compiled_program()
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.store().get_color(start, timestamp, x, y)
+
+    def compute_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        return self.store().compute_color(start, timestamp, x, y)
+
+class SparseColumn:
+    """
+    Column x of a sparse grid, so that grid[x][y] works as with the ArrayR of rows.
+    """
+    __slots__ = ("sparse", "x")
+
+    def __init__(self, sparse: SparseGrid, x: int) -> None:
+        self.sparse = sparse
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.sparse.y
+
+    def __getitem__(self, y: int):
+        if not 0 <= y < self.sparse.y:
+            raise IndexError("Grid index out of range")
+        store = self.sparse.store_at(self.x, y)
+        if store is not None:
+            return store
+        return LazyCell(self.sparse, self.x, y)
+
+class SparseGrid:
+    """
+    The stores of the painted squares of a grid, by position.
+    """
+
+    def __init__(self, grid, draw_style, x: int, y: int) -> None:
+        """
+        Args:
+        -grid: the owning Grid
+        -draw_style: one of Grid.DRAW_STYLE_OPTIONS
+        -x, y: dimensions of the grid
+        Raises: Exception if the draw style is unknown
+        Returns: None
+        Complexity:
+        - Always O(1), no square gets a store yet
+        """
+        if draw_style == 'SET':
+            self.store_type = SetLayerStore
+        elif draw_style == 'ADD':
+            self.store_type = AdditiveLayerStore
+        elif draw_style == 'SEQUENCE':
+            self.store_type = SequenceLayerStore
+        else:
+            raise Exception('wrong draw style')
+        self.grid = grid
+        self.x = x
+        self.y = y
+        self.stores = {} #(x, y) -> LayerStore of every square which has been changed
+        self.empty = self.store_type() #never painted, stands in for every square without a store
+        self.empty_epoch = 0 #grid special epoch the empty store has caught up with
+
+    def __len__(self) -> int:
+        return self.x
+
+    def __getitem__(self, x: int) -> SparseColumn:
+        if not 0 <= x < self.x:
+            raise IndexError("Grid index out of range")
+        return SparseColumn(self, x)
+
+    def store_at(self, x: int, y: int):
+        """
+        The store of the square, None if it has none.
+        Complexity:
+        - Always O(1), dictionary lookup
+        """
+        return self.stores.get((x, y))
+
+    def empty_store(self) -> LayerStore:
+        """
+        The shared empty store, after the grid specials recorded since it was last used.
+        Specials still matter to an empty square, e.g. a SET square shows its background inverted.
+        Complexity:
+        - Always O(LayerStore.apply_specials) on an empty store, O(1)
+        """
+        missed = self.grid.special_epoch - self.empty_epoch
+        if missed > 0:
+            self.empty_epoch = self.grid.special_epoch
+            self.empty.apply_specials(missed)
+        return self.empty
+
+    def materialize(self, x: int, y: int) -> LayerStore:
+        """
+        The store of the square, creating it if the square has none.
+        A new store has missed every grid special so far, as the empty square it replaces was given all of them.
+        Complexity:
+        - Always O(1) besides the first catch up of a new store
+        """
+        store = self.stores.get((x, y))
+        if store is None:
+            store = self.store_type()
+            store.attach(self.grid, x, y)
+            store.special_epoch = 0
+            self.stores[(x, y)] = store
+        return store
+
+    def buckets(self):
+        """
+        The squares grouped by store state, for Grid.get_colors. Squares without a store are one more group.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, list of flat indices) pairs
+        Complexity:
+        - Always O(x*y+P*LayerStore.state_key+S*LayerStore.compiled_program), P being the number of painted squares
+        and S the number of distinct states
+        """
+        groups = {} #state -> (store with the state, squares with the state)
+        empty = self.empty_store()
+        for x in range(self.x):
+            for y in range(self.y):
+                store = self.stores.get((x, y), empty)
+                key = store.state_key()
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = (store, [])
+                group[1].append(x*self.y+y)
+        return [(store.compiled_program(), cells) for store, cells in groups.values()]
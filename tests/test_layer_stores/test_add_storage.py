@@ -0,0 +1,50 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import AdditiveLayerStore
+from layers import black, lighten, invert
+from grid import Grid
+
+class TestAddStorage(unittest.TestCase):
+
+    @number("12.1")
+    def test_lazy(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 8, 8)
+        # No square has storage until something is painted on it.
+        for x in range(8):
+            for y in range(8):
+                self.assertIsNone(grid[x][y].layer_store)
+        grid[2][3].add(lighten)
+        self.assertEqual(len(grid[2][3].layer_store.array), AdditiveLayerStore.INITIAL_CAPACITY)
+        self.assertIsNone(grid[3][2].layer_store)
+
+    @number("12.2")
+    def test_many_layers(self):
+        s = AdditiveLayerStore()
+        s.add(black)
+        for _ in range(3000):
+            s.add(lighten)
+        self.assertEqual(len(s.layers()), 3001)
+        self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), (255, 255, 255))
+
+    @number("12.3")
+    def test_shrink(self):
+        s = AdditiveLayerStore()
+        for i in range(1000):
+            s.add([invert, lighten][i % 2])
+        grown = len(s.layer_store.array)
+        for _ in range(999):
+            s.erase(invert)
+        self.assertLess(len(s.layer_store.array), grown)
+        self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), (50, 60, 70))
+
+    @number("12.4")
+    def test_erase_empty(self):
+        s = AdditiveLayerStore()
+        self.assertFalse(s.erase(lighten))
+        s.special()
+        self.assertEqual(s.layers(), [])
+        s.add(lighten)
+        self.assertTrue(s.erase(lighten))
+        self.assertFalse(s.erase(lighten))
+        self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), (10, 20, 30))
@@ -0,0 +1,82 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from layers import black, lighten, rainbow, invert, sparkle
+
+class TestColorCache(unittest.TestCase):
+
+    @number("8.1")
+    def test_time_dependence(self):
+        for layer in [black, lighten, invert]:
+            self.assertFalse(layer.time_dependent, layer.name)
+        for layer in [rainbow, sparkle]:
+            self.assertTrue(layer.time_dependent, layer.name)
+
+    @number("8.2")
+    def test_static_cached(self):
+        for store in [SetLayerStore(), AdditiveLayerStore(), SequenceLayerStore()]:
+            store.add(black)
+            store.add(lighten)
+            self.assertFalse(store.is_animated())
+            first = store.get_color((100, 100, 100), 0, 1, 1)
+            key = store.cache_key
+            # A different timestamp still hits the cache.
+            self.assertIs(store.get_color((100, 100, 100), 5, 1, 1), first)
+            self.assertEqual(store.cache_key, key)
+
+    @number("8.3")
+    def test_invalidated(self):
+        s = AdditiveLayerStore()
+        s.add(black)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (0, 0, 0))
+        s.add(lighten)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (40, 40, 40))
+        s.special()
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (0, 0, 0))
+        s.erase(lighten)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (0, 0, 0))
+        # A different start colour is a different cache entry.
+        s = SetLayerStore()
+        s.add(lighten)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (140, 140, 140))
+        self.assertEqual(s.get_color((0, 0, 0), 0, 0, 0), (40, 40, 40))
+
+    @number("8.4")
+    def test_animated_not_cached(self):
+        s = SequenceLayerStore()
+        s.add(rainbow)
+        s.add(lighten)
+        self.assertTrue(s.is_animated())
+        self.assertNotEqual(s.get_color((0, 0, 0), 0, 0, 0), s.get_color((0, 0, 0), 7, 0, 0))
+        s.erase(rainbow)
+        self.assertFalse(s.is_animated())
+        s = AdditiveLayerStore()
+        s.add(rainbow)
+        s.add(black)
+        self.assertTrue(s.is_animated())
+        s.erase(black)
+        self.assertFalse(s.is_animated())
+
+    @number("8.5")
+    def test_time_key(self):
+        self.assertIsNone(black.time_key(3, 1, 2))
+        # Sparkle moves on every third of a time unit and repeats every 17 steps.
+        self.assertEqual(sparkle.time_key(0, 0, 0), sparkle.time_key(0.3, 0, 0))
+        self.assertNotEqual(sparkle.time_key(0, 0, 0), sparkle.time_key(0.4, 0, 0))
+        self.assertEqual(sparkle.time_key(0, 0, 0), sparkle.time_key(17 / 3 + 0.1, 0, 0))
+        # Rainbow's colour follows its hue.
+        self.assertEqual(rainbow.time_key(7, 1, 2), (7/20 + 1/20 + 2/20) % 1)
+
+    @number("8.6")
+    def test_animated_cached_per_step(self):
+        for store in [SetLayerStore(), AdditiveLayerStore(), SequenceLayerStore()]:
+            store.add(sparkle)
+            first = store.get_color((100, 100, 100), 1.0, 3, 4)
+            # Same time step: cache hit.
+            self.assertIs(store.get_color((100, 100, 100), 1.05, 3, 4), first)
+            for timestamp in [1.2, 2, 5.5, 30.1]:
+                self.assertEqual(
+                    store.get_color((100, 100, 100), timestamp, 3, 4),
+                    sparkle.apply((100, 100, 100), timestamp, 3, 4),
+                )
@@ -0,0 +1,89 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_util import compile_layers
+from layer_store import AdditiveLayerStore
+from layers import black, red, green, blue, lighten, invert, rainbow, sparkle
+
+class TestOpaque(unittest.TestCase):
+
+    @number("11.1")
+    def test_declared(self):
+        for layer in [black, red, green, blue, rainbow]:
+            self.assertTrue(layer.opaque, layer.name)
+        for layer in [lighten, invert, sparkle]:
+            self.assertFalse(layer.opaque, layer.name)
+        self.assertEqual(compile_layers([rainbow, lighten, red, invert, green, sparkle]), (green, sparkle))
+
+    @number("11.2")
+    def test_last_opaque(self):
+        s = AdditiveLayerStore()
+        s.add(lighten)
+        self.assertIsNone(s.last_opaque)
+        s.add(red)
+        s.add(lighten)
+        s.add(black)
+        s.add(lighten)
+        self.assertEqual(s.last_opaque, 3)
+        self.assertEqual(s.contributing_layers(), [black, lighten])
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (40, 40, 40))
+        s.erase(black)
+        self.assertEqual(s.last_opaque, 2)
+        s.special()  # lighten, black, lighten, red
+        self.assertEqual(s.last_opaque, 3)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (255, 0, 0))
+        s.erase(black)
+        s.erase(black)
+        s.erase(black)
+        self.assertEqual(s.last_opaque, 0)
+        s.erase(black)
+        self.assertIsNone(s.last_opaque)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (100, 100, 100))
+
+    @number("11.3")
+    def test_matches_full_walk(self):
+        s = AdditiveLayerStore()
+        stack = []
+        for i in range(60):
+            layer = [lighten, red, invert, rainbow, blue, sparkle, black][(i * 5) % 7]
+            s.add(layer)
+            stack.append(layer)
+            if i % 9 == 8:
+                s.erase(layer)
+                stack.pop(0)
+            if i % 13 == 12:
+                s.special()
+                stack.reverse()
+            color = (30, 60, 90)
+            for layer in stack:
+                color = layer.apply(color, 2.5, 3, 4)
+            self.assertEqual(s.get_color((30, 60, 90), 2.5, 3, 4), color)
+
+    @number("11.4")
+    def test_reversed_ordinals(self):
+        s = AdditiveLayerStore()
+        stack = []
+        for i in range(80):
+            layer = [red, lighten, invert, black, sparkle, blue][(i * 7) % 6]
+            s.add(layer)
+            stack.append(layer)
+            if i % 4 == 3:
+                s.special()
+                stack.reverse()
+            if i % 6 == 5:
+                s.erase(layer)
+                stack.pop(0)
+            self.assertEqual(s.layers(), stack)
+            opaque = [p for p, l in enumerate(stack) if l.opaque]
+            self.assertEqual(s.last_opaque, opaque[-1] if opaque else None)
+
+    @number("11.5")
+    def test_rainbow(self):
+        # Rainbow's colour only depends on the time and position, so it paints over what is below it.
+        self.assertEqual(compile_layers([red, lighten, sparkle, rainbow, invert])[0], rainbow)
+        s = AdditiveLayerStore()
+        for layer in [blue, sparkle, lighten, rainbow, invert]:
+            s.add(layer)
+        self.assertEqual(s.contributing_layers(), [rainbow, invert])
+        expected = invert.apply(rainbow.apply((0, 0, 0), 3.5, 2, 6), 3.5, 2, 6)
+        self.assertEqual(s.get_color((30, 60, 90), 3.5, 2, 6), expected)
@@ -0,0 +1,54 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_util import ChannelTable, compile_layers
+from layer_store import AdditiveLayerStore, SequenceLayerStore
+from layers import black, lighten, darken, invert, sparkle
+
+class TestPointwise(unittest.TestCase):
+
+    @number("10.1")
+    def test_lut(self):
+        for layer in [lighten, darken, invert]:
+            for c in [0, 1, 100, 215, 254, 255]:
+                self.assertEqual(layer.lut[c], layer.apply((c, c, c), 0, 0, 0)[0], layer.name)
+        self.assertIsNone(black.lut)
+        self.assertIsNone(sparkle.lut)
+
+    @number("10.2")
+    def test_compile(self):
+        program = compile_layers([lighten, lighten, invert, sparkle, darken, invert, sparkle, lighten])
+        self.assertEqual(len(program), 5)
+        self.assertIsInstance(program[0], ChannelTable)
+        self.assertIs(program[1], sparkle)
+        self.assertIsInstance(program[2], ChannelTable)
+        self.assertIs(program[3], sparkle)
+        self.assertEqual(program[0].apply((100, 200, 250), 0, 0, 0), (75, 0, 0))
+
+    @number("10.3")
+    def test_additive_stack(self):
+        s = AdditiveLayerStore()
+        s.add(black)
+        expected = (0, 0, 0)
+        for i in range(200):
+            layer = [lighten, lighten, darken, invert][i % 4]
+            s.add(layer)
+            expected = layer.apply(expected, 0, 0, 0)
+            self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), expected)
+        # Black then a single composed table.
+        self.assertEqual(len(s.program), 2)
+        s.erase(black)
+        s.special()
+        s.get_color((10, 20, 30), 0, 0, 0)
+        self.assertEqual(len(s.program), 1)
+
+    @number("10.4")
+    def test_sequence(self):
+        s = SequenceLayerStore()
+        s.add(lighten)
+        s.add(invert)
+        s.add(darken)
+        self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), (165, 155, 145))
+        self.assertEqual(len(s.program), 1)
+        s.add(black)
+        self.assertEqual(s.get_color((10, 20, 30), 0, 0, 0), (175, 175, 175))
@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from layer_util import ChannelTable, ChoiceTables, compile_runs, run_batch, table_power
+from layer_store import AdditiveLayerStore
+from layers import black, red, lighten, darken, invert, rainbow, sparkle
+
+class TestRuns(unittest.TestCase):
+
+    @number("14.1")
+    def test_table_power(self):
+        for layer in [lighten, darken, invert]:
+            for count in [0, 1, 2, 5, 64, 1001]:
+                expected = tuple(range(256))
+                for _ in range(count):
+                    expected = tuple(layer.lut[c] for c in expected)
+                self.assertEqual(table_power(layer.lut, count), expected, layer.name)
+
+    @number("14.2")
+    def test_compile_runs(self):
+        program = compile_runs([(lighten, 3), (black, 50), (invert, 7), (darken, 1000)])
+        self.assertIs(program[0], black)
+        self.assertIsInstance(program[1], ChannelTable)
+        self.assertEqual(program[1].table[0], 0)
+        self.assertEqual(len(program), 2)
+        program = compile_runs([(lighten, 3), (black, 50), (rainbow, 2), (darken, 1000)])
+        self.assertIs(program[0], rainbow)
+        self.assertEqual(program[1].table, (0,) * 256)
+
+    @number("14.3")
+    def test_stroke(self):
+        s = AdditiveLayerStore()
+        for _ in range(5000):
+            s.add(darken)
+        self.assertEqual(len(s.layer_store), 1)
+        self.assertEqual(len(s), 5000)
+        self.assertEqual(s.runs(), [(darken, 5000)])
+        self.assertEqual(s.get_color((200, 100, 50), 0, 0, 0), (0, 0, 0))
+        for _ in range(4998):
+            s.erase(lighten)
+        self.assertEqual(s.get_color((200, 100, 50), 0, 0, 0), (120, 20, 0))
+
+    @number("14.4")
+    def test_matches_full_walk(self):
+        s = AdditiveLayerStore()
+        stack = []
+        sequence = [lighten, lighten, lighten, red, red, invert, sparkle, sparkle, black, darken, darken]
+        for i in range(300):
+            layer = sequence[(i * 3) % len(sequence)] if i % 17 < 9 else lighten
+            s.add(layer)
+            stack.append(layer)
+            if i % 5 == 4:
+                s.erase(layer)
+                stack.pop(0)
+            if i % 23 == 22:
+                s.special()
+                stack.reverse()
+            self.assertEqual(s.layers(), stack)
+            opaque = [p for p, l in enumerate(stack) if l.opaque]
+            self.assertEqual(s.last_opaque, opaque[-1] if opaque else None)
+            color = (30, 60, 90)
+            for layer in stack:
+                color = layer.apply(color, 4.5, 3, 4)
+            self.assertEqual(s.get_color((30, 60, 90), 4.5, 3, 4), color)
+
+    @number("14.5")
+    def test_choice_runs(self):
+        program = compile_runs([(lighten, 2), (sparkle, 40), (sparkle, 1)])
+        self.assertIsInstance(program[1], ChoiceTables)
+        self.assertIs(program[2], sparkle)
+        xs = [x for x in range(12) for y in range(9)]
+        ys = [y for x in range(12) for y in range(9)]
+        for timestamp in [0, 1.3, 7.9]:
+            expected = []
+            for x, y in zip(xs, ys):
+                color = lighten.apply(lighten.apply((100, 120, 140), timestamp, x, y), timestamp, x, y)
+                for _ in range(41):
+                    color = sparkle.apply(color, timestamp, x, y)
+                expected.append(color)
+                self.assertEqual(program[1].time_key(timestamp, x, y), sparkle.time_key(timestamp, x, y))
+            self.assertEqual(run_batch(program, (100, 120, 140), timestamp, xs, ys), expected)
+            colors = [(100, 120, 140)] * len(xs)
+            for step in program:
+                colors = [step.apply(color, timestamp, x, y) for color, x, y in zip(colors, xs, ys)]
+            self.assertEqual(colors, expected)
+            # The NumPy form, when the colours come from a NumPy step.
+            arrays = program[1].apply_batch(program[0].apply_batch(np.array([(100, 120, 140)] * len(xs)), timestamp, xs, ys), timestamp, xs, ys)
+            looped = program[1].apply_batch(program[0].apply_batch([(100, 120, 140)] * len(xs), timestamp, xs, ys), timestamp, xs, ys)
+            self.assertEqual([tuple(color) for color in arrays.tolist()], looped)
+
+    @number("14.6")
+    def test_program_stays_compressed(self):
+        s = AdditiveLayerStore()
+        s.add(lighten)
+        expected = lighten.apply((30, 60, 90), 2.5, 3, 4)
+        for i in range(500):
+            s.add(sparkle)
+            expected = sparkle.apply(expected, 2.5, 3, 4)
+            self.assertEqual(s.get_color((30, 60, 90), 2.5, 3, 4), expected)
+        self.assertEqual(s.runs(), [(lighten, 1), (sparkle, 500)])
+        self.assertEqual(len(s.program), 2)
+        self.assertEqual(s.program[1].count, 500)
+        self.assertEqual(s.program[1].tables, compile_runs([(sparkle, 500)])[0].tables)
+        for i in range(3):
+            s.add(darken)
+            expected = darken.apply(expected, 2.5, 3, 4)
+            self.assertEqual(s.get_color((30, 60, 90), 2.5, 3, 4), expected)
+        self.assertEqual(len(s.program), 3)
+        s.add(sparkle)
+        expected = sparkle.apply(expected, 2.5, 3, 4)
+        self.assertEqual(s.get_color((30, 60, 90), 2.5, 3, 4), expected)
+        self.assertEqual(len(s.program), 4)
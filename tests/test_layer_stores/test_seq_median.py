@@ -0,0 +1,37 @@
+import unittest
+from ed_utils.decorators import number
+
+import layer_util
+from layer_util import get_layers
+from layer_store import SequenceLayerStore
+
+class TestSeqMedian(unittest.TestCase):
+
+    @number("16.1")
+    def test_name_order(self):
+        layers = [layer for layer in get_layers() if layer is not None]
+        self.assertEqual([layers[i].name for i in layer_util.name_order], sorted(layer.name for layer in layers))
+        for index in range(len(layers)):
+            self.assertEqual(layer_util.name_order[layer_util.name_rank[index]], index)
+
+    @number("16.2")
+    def test_every_set(self):
+        layers = [layer for layer in get_layers() if layer is not None]
+        for mask in range(1, 1 << len(layers)):
+            applied = sorted((layers[i] for i in range(len(layers)) if mask >> i & 1), key=lambda layer: layer.name)
+            expected = applied[(len(applied) - 1) // 2]
+            self.assertEqual(SequenceLayerStore.median_index(mask), expected.index, mask)
+
+    @number("16.3")
+    def test_special(self):
+        s = SequenceLayerStore()
+        layers = [layer for layer in get_layers() if layer is not None]
+        for layer in layers:
+            s.add(layer)
+        names = sorted(layer.name for layer in layers)
+        while names:
+            s.special()
+            names.pop((len(names) - 1) // 2)
+            self.assertEqual(sorted(layer.name for layer in s.layers()), names)
+        s.special()
+        self.assertEqual(s.layers(), [])
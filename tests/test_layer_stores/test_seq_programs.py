@@ -0,0 +1,33 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import SequenceLayerStore
+from layers import black, lighten, invert, rainbow, sparkle
+
+class TestSeqPrograms(unittest.TestCase):
+
+    @number("15.1")
+    def test_shared(self):
+        a = SequenceLayerStore()
+        b = SequenceLayerStore()
+        for s in [a, b]:
+            s.add(lighten)
+            s.add(rainbow)
+            s.add(invert)
+        self.assertEqual(a.get_color((1, 2, 3), 4, 5, 6), b.get_color((1, 2, 3), 4, 5, 6))
+        self.assertIs(a.program, b.program)
+        self.assertIs(SequenceLayerStore.programs[a.layer_store.elems], a.program)
+        b.erase(rainbow)
+        b.get_color((1, 2, 3), 4, 5, 6)
+        self.assertIsNot(a.program, b.program)
+
+    @number("15.2")
+    def test_layers_in_index_order(self):
+        s = SequenceLayerStore()
+        for layer in [sparkle, invert, black, rainbow]:
+            s.add(layer)
+        self.assertEqual(s.layers(), sorted([sparkle, invert, black, rainbow], key=lambda layer: layer.index))
+        expected = (9, 8, 7)
+        for layer in s.layers():
+            expected = layer.apply(expected, 2, 3, 4)
+        self.assertEqual(s.get_color((9, 8, 7), 2, 3, 4), expected)
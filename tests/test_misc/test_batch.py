@@ -0,0 +1,87 @@
+import colorsys
+import unittest
+from ed_utils.decorators import number
+
+from layer_util import get_layers, loop_batch
+import layers
+from layers import lighten, rainbow
+
+class TestBatch(unittest.TestCase):
+
+    COLORS = [(0, 0, 0), (255, 255, 255), (100, 20, 230), (39, 216, 250)]
+
+    def sample(self):
+        colors, xs, ys = [], [], []
+        for x in range(0, 40, 3):
+            for y in range(0, 40, 7):
+                colors.append(self.COLORS[(x + y) % len(self.COLORS)])
+                xs.append(x)
+                ys.append(y)
+        return colors, xs, ys
+
+    @number("9.1")
+    def test_matches_scalar(self):
+        colors, xs, ys = self.sample()
+        for layer in get_layers():
+            if layer is None:
+                break
+            for timestamp in [0, 7, 13.37, 250.5]:
+                expected = [layer.apply(c, timestamp, x, y) for c, x, y in zip(colors, xs, ys)]
+                result = [tuple(int(v) for v in c) for c in layer.apply_batch(colors, timestamp, xs, ys)]
+                self.assertEqual(result, expected, layer.name)
+
+    @number("9.2")
+    def test_chained(self):
+        # Output of one batch call is valid input to the next.
+        colors, xs, ys = self.sample()
+        for layer in get_layers():
+            if layer is None:
+                break
+            once = layer.apply_batch(colors, 3, xs, ys)
+            twice = lighten.apply_batch(once, 3, xs, ys)
+            expected = [lighten.apply(layer.apply(c, 3, x, y), 3, x, y) for c, x, y in zip(colors, xs, ys)]
+            self.assertEqual([tuple(int(v) for v in c) for c in twice], expected, layer.name)
+
+    @number("9.3")
+    def test_fallback(self):
+        fallback = loop_batch(lighten.apply)
+        self.assertEqual(fallback([(0, 0, 0), (250, 10, 100)], 0, [0, 1], [0, 1]), [(40, 40, 40), (255, 50, 140)])
+        self.assertEqual(fallback([], 0, [], []), [])
+
+    @number("9.4")
+    def test_rainbow_diagonals(self):
+        xs = [x for x in range(20) for y in range(30)]
+        ys = [y for x in range(20) for y in range(30)]
+        colors = rainbow.apply_batch([(0, 0, 0)] * len(xs), 3.5, xs, ys)
+        for color, x, y in zip(colors, xs, ys):
+            self.assertEqual(tuple(int(v) for v in color), rainbow.apply((0, 0, 0), 3.5, x, y))
+        # Most hues are answered by the table.
+        self.assertEqual(len(layers.rainbow_table), layers.RAINBOW_TABLE_SIZE)
+        self.assertLess(sum(rgb is None for rgb in layers.rainbow_table), layers.RAINBOW_TABLE_SIZE // 10)
+
+    @number("9.6")
+    def test_rainbow_table(self):
+        # The table gives the same colours as working out the hue in full, as the layer originally did.
+        def original(timestamp, x, y):
+            return tuple(int(255*v) for v in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6))
+        xs = [x for x in range(32) for y in range(32)]
+        ys = [y for x in range(32) for y in range(32)]
+        for timestamp in list(range(200)) + [949, 0.1, 2.5, 13.37]:
+            expected = [original(timestamp, x, y) for x, y in zip(xs, ys)]
+            self.assertEqual([rainbow.apply((0, 0, 0), timestamp, x, y) for x, y in zip(xs, ys)], expected, timestamp)
+            colors = rainbow.apply_batch([(0, 0, 0)] * len(xs), timestamp, xs, ys)
+            self.assertEqual([tuple(int(v) for v in color) for color in colors], expected, timestamp)
+        self.assertEqual(rainbow.apply((0, 0, 0), 949, 74, 42), original(949, 74, 42))
+        for i in range(20000):
+            hue = (i * 0.6180339887498949) % 1
+            self.assertEqual(layers.rainbow_rgb(hue), tuple(int(255*v) for v in colorsys.hls_to_rgb(hue, 0.6, 0.6)))
+
+    @number("9.5")
+    def test_lcg_jump(self):
+        for steps in [0, 1, 10, 26, 1000]:
+            mult, inc = layers.lcg_jump(steps)
+            for start in [0, 1, 12345, (1 << 31) - 1, (1 << 31) + 7]:
+                other = start
+                for _ in range(steps):
+                    other = (layers.LCG_MULT * other + layers.LCG_INC) % layers.LCG_MOD
+                self.assertEqual((mult * start + inc) % layers.LCG_MOD, other % layers.LCG_MOD)
@@ -0,0 +1,111 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import PaintAction, PaintStep
+from grid import Grid
+from layers import black, lighten, darken, invert, rainbow, red, sparkle
+
+class TestColumnar(unittest.TestCase):
+
+    SEQUENCE = [black, lighten, invert, rainbow, red, sparkle, darken, lighten]
+
+    def check_same(self, columnar, objects, style):
+        for x in range(columnar.x):
+            for y in range(columnar.y):
+                self.assertEqual(columnar[x][y].layers(), objects[x][y].layers(), style)
+                self.assertEqual(
+                    columnar[x][y].get_color((30, 60, 90), 2.5, x, y),
+                    objects[x][y].get_color((30, 60, 90), 2.5, x, y),
+                    style,
+                )
+
+    @number("18.1")
+    def test_matches_objects(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            columnar = Grid(style, 5, 4, storage=Grid.STORAGE_COLUMNAR)
+            objects = Grid(style, 5, 4)
+            for i in range(400):
+                x, y = (i * 7) % 5, (i * 3) % 4
+                layer = self.SEQUENCE[(i * 5) % len(self.SEQUENCE)]
+                for grid in [columnar, objects]:
+                    if i % 4 == 3:
+                        self.assertIsInstance(grid[x][y].erase(layer), bool)
+                    else:
+                        grid[x][y].add(layer)
+                    if i % 29 == 28:
+                        grid.special()
+                    if i % 31 == 30:
+                        grid[x][y].special()
+                if i % 50 == 49:
+                    self.check_same(columnar, objects, style)
+
+    @number("18.2")
+    def test_views(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 3, 2, storage=Grid.STORAGE_COLUMNAR)
+        self.assertEqual(len(grid.grid), 3)
+        self.assertEqual(len(grid[0]), 2)
+        self.assertRaises(IndexError, lambda: grid[3])
+        self.assertRaises(IndexError, lambda: grid[0][2])
+        grid.clear_dirty()
+        self.assertTrue(grid[2][1].add(lighten))
+        self.assertFalse(grid[2][1].add(lighten))
+        self.assertEqual(grid.dirty_cells(), {(2, 1)})
+        self.assertRaises(Exception, Grid, Grid.DRAW_STYLE_SET, 2, 2, "PAPER")
+
+    @number("18.3")
+    def test_actions(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4, storage=Grid.STORAGE_COLUMNAR)
+        action = PaintAction([PaintStep((1, 1), lighten), PaintStep((1, 1), black), PaintStep((2, 3), invert)])
+        action.redo_apply(grid)
+        self.assertEqual(grid[1][1].layers(), [lighten, black])
+        PaintAction(is_special=True).redo_apply(grid)
+        self.assertEqual(grid[1][1].layers(), [black, lighten])
+        self.assertEqual(grid[1][1].get_color((1, 2, 3), 0, 1, 1), (40, 40, 40))
+        action.undo_apply(grid)
+        self.assertEqual(grid[1][1].layers(), [])
+        self.assertEqual(grid[2][3].layers(), [])
+
+    @number("18.4")
+    def test_add_segments(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 16, 16, storage=Grid.STORAGE_COLUMNAR)
+        columns = grid.grid
+        expected = {}
+        for i in range(3000):
+            x, y = (i * 5) % 16, (i * 11) % 16
+            layer = [lighten, invert, darken][i % 3]
+            grid[x][y].add(layer)
+            expected.setdefault((x, y), []).append(layer)
+        # Segments moved while growing, the space left behind is compacted away.
+        self.assertLessEqual(columns.garbage, len(columns.data) // 2 + max(columns.capacity))
+        for (x, y), layers in expected.items():
+            self.assertEqual(grid[x][y].layers(), layers)
+
+    @number("18.5")
+    def test_program_and_color_cache(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4, storage=Grid.STORAGE_COLUMNAR)
+        columns = grid.grid
+        for x, y in [(0, 0), (1, 1)]:
+            for _ in range(50):
+                grid[x][y].add(lighten)
+        grid[1][1].add(black)
+        grid[1][1].add(darken)
+        # Runs are compressed, layers before an opaque one are dropped.
+        self.assertEqual(columns.state_key(0), ((lighten.index, 50),))
+        self.assertEqual(columns.state_key(1 * 4 + 1), ((black.index, 1), (darken.index, 1)))
+        self.assertIs(columns.program_for(columns.state_key(0)), columns.program_for(((lighten.index, 50),)))
+        color = grid[0][0].get_color((0, 0, 0), 0, 0, 0)
+        self.assertEqual(color, grid[0][0].compute_color((0, 0, 0), 0, 0, 0))
+        # Colours are kept per state, not per square.
+        self.assertEqual(columns.colors, {((lighten.index, 50),): ((0, 0, 0), color)})
+        for x in range(4):
+            for y in range(4):
+                grid[x][y].get_color((0, 0, 0), 0, x, y)
+        self.assertEqual(len(columns.colors), 3)
+        grid[0][0].add(invert)
+        self.assertEqual(grid[0][0].get_color((0, 0, 0), 0, 0, 0), grid[0][0].compute_color((0, 0, 0), 0, 0, 0))
+        grid.special()
+        self.assertEqual(grid[1][1].get_color((9, 9, 9), 0, 1, 1), grid[1][1].compute_color((9, 9, 9), 0, 1, 1))
+        grid[2][2].add(rainbow)
+        for timestamp in [0, 1.5, 3]:
+            self.assertEqual(grid[2][2].get_color((0, 0, 0), timestamp, 2, 2), grid[2][2].compute_color((0, 0, 0), timestamp, 2, 2))
+        self.assertNotIn(columns.state_key(2 * 4 + 2), columns.colors)
@@ -0,0 +1,50 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import PaintAction, PaintStep
+from layers import green, red, lighten
+from grid import Grid
+
+class TestDirty(unittest.TestCase):
+
+    @number("7.1")
+    def test_new_grid(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 3)
+        self.assertTrue(grid.all_dirty)
+        self.assertEqual(len(grid.dirty_cells()), 12)
+        grid.clear_dirty()
+        self.assertEqual(grid.dirty_cells(), set())
+
+    @number("7.2")
+    def test_mutations(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(style, 5, 5)
+            grid.clear_dirty()
+            grid[1][2].add(red)
+            grid[3][4].add(green)
+            self.assertEqual(grid.dirty_cells(), {(1, 2), (3, 4)}, style)
+            grid.clear_dirty()
+            grid[1][2].erase(red)
+            self.assertEqual(grid.dirty_cells(), {(1, 2)}, style)
+
+    @number("7.3")
+    def test_unchanged(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        grid[0][0].add(red)
+        grid.clear_dirty()
+        # Adding the same layer again, or erasing an empty square, changes nothing.
+        grid[0][0].add(red)
+        grid[1][1].erase(red)
+        self.assertEqual(grid.dirty_cells(), set())
+
+    @number("7.4")
+    def test_actions(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 5, 5)
+        grid.clear_dirty()
+        action = PaintAction([PaintStep((2, 2), lighten), PaintStep((2, 3), lighten)])
+        action.redo_apply(grid)
+        self.assertEqual(grid.dirty_cells(), {(2, 2), (2, 3)})
+        grid.clear_dirty()
+        PaintAction(is_special=True).redo_apply(grid)
+        self.assertTrue(grid.all_dirty)
+        self.assertEqual(len(grid.dirty_cells()), 25)
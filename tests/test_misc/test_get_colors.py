@@ -0,0 +1,82 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layer_util import compile_layers, run_batch
+from layers import black, red, green, blue, lighten, darken, invert, rainbow, sparkle
+
+class TestGetColors(unittest.TestCase):
+
+    SEQUENCE = [black, lighten, invert, rainbow, red, sparkle, darken, green]
+
+    @number("20.1")
+    def test_uniform(self):
+        for layer in [black, red, green, blue, lighten, darken, invert]:
+            self.assertTrue(layer.uniform, layer.name)
+            self.assertFalse(layer.time_dependent, layer.name)
+        for layer in [rainbow, sparkle]:
+            self.assertFalse(layer.uniform, layer.name)
+        program = compile_layers([red, lighten, invert])
+        self.assertEqual(run_batch(program, [1, 2, 3], 5, [0, 4, 9], [2, 3, 1]), [(0, 215, 215)] * 3)
+        self.assertEqual(run_batch((), [1, 2, 3], 5, [0], [0]), [(1, 2, 3)])
+        self.assertEqual(run_batch(program, [1, 2, 3], 5, [], []), [])
+
+    @number("20.2")
+    def test_matches_get_color(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            for style in Grid.DRAW_STYLE_OPTIONS:
+                grid = Grid(style, 8, 7, storage=storage)
+                for i in range(60):
+                    grid.brush_size = i % 3
+                    grid.paint(self.SEQUENCE[(i * 3) % len(self.SEQUENCE)], (i * 5) % 8, (i * 3) % 7)
+                    if i % 11 == 10:
+                        grid.special()
+                    if i % 20 == 19:
+                        for timestamp in [0, 3.25, 40.5]:
+                            colors = grid.get_colors((200, 100, 50), timestamp)
+                            for x in range(8):
+                                for y in range(7):
+                                    self.assertEqual(
+                                        colors[x * 7 + y],
+                                        grid[x][y].get_color((200, 100, 50), timestamp, x, y),
+                                        (storage, style),
+                                    )
+
+    @number("20.3")
+    def test_buckets(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SET, 10, 10, storage=storage)
+            grid.brush_size = 5
+            grid.paint(black, 2, 2)
+            grid.paint(rainbow, 9, 9)
+            buckets = grid.buckets()
+            # Black squares, rainbow squares and untouched squares.
+            self.assertEqual(len(buckets), 3, storage)
+            self.assertEqual(sorted(index for program, cells in buckets for index in grid.bucket_indices(cells)), list(range(100)))
+
+    @number("20.4")
+    def test_cached(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_ADD, 6, 5, storage=storage)
+            grid.paint(red, 1, 1)
+            grid.paint(sparkle, 4, 3)
+            buckets = grid.buckets()
+            colors = grid.get_colors((200, 100, 50), 1)
+            # Nothing changed: the same buckets, and only the animated bucket is evaluated again.
+            self.assertIs(grid.buckets(), buckets, storage)
+            keys = list(grid.color_keys)
+            self.assertIs(grid.get_colors((200, 100, 50), 1), colors)
+            self.assertEqual(grid.color_keys, keys)
+            later = grid.get_colors((200, 100, 50), 2.5)
+            self.assertEqual(sorted(key for key in grid.color_keys if key is not None), [2.5])
+            for x in range(6):
+                for y in range(5):
+                    self.assertEqual(later[x * 5 + y], grid[x][y].get_color((200, 100, 50), 2.5, x, y), storage)
+            # A change or a special makes new buckets.
+            grid[0][4].add(lighten)
+            self.assertIsNot(grid.buckets(), buckets, storage)
+            buckets = grid.buckets()
+            grid.special()
+            self.assertIsNot(grid.buckets(), buckets, storage)
+            colors = grid.get_colors((200, 100, 50), 2.5)
+            self.assertEqual(colors[0 * 5 + 4], grid[0][4].get_color((200, 100, 50), 2.5, 0, 4), storage)
@@ -0,0 +1,86 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from layers import black, lighten, invert, rainbow, red, sparkle
+
+class TestLazySpecial(unittest.TestCase):
+
+    STORES = {
+        Grid.DRAW_STYLE_SET: SetLayerStore,
+        Grid.DRAW_STYLE_ADD: AdditiveLayerStore,
+        Grid.DRAW_STYLE_SEQUENCE: SequenceLayerStore,
+    }
+
+    @number("13.1")
+    def test_deferred(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 3)
+        grid[1][1].add(lighten)
+        grid.special()
+        # Nothing has been read yet.
+        self.assertFalse(grid[1][1].invert)
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 0, 1, 1), (115, 115, 115))
+        self.assertTrue(grid[1][1].invert)
+        grid.special()
+        grid.special()
+        self.assertEqual(grid[1][1].get_color((100, 100, 100), 0, 1, 1), (115, 115, 115))
+
+    @number("13.2")
+    def test_matches_eager(self):
+        # Painting, specials and reads interleaved: every square must match a store given each special straight away.
+        sequence = [black, lighten, invert, rainbow, red, sparkle]
+        for style, store_type in self.STORES.items():
+            grid = Grid(style, 4, 3)
+            eager = [[store_type() for y in range(3)] for x in range(4)]
+            for i in range(120):
+                x, y = (i * 7) % 4, (i * 5) % 3
+                layer = sequence[(i * 11) % len(sequence)]
+                if i % 3 == 2:
+                    grid[x][y].erase(layer)
+                    eager[x][y].erase(layer)
+                else:
+                    grid[x][y].add(layer)
+                    eager[x][y].add(layer)
+                for _ in range([0, 1, 0, 2][i % 4]):
+                    grid.special()
+                    for column in eager:
+                        for store in column:
+                            store.special()
+                if i % 10 == 9:
+                    for px in range(4):
+                        for py in range(3):
+                            self.assertEqual(
+                                grid[px][py].get_color((30, 60, 90), 1.5, px, py),
+                                eager[px][py].get_color((30, 60, 90), 1.5, px, py),
+                                style,
+                            )
+
+    @number("13.3")
+    def test_sequence_capped(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 2, 2)
+        grid[0][0].add(lighten)
+        grid[0][0].add(invert)
+        for _ in range(1000):
+            grid.special()
+        self.assertEqual(grid[0][0].layers(), [])
+        self.assertEqual(grid[1][1].layers(), [])
+
+    @number("13.4")
+    def test_catch_up_is_quiet(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            for style in Grid.DRAW_STYLE_OPTIONS:
+                grid = Grid(style, 6, 5, storage=storage)
+                grid[1][2].add(lighten)
+                grid[3][4].add(red)
+                grid.special()
+                self.assertTrue(grid.all_dirty)
+                grid.clear_dirty()
+                changes = grid.changes
+                # Reading squares which had not caught up yet neither dirties them again nor counts as a change.
+                for x in range(6):
+                    for y in range(5):
+                        grid[x][y].get_color((10, 20, 30), 0, x, y)
+                self.assertEqual(grid.dirty_cells(), set(), (storage, style))
+                self.assertEqual(grid.changes, changes, (storage, style))
+                self.assertIs(grid.buckets(), grid.buckets())
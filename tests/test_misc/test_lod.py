@@ -0,0 +1,88 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from lod import ColorPyramid
+from layers import black, lighten, invert, rainbow, red
+
+class TestLod(unittest.TestCase):
+
+    @number("25.1")
+    def test_levels(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 3)
+        grid[0][0].add(black)
+        pyramid = ColorPyramid(grid)
+        pyramid.update((200, 100, 40), 0)
+        self.assertEqual(pyramid.sizes, [(5, 3), (3, 2), (2, 1), (1, 1)])
+        self.assertEqual(pyramid.levels[0], grid.get_colors((200, 100, 40), 0))
+        self.assertEqual(pyramid.levels[1][0], (150, 75, 30))
+        # The odd column at the edge has only itself below it.
+        self.assertEqual(pyramid.levels[1][2 * 2 + 1], (200, 100, 40))
+        self.assertFalse(grid.all_dirty)
+        self.assertEqual(grid.dirty_cells(), set())
+
+    @number("25.2")
+    def test_incremental(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_ADD, 19, 13, storage=storage)
+            pyramid = ColorPyramid(grid)
+            pyramid.update((30, 60, 90), 0)
+            for i in range(40):
+                grid.brush_size = i % 3
+                grid.paint([black, lighten, invert, red][i % 4], (i * 7) % 19, (i * 5) % 13)
+                if i % 13 == 12:
+                    grid.special()
+                pyramid.update((30, 60, 90), 0)
+                fresh = ColorPyramid(grid)
+                fresh.rebuild((30, 60, 90), 0)
+                self.assertEqual(pyramid.levels, fresh.levels, storage)
+
+    @number("25.3")
+    def test_animated(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 8, 8)
+        grid[3][4].add(rainbow)
+        pyramid = ColorPyramid(grid)
+        pyramid.update((0, 0, 0), 0)
+        self.assertEqual(pyramid.animated, {(3, 4)})
+        self.assertEqual(pyramid.animated_counts[0], {(3, 4): 1})
+        self.assertEqual(pyramid.animated_counts[2], {(0, 1): 1})
+        pyramid.update((0, 0, 0), 5)
+        area, colors = pyramid.colors(0, (0, 8, 0, 8), 5)
+        self.assertEqual(colors[3 * 8 + 4], grid[3][4].get_color((0, 0, 0), 5, 3, 4))
+        # Higher up, the entry above it samples the square at its corner.
+        area, colors = pyramid.colors(1, (0, 8, 0, 8), 5)
+        self.assertEqual(colors[1 * 4 + 2], grid[2][4].get_color((0, 0, 0), 5, 2, 4))
+        grid[3][4].erase(rainbow)
+        pyramid.update((0, 0, 0), 6)
+        self.assertEqual(pyramid.animated, set())
+        self.assertEqual(pyramid.animated_counts, [{} for _ in pyramid.levels])
+
+    @number("25.4")
+    def test_sampling(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 64, 64)
+        pyramid = ColorPyramid(grid)
+        pyramid.update((0, 0, 0), 0)
+        self.assertEqual(pyramid.level_for(2, 2), 0)
+        self.assertEqual(pyramid.level_for(0.3, 0.5), 2)
+        self.assertEqual(pyramid.level_for(0.001, 0.001), 6)
+        area, colors = pyramid.colors(2, (5, 64, 0, 9), 0)
+        self.assertEqual(area, (1, 16, 0, 3))
+        self.assertEqual(len(colors), 15 * 3)
+
+    @number("25.5")
+    def test_animated_incremental(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 11, 9, storage=storage)
+            pyramid = ColorPyramid(grid)
+            pyramid.update((30, 60, 90), 0)
+            for i in range(30):
+                grid.brush_size = i % 2
+                grid.paint([rainbow, lighten, invert, red][i % 4], (i * 7) % 11, (i * 5) % 9)
+                pyramid.update((30, 60, 90), i * 0.7)
+                fresh = ColorPyramid(grid)
+                fresh.rebuild((30, 60, 90), i * 0.7)
+                self.assertEqual(pyramid.animated, fresh.animated, storage)
+                self.assertEqual(pyramid.animated_counts, fresh.animated_counts, storage)
+                # The kept levels differ where animated squares were worked out at other times, what is shown does not.
+                for level in range(len(pyramid.levels)):
+                    self.assertEqual(pyramid.colors(level, (0, 11, 0, 9), i * 0.7 + 3), fresh.colors(level, (0, 11, 0, 9), i * 0.7 + 3), storage)
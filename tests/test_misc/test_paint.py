@@ -0,0 +1,82 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import black, lighten, darken, invert, rainbow, red, sparkle
+
+class TestPaint(unittest.TestCase):
+
+    def footprint(self, grid, px, py):
+        return [
+            (x, y) for x in range(grid.x) for y in range(grid.y)
+            if abs(px - x) + abs(py - y) <= grid.brush_size
+        ]
+
+    @number("19.1")
+    def test_footprint(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            for style in Grid.DRAW_STYLE_OPTIONS:
+                for brush_size in [0, 2, 5]:
+                    for px, py in [(0, 0), (3, 2), (6, 4), (-2, 1), (8, 6), (1, 7)]:
+                        grid = Grid(style, 7, 5, storage=storage)
+                        grid.brush_size = brush_size
+                        grid.clear_dirty()
+                        expected = self.footprint(grid, px, py)
+                        self.assertEqual(grid.paint(lighten, px, py), expected, (storage, style, px, py))
+                        self.assertEqual(grid.dirty_cells(), set(expected))
+
+    @number("19.2")
+    def test_unchanged_not_returned(self):
+        for storage in Grid.STORAGE_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 6, 6, storage=storage)
+            grid.paint(red, 2, 2)
+            painted = set(self.footprint(grid, 2, 2))
+            expected = [cell for cell in self.footprint(grid, 3, 2) if cell not in painted]
+            self.assertEqual(grid.paint(red, 3, 2), expected, storage)
+            grid.brush_size = 0
+            self.assertEqual(grid.paint(red, 2, 2), [])
+            self.assertEqual(grid.paint(lighten, 2, 2), [(2, 2)])
+
+    @number("19.3")
+    def test_bitplanes_match_objects(self):
+        sequence = [black, lighten, invert, rainbow, red, sparkle, darken]
+        bitplanes = Grid(Grid.DRAW_STYLE_SEQUENCE, 9, 6, storage=Grid.STORAGE_BITPLANES)
+        objects = Grid(Grid.DRAW_STYLE_SEQUENCE, 9, 6)
+        for i in range(200):
+            layer = sequence[(i * 3) % len(sequence)]
+            px, py = (i * 5) % 11 - 1, (i * 7) % 8 - 1
+            for grid in [bitplanes, objects]:
+                grid.brush_size = i % 4
+                if i % 5 == 4:
+                    grid[(i * 2) % 9][i % 6].erase(layer)
+                else:
+                    grid.paint(layer, px, py)
+                if i % 13 == 12:
+                    grid.special()
+                if i % 17 == 16:
+                    grid[i % 9][(i * 3) % 6].special()
+            if i % 40 == 39:
+                for x in range(9):
+                    for y in range(6):
+                        self.assertEqual(bitplanes[x][y].layers(), objects[x][y].layers())
+                        self.assertEqual(
+                            bitplanes[x][y].get_color((30, 60, 90), 1.5, x, y),
+                            objects[x][y].get_color((30, 60, 90), 1.5, x, y),
+                        )
+
+    @number("19.4")
+    def test_groups(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 4, 4, storage=Grid.STORAGE_BITPLANES)
+        grid.brush_size = 1
+        grid.paint(red, 0, 0)
+        grid.paint(lighten, 1, 0)
+        grid.special()
+        groups = grid.grid.groups()
+        self.assertEqual(len(groups), len(set(mask for mask, columns in groups)))
+        self.assertEqual(sum(bin(bits).count("1") for mask, columns in groups for x, bits in columns), 16)
+        for mask, columns in groups:
+            for x, bits in columns:
+                for y in range(4):
+                    if bits >> y & 1:
+                        layers = grid[x][y].layers()
+                        self.assertEqual(mask, sum(1 << layer.index for layer in layers))
@@ -0,0 +1,112 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from layers import black, lighten, darken, invert, rainbow, red, sparkle
+
+class TestQuadtree(unittest.TestCase):
+
+    @number("23.1")
+    def test_clone(self):
+        for store in [SetLayerStore(), AdditiveLayerStore(), SequenceLayerStore()]:
+            for layer in [lighten, black, lighten, darken]:
+                store.add(layer)
+            store.special()
+            copy = store.clone()
+            self.assertEqual(copy.content_key(), store.content_key())
+            self.assertEqual(copy.get_color((10, 20, 30), 0, 0, 0), store.get_color((10, 20, 30), 0, 0, 0))
+            copy.add(invert)
+            copy.erase(lighten)
+            copy.special()
+            self.assertNotEqual(copy.content_key(), store.content_key())
+            self.assertEqual(store.layers(), store.clone().layers())
+        # Special on a set store cannot be told apart by layers() alone.
+        a, b = SetLayerStore(), SetLayerStore()
+        a.add(invert)
+        b.special()
+        self.assertEqual(a.layers(), b.layers())
+        self.assertNotEqual(a.content_key(), b.content_key())
+
+    @number("23.2")
+    def test_regions(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 64, 64, storage=Grid.STORAGE_QUADTREE)
+        self.assertEqual(len(grid.grid.leaves()), 1)
+        grid.brush_size = 20
+        changed = grid.paint(lighten, 31, 31)
+        self.assertEqual(len(changed), 841)
+        self.assertEqual(changed, sorted(changed))
+        # Only the edge of the brush is split finely.
+        leaves = len(grid.grid.leaves())
+        self.assertLess(leaves, 841 / 2)
+        # The same brush again splits nothing new.
+        grid.paint(lighten, 31, 31)
+        self.assertEqual(len(grid.grid.leaves()), leaves)
+        self.assertEqual(grid[31][31].layers(), [lighten, lighten])
+        self.assertEqual(grid[0][0].layers(), [])
+        # Once every square holds the same layers again the grid is one region.
+        for x in range(64):
+            for y in range(64):
+                while grid[x][y].erase(lighten):
+                    pass
+        grid.grid.compact()
+        self.assertEqual(len(grid.grid.leaves()), 1)
+
+    @number("23.3")
+    def test_shared_store(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 8, 8, storage=Grid.STORAGE_QUADTREE)
+        grid.brush_size = 0
+        grid.paint(red, 0, 0)
+        # The other squares still share the first store, changing one leaves the rest alone.
+        grid[7][7].add(lighten)
+        self.assertEqual(grid[7][7].layers(), [lighten])
+        self.assertEqual(grid[0][0].layers(), [red])
+        self.assertEqual(grid[7][6].layers(), [])
+        self.assertEqual(grid[3][3].layers(), [])
+        grid.special()
+        self.assertEqual(grid[0][0].layers(), [])
+        self.assertEqual(grid[7][7].layers(), [])
+
+    @number("23.4")
+    def test_matches_objects(self):
+        sequence = [black, lighten, invert, rainbow, red, sparkle, darken]
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            tree = Grid(style, 13, 11, storage=Grid.STORAGE_QUADTREE)
+            objects = Grid(style, 13, 11)
+            for i in range(150):
+                for grid in [tree, objects]:
+                    grid.brush_size = i % 5
+                    grid.paint(sequence[i % len(sequence)], (i * 7) % 13, (i * 3) % 11)
+                    if i % 9 == 8:
+                        grid.special()
+                    if i % 10 == 9:
+                        grid[(i * 5) % 13][i % 11].special()
+                    if i % 4 == 3:
+                        grid[i % 13][(i * 2) % 11].erase(lighten)
+                if i % 15 == 14:
+                    for timestamp in [0, 2.5]:
+                        self.assertEqual(
+                            tree.get_colors((30, 60, 90), timestamp),
+                            objects.get_colors((30, 60, 90), timestamp),
+                            style,
+                        )
+                    for x in range(13):
+                        for y in range(11):
+                            self.assertEqual(tree[x][y].layers(), objects[x][y].layers(), style)
+
+    @number("23.5")
+    def test_dirty_regions(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 64, 64, storage=Grid.STORAGE_QUADTREE)
+        grid.clear_dirty()
+        grid.brush_size = 200
+        grid.paint(red, 10, 10)
+        # One rectangle for the whole grid rather than a dirty entry per square.
+        self.assertEqual(grid.dirty, set())
+        self.assertEqual(grid.dirty_areas, [(0, 64, 0, 64)])
+        self.assertEqual(len(grid.dirty_cells()), 64 * 64)
+        buckets = grid.buckets()
+        self.assertEqual(buckets[0][1], [(0, 64, 0, 64)])
+        self.assertEqual(grid.get_colors((0, 0, 0), 0), [(255, 0, 0)] * (64 * 64))
+        grid.clear_dirty()
+        grid[3][5].add(lighten)
+        self.assertEqual(grid.dirty_cells(), {(3, 5)})
@@ -0,0 +1,76 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import black, lighten, rainbow
+from renderer import GridRenderer
+from viewport import Viewport
+
+class CountingShape:
+    def __init__(self, points, colors):
+        self.points = points
+        self.colors = colors
+
+    def draw(self):
+        pass
+
+class CountingRenderer(GridRenderer):
+    """Renderer keeping the shapes it makes instead of sending them to the GPU."""
+
+    def __init__(self, *args):
+        GridRenderer.__init__(self, *args)
+        self.made = []
+
+    def make_shape(self, points, colors):
+        self.made.append(CountingShape(points, colors))
+        return self.made[-1]
+
+class TestRenderer(unittest.TestCase):
+
+    @number("1.6")
+    def test_frame(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 3)
+        grid[1][2].add(black)
+        renderer = GridRenderer(4, 3, 10, 20)
+        key, points, colors = renderer.frame(grid, (100, 100, 100), 0)
+        self.assertEqual(len(points), 4 * 12)
+        self.assertEqual(points[:4], [(0, 20), (10, 20), (10, 0), (0, 0)])
+        # Square (1, 2) is the 6th in order of x then y.
+        self.assertEqual(points[4 * 5:4 * 6], [(10, 60), (20, 60), (20, 40), (10, 40)])
+        self.assertEqual(colors, [grid[x][y].get_color((100, 100, 100), 0, x, y) for x in range(4) for y in range(3)])
+        self.assertEqual(colors[5], (0, 0, 0))
+        # Zoomed in, only the squares in view.
+        view = Viewport(40, 60, 4, 3)
+        view.zoom_at(2, 0, 0)
+        key, points, colors = renderer.frame(grid, (100, 100, 100), 0, view)
+        self.assertEqual(view.visible(), (0, 2, 0, 2))
+        self.assertEqual(len(points), 4 * 4)
+        self.assertEqual(points[4:8], [(0, 80), (20, 80), (20, 40), (0, 40)])
+        # Squares smaller than a pixel, entries of the colour pyramid.
+        big = Grid(Grid.DRAW_STYLE_SET, 64, 64)
+        key, points, colors = renderer.frame(big, (100, 100, 100), 0, Viewport(16, 16, 64, 64))
+        self.assertEqual(len(colors), 16 * 16)
+        self.assertEqual(points[:4], [(0, 1), (1, 1), (1, 0), (0, 0)])
+
+    @number("1.7")
+    def test_shape_kept(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 5, 5)
+        renderer = CountingRenderer(5, 5, 10, 10)
+        renderer.draw(grid, (100, 100, 100), 0)
+        renderer.draw(grid, (100, 100, 100), 1)
+        self.assertEqual(len(renderer.made), 1)
+        self.assertEqual(renderer.made[0].colors[:4], [(100, 100, 100)] * 4)
+        grid[2][2].add(lighten)
+        renderer.draw(grid, (100, 100, 100), 2)
+        self.assertEqual(len(renderer.made), 2)
+        self.assertEqual(renderer.made[1].colors[4 * 12], (140, 140, 140))
+        view = Viewport(50, 50, 5, 5)
+        view.zoom_at(2, 0, 0)
+        renderer.draw(grid, (100, 100, 100), 2, view)
+        self.assertEqual(len(renderer.made), 3)
+        # Animated squares make a new shape when their colour moves on.
+        grid[0][0].add(rainbow)
+        renderer.draw(grid, (100, 100, 100), 2, view)
+        renderer.draw(grid, (100, 100, 100), 7, view)
+        self.assertEqual(len(renderer.made), 5)
+        self.assertNotEqual(renderer.made[3].colors[0], renderer.made[4].colors[0])
@@ -0,0 +1,62 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layer_store import LayerStore
+from layers import black, lighten, invert, rainbow, red, sparkle
+
+class TestSparse(unittest.TestCase):
+
+    @number("21.1")
+    def test_lazy(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 1024, 1024, storage=Grid.STORAGE_SPARSE)
+        self.assertEqual(grid.grid.stores, {})
+        cell = grid[100][200]
+        self.assertNotIsInstance(cell, LayerStore)
+        self.assertEqual(cell.get_color((1, 2, 3), 0, 100, 200), (1, 2, 3))
+        self.assertFalse(cell.erase(lighten))
+        self.assertEqual(grid.grid.stores, {})
+        self.assertTrue(cell.add(lighten))
+        self.assertTrue(cell.add(lighten))
+        self.assertIsInstance(grid[100][200], LayerStore)
+        self.assertEqual(cell.layers(), [lighten, lighten])
+        self.assertEqual(list(grid.grid.stores), [(100, 200)])
+
+    @number("21.2")
+    def test_matches_objects(self):
+        sequence = [black, lighten, invert, rainbow, red, sparkle]
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            sparse = Grid(style, 12, 10, storage=Grid.STORAGE_SPARSE)
+            objects = Grid(style, 12, 10)
+            for i in range(80):
+                for grid in [sparse, objects]:
+                    grid.brush_size = i % 2
+                    grid.paint(sequence[i % len(sequence)], (i * 7) % 6, (i * 3) % 5)
+                    if i % 9 == 8:
+                        grid.special()
+                    if i % 10 == 9:
+                        grid[(i * 5) % 6][i % 5].special()
+                    if i % 4 == 3:
+                        grid[i % 6][(i * 2) % 5].erase(lighten)
+                if i % 20 == 19:
+                    for x in range(12):
+                        for y in range(10):
+                            self.assertEqual(sparse[x][y].layers(), objects[x][y].layers(), style)
+                            self.assertEqual(
+                                sparse[x][y].get_color((30, 60, 90), 2, x, y),
+                                objects[x][y].get_color((30, 60, 90), 2, x, y),
+                                style,
+                            )
+            # Only the squares which were ever changed have a store, the brush stays near the corner.
+            self.assertLessEqual(len(sparse.grid.stores), 7 * 6)
+
+    @number("21.3")
+    def test_special_on_empty(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 3, storage=Grid.STORAGE_SPARSE)
+        grid.special()
+        self.assertEqual(grid[0][0].get_color((10, 20, 30), 0, 0, 0), (245, 235, 225))
+        grid[1][1].add(lighten)
+        self.assertEqual(grid[1][1].get_color((10, 20, 30), 0, 1, 1), (205, 195, 185))
+        grid.special()
+        self.assertEqual(grid[0][0].get_color((10, 20, 30), 0, 0, 0), (10, 20, 30))
+        self.assertEqual(grid[1][1].get_color((10, 20, 30), 0, 1, 1), (50, 60, 70))
@@ -0,0 +1,87 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from tiled_grid import TiledGrid
+from layer_store import LayerStore
+from layers import black, lighten, invert, rainbow, red, sparkle
+
+class TestTiled(unittest.TestCase):
+
+    @number("22.1")
+    def test_tiles_on_demand(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 200, 150, storage=Grid.STORAGE_TILED)
+        self.assertEqual(grid.grid.tiles, {})
+        self.assertNotIsInstance(grid[199][149], LayerStore)
+        grid.brush_size = 1
+        grid.paint(lighten, 64, 10)
+        # The brush crosses from tile (0, 0) into tile (1, 0).
+        self.assertEqual(sorted(grid.grid.tiles), [(0, 0), (1, 0)])
+        self.assertIsInstance(grid[0][0], LayerStore)
+        self.assertNotIn((3, 2), grid.grid.tiles)
+        grid[199][149].add(black)
+        edge = grid.grid.tiles[(3, 2)]
+        self.assertEqual((edge.x0, edge.y0, edge.width, edge.height), (192, 128, 8, 22))
+        self.assertEqual(grid[199][149].layers(), [black])
+
+    @number("22.2")
+    def test_dirty_tiles(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 130, 130, storage=Grid.STORAGE_TILED)
+        grid[1][1].add(red)
+        grid[129][0].add(red)
+        self.assertEqual(sorted(grid.grid.dirty_tiles()), [(0, 0), (2, 0)])
+        grid.clear_dirty()
+        self.assertEqual(grid.grid.dirty_tiles(), [])
+        grid[129][1].add(lighten)
+        self.assertEqual(grid.grid.dirty_tiles(), [(2, 0)])
+        self.assertEqual(grid.dirty_cells(), {(129, 1)})
+        grid.clear_dirty()
+        grid.special()
+        self.assertEqual(sorted(grid.grid.dirty_tiles()), [(0, 0), (2, 0)])
+
+    @number("22.3")
+    def test_groups_reused(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 100, 10, storage=Grid.STORAGE_TILED)
+        grid[5][5].add(lighten)
+        grid[70][5].add(lighten)
+        grid.get_colors((0, 0, 0), 0)
+        left, right = grid.grid.tiles[(0, 0)], grid.grid.tiles[(1, 0)]
+        left_groups, right_groups = left.groups, right.groups
+        grid[70][6].add(invert)
+        colors = grid.get_colors((0, 0, 0), 0)
+        self.assertIs(left.groups, left_groups)
+        self.assertIsNot(right.groups, right_groups)
+        self.assertEqual(colors[70 * 10 + 6], (255, 255, 255))
+        grid.special()
+        colors = grid.get_colors((0, 0, 0), 0)
+        self.assertIsNot(left.groups, left_groups)
+        self.assertEqual(colors[5 * 10 + 5], (0, 0, 0))
+
+    @number("22.4")
+    def test_matches_objects(self):
+        sequence = [black, lighten, invert, rainbow, red, sparkle]
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            tiled = Grid(style, 13, 11, storage=Grid.STORAGE_TILED)
+            tiled.grid = TiledGrid(tiled, style, 13, 11, tile_size=4)
+            objects = Grid(style, 13, 11)
+            for i in range(120):
+                for grid in [tiled, objects]:
+                    grid.brush_size = i % 3
+                    grid.paint(sequence[i % len(sequence)], (i * 7) % 9, (i * 3) % 8)
+                    if i % 9 == 8:
+                        grid.special()
+                    if i % 10 == 9:
+                        grid[(i * 5) % 13][i % 11].special()
+                    if i % 4 == 3:
+                        grid[i % 13][(i * 2) % 11].erase(lighten)
+                if i % 15 == 14:
+                    for timestamp in [0, 2.5]:
+                        self.assertEqual(
+                            tiled.get_colors((30, 60, 90), timestamp),
+                            objects.get_colors((30, 60, 90), timestamp),
+                            style,
+                        )
+            for x in range(13):
+                for y in range(11):
+                    self.assertEqual(tiled[x][y].layers(), objects[x][y].layers(), style)
+            self.assertLess(len(tiled.grid.tiles), 4 * 3)
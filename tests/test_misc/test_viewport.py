@@ -0,0 +1,73 @@
+import unittest
+from ed_utils.decorators import number
+
+from grid import Grid
+from layers import red, lighten, rainbow
+from main import MyWindow
+from viewport import Viewport
+
+class TestViewport(unittest.TestCase):
+
+    @number("24.1")
+    def test_whole_grid(self):
+        view = Viewport(700, 700, 32, 32)
+        self.assertEqual(view.square_size(), (700 / 32, 700 / 32))
+        self.assertTrue(view.shows_everything())
+        self.assertEqual(view.to_grid(0, 0), (0, 0))
+        self.assertEqual(view.to_grid(699, 350), (31, 16))
+        # Can't zoom out or pan past the whole grid.
+        view.zoom_at(0.5, 100, 100)
+        view.pan(-300, 300)
+        self.assertEqual((view.zoom, view.left, view.bottom), (1, 0, 0))
+
+    @number("24.2")
+    def test_zoom_pan(self):
+        view = Viewport(640, 480, 64, 48)
+        before = view.to_grid(320, 240)
+        view.zoom_at(4, 320, 240)
+        self.assertEqual(view.to_grid(320, 240), before)
+        self.assertEqual(view.visible(), (24, 40, 18, 30))
+        self.assertFalse(view.shows_everything())
+        view.pan(80, 0)
+        self.assertEqual(view.visible(), (26, 42, 18, 30))
+        view.pan(-10000, 10000)
+        self.assertEqual(view.visible(), (0, 16, 36, 48))
+        left, bottom = view.to_screen(0, 36)
+        self.assertEqual((left, bottom), (0, 0))
+        # Half squares at the edges are visible too.
+        view.pan(5, 0)
+        self.assertEqual(view.visible()[:2], (0, 17))
+
+    @number("24.3")
+    def test_area_colors(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 10, 8)
+        grid.paint(red, 4, 4)
+        grid.paint(rainbow, 6, 2)
+        everything = grid.get_colors((0, 0, 0), 3)
+        area = (3, 7, 1, 6)
+        expected = [everything[x * 8 + y] for x in range(3, 7) for y in range(1, 6)]
+        self.assertEqual(grid.get_colors((0, 0, 0), 3, area), expected)
+        self.assertEqual(grid.get_colors((0, 0, 0), 3, (0, 10, 0, 8)), everything)
+
+    @number("24.4")
+    def test_try_draw(self):
+        class FakeWindow:
+            GRID_SIZE_X = 20
+            GRID_SIZE_Y = 20
+        FakeWindow.on_init = MyWindow.on_init
+        FakeWindow.on_paint = MyWindow.on_paint
+        FakeWindow.try_draw = MyWindow.try_draw
+        window = FakeWindow()
+        window.on_init()
+        window.grid = Grid(Grid.DRAW_STYLE_SET, 20, 20)
+        window.grid.brush_size = 0
+        window.viewport = Viewport(400, 400, 20, 20)
+        window.selected_layer_index = lighten.index
+        window.prev_pos = None
+        window.prev_drawn = None
+        window.viewport.zoom_at(2, 0, 0)
+        window.viewport.pan(200, 200)
+        # Screen (10, 10) is now in square (5, 5) instead of (0, 0).
+        window.try_draw(10, 10)
+        self.assertEqual(window.grid[5][5].layers(), [lighten])
+        self.assertEqual(window.grid[0][0].layers(), [])
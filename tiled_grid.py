@@ -0,0 +1,215 @@
+"""
+Tiled grid backend.
+
+Splits the grid into square tiles of TILE_SIZE x TILE_SIZE squares (smaller
+along the right and bottom edges). A tile gets its LayerStores the first time
+one of its squares is changed. Until then, like in a sparse grid, its squares
+read from the grid's shared empty store. Each tile keeps its own metadata:
+whether it changed since it was last drawn, how many changes it has seen, and
+its squares grouped by state, so drawing the grid only regroups the tiles
+which changed.
+
+grid[x][y] works as with the other backends, see sparse_grid.
+"""
+
+from __future__ import annotations
+from data_structures.referential_array import ArrayR
+from layer_store import LayerStore
+from sparse_grid import SparseGrid
+
+class Tile:
+    """
+    The stores of one tile, in an ArrayR of columns as in Grid.make_grid.
+    The stores are attached to the tile instead of the grid, so the tile hears about their changes before the grid does.
+    """
+
+    def __init__(self, tiled: TiledGrid, x0: int, y0: int, width: int, height: int) -> None:
+        """
+        Args:
+        -tiled: the grid the tile belongs to
+        -x0, y0: position of the top left square of the tile in the grid
+        -width, height: dimensions of the tile
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(width*height), a store is made for every square
+        """
+        self.tiled = tiled
+        self.x0 = x0
+        self.y0 = y0
+        self.width = width
+        self.height = height
+        self.dirty = True #changed since clear_dirty, a new tile has not been drawn
+        self.version = 0 #number of changes to the squares of the tile
+        self.groups = None #state_key -> (store, flat indices in the grid), see TiledGrid.tile_groups
+        self.groups_key = None #(version, grid special epoch) the groups are valid for
+        self.stores = ArrayR(width)
+        for x in range(width):
+            column = ArrayR(height)
+            self.stores[x] = column
+            for y in range(height):
+                store = tiled.store_type()
+                store.attach(self, x0 + x, y0 + y)
+                store.special_epoch = 0 #replaces an empty square, which was given every special so far
+                column[y] = store
+
+    @property
+    def special_epoch(self) -> int:
+        """
+        The owning grid's special epoch, read by the stores of the tile when catching up.
+        """
+        return self.tiled.grid.special_epoch
+
+    def mark_dirty(self, x, y) -> None:
+        """
+        Record that the square at (x, y) of the grid changed, and pass it on to the grid.
+        Complexity:
+        - Always O(Grid.mark_dirty)
+        """
+        self.dirty = True
+        self.version += 1
+        self.tiled.grid.mark_dirty(x, y)
+
+class TiledGrid(SparseGrid):
+    """
+    The squares of a grid in tiles, by tile position. Tiles are made on the first change of one of their squares.
+    """
+
+    TILE_SIZE = 64
+
+    def __init__(self, grid, draw_style, x: int, y: int, tile_size: int = TILE_SIZE) -> None:
+        """
+        Args:
+        -grid: the owning Grid
+        -draw_style: one of Grid.DRAW_STYLE_OPTIONS
+        -x, y: dimensions of the grid
+        -tile_size: width and height of a tile
+        Raises: Exception if the draw style is unknown
+        Returns: None
+        Complexity:
+        - Always O(1), no tile is made yet
+        """
+        SparseGrid.__init__(self, grid, draw_style, x, y)
+        self.tile_size = tile_size
+        self.tiles = {} #(tile x, tile y) -> Tile
+
+    def tile_of(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Position of the tile the square at (x, y) is in.
+        """
+        return (x // self.tile_size, y // self.tile_size)
+
+    def store_at(self, x: int, y: int):
+        """
+        The store of the square, None if its tile has not been made.
+        Complexity:
+        - Always O(1)
+        """
+        tile = self.tiles.get(self.tile_of(x, y))
+        if tile is None:
+            return None
+        return tile.stores[x - tile.x0][y - tile.y0]
+
+    def materialize(self, x: int, y: int) -> LayerStore:
+        """
+        The store of the square, making its tile first if needed.
+        Complexity:
+        - Worst: O(TILE_SIZE^2), when the tile is made
+        - Best: O(1)
+        """
+        key = self.tile_of(x, y)
+        tile = self.tiles.get(key)
+        if tile is None:
+            x0 = key[0] * self.tile_size
+            y0 = key[1] * self.tile_size
+            tile = Tile(self, x0, y0, min(self.tile_size, self.x - x0), min(self.tile_size, self.y - y0))
+            self.tiles[key] = tile
+        return tile.stores[x - tile.x0][y - tile.y0]
+
+    def dirty_tiles(self):
+        """
+        The tiles changed since the last clear_dirty. Every tile counts as changed after a grid special.
+        Args: None
+        Raises: None
+        Returns: list of (tile x, tile y), only tiles which have been made
+        Complexity:
+        - Always O(T), T being the number of tiles made
+        """
+        if self.grid.all_dirty:
+            return list(self.tiles)
+        return [key for key, tile in self.tiles.items() if tile.dirty]
+
+    def clear_dirty(self) -> None:
+        """
+        Forget which tiles changed, see Grid.clear_dirty.
+        Complexity:
+        - Always O(T), T being the number of tiles made
+        """
+        for tile in self.tiles.values():
+            tile.dirty = False
+
+    def tile_groups(self, tile: Tile) -> dict:
+        """
+        The squares of the tile grouped by store state, kept on the tile until it changes or the grid is specialed.
+        Args:
+        -tile: a tile of this grid
+        Raises: None
+        Returns: dict of state_key -> (store with the state, list of flat indices x*self.y+y)
+        Complexity:
+        - Worst: O(TILE_SIZE^2*LayerStore.state_key), when the tile changed since its groups were made
+        - Best: O(1)
+        """
+        key = (tile.version, self.grid.special_epoch)
+        if tile.groups_key == key:
+            return tile.groups
+        groups = {}
+        for x in range(tile.width):
+            column = tile.stores[x]
+            for y in range(tile.height):
+                store = column[y]
+                state = store.state_key()
+                group = groups.get(state)
+                if group is None:
+                    group = groups[state] = (store, [])
+                group[1].append((tile.x0 + x) * self.y + tile.y0 + y)
+        tile.groups = groups
+        tile.groups_key = key #stores catching up with specials in state_key do not report it, the special epoch covers them
+        return groups
+
+    def buckets(self):
+        """
+        The squares grouped by store state, for Grid.get_colors, putting together the groups of each tile.
+        Squares of tiles which have not been made are one more group.
+        Args: None
+        Raises: None
+        Returns: list of (compiled program, list of flat indices) pairs
+        Complexity:
+        - Always O(x*y+D*TILE_SIZE^2*LayerStore.state_key+S*LayerStore.compiled_program),
+        D being the number of tiles changed since they were last grouped and S the number of distinct states
+        """
+        groups = {}
+        empty = self.empty_store()
+        empty_cells = []
+        for tx in range((self.x + self.tile_size - 1) // self.tile_size):
+            for ty in range((self.y + self.tile_size - 1) // self.tile_size):
+                tile = self.tiles.get((tx, ty))
+                if tile is None:
+                    x0 = tx * self.tile_size
+                    y0 = ty * self.tile_size
+                    for x in range(x0, min(x0 + self.tile_size, self.x)):
+                        empty_cells.extend(range(x * self.y + y0, x * self.y + min(y0 + self.tile_size, self.y)))
+                    continue
+                for state, (store, cells) in self.tile_groups(tile).items():
+                    group = groups.get(state)
+                    if group is None:
+                        groups[state] = (store, list(cells))
+                    else:
+                        group[1].extend(cells)
+        if len(empty_cells) > 0:
+            state = empty.state_key()
+            group = groups.get(state)
+            if group is None:
+                groups[state] = (empty, empty_cells)
+            else:
+                group[1].extend(empty_cells)
+        return [(store.compiled_program(), cells) for store, cells in groups.values()]
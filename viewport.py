@@ -0,0 +1,138 @@
+"""
+Viewport of the draw panel onto the grid.
+
+At zoom 1 the whole grid fits the draw panel, as it always did. Zooming in
+makes the squares bigger, and the view can then be panned around the grid.
+Only the squares inside the view need to be evaluated and drawn, so the cost
+of a frame follows the size of the panel rather than the size of the grid.
+"""
+
+from __future__ import annotations
+import math
+
+class Viewport:
+
+    MIN_ZOOM = 1 #the whole grid fits the panel
+    MAX_ZOOM = 64
+
+    def __init__(self, panel_width, panel_height, grid_x, grid_y) -> None:
+        """
+        Args:
+        -panel_width, panel_height: size of the draw panel on the screen, which starts at (0, 0)
+        -grid_x, grid_y: dimensions of the grid
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        self.panel_width = panel_width
+        self.panel_height = panel_height
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.zoom = 1
+        self.left = 0 #grid coordinates of the bottom left corner of the panel
+        self.bottom = 0
+
+    def square_size(self):
+        """
+        Size of a grid square on the screen.
+        Args: None
+        Raises: None
+        Returns: (width, height)
+        Complexity:
+        - Always O(1)
+        """
+        return (self.panel_width / self.grid_x * self.zoom, self.panel_height / self.grid_y * self.zoom)
+
+    def to_grid(self, sx, sy):
+        """
+        The grid square under a point of the screen.
+        Args:
+        -sx, sy: screen coordinates
+        Raises: None
+        Returns: (x, y), which can be outside the grid
+        Complexity:
+        - Always O(1)
+        """
+        width, height = self.square_size()
+        return (math.floor(self.left + sx / width), math.floor(self.bottom + sy / height))
+
+    def to_screen(self, x, y):
+        """
+        Screen coordinates of the bottom left corner of a grid square.
+        Args:
+        -x, y: grid coordinates
+        Raises: None
+        Returns: (sx, sy)
+        Complexity:
+        - Always O(1)
+        """
+        width, height = self.square_size()
+        return ((x - self.left) * width, (y - self.bottom) * height)
+
+    def visible(self):
+        """
+        The squares with some part inside the panel.
+        Args: None
+        Raises: None
+        Returns: (x0, x1, y0, y1), squares x0 <= x < x1 and y0 <= y < y1
+        Complexity:
+        - Always O(1)
+        """
+        width, height = self.square_size()
+        x0 = max(0, math.floor(self.left))
+        y0 = max(0, math.floor(self.bottom))
+        x1 = min(self.grid_x, math.ceil(self.left + self.panel_width / width))
+        y1 = min(self.grid_y, math.ceil(self.bottom + self.panel_height / height))
+        return (x0, x1, y0, y1)
+
+    def shows_everything(self) -> bool:
+        """
+        Whether every square of the grid is inside the panel.
+        """
+        return self.visible() == (0, self.grid_x, 0, self.grid_y)
+
+    def clamp(self) -> None:
+        """
+        Keep the view inside the grid.
+        Complexity:
+        - Always O(1)
+        """
+        self.left = min(max(self.left, 0), self.grid_x - self.grid_x / self.zoom)
+        self.bottom = min(max(self.bottom, 0), self.grid_y - self.grid_y / self.zoom)
+
+    def zoom_at(self, factor, sx, sy) -> None:
+        """
+        Multiply the zoom by factor, keeping the point of the grid under (sx, sy) where it is on the screen.
+        The zoom stays between MIN_ZOOM and MAX_ZOOM.
+        Args:
+        -factor: how much to zoom in by, below 1 zooms out
+        -sx, sy: screen coordinates of the point to zoom around
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        width, height = self.square_size()
+        gx = self.left + sx / width
+        gy = self.bottom + sy / height
+        self.zoom = min(max(self.zoom * factor, self.MIN_ZOOM), self.MAX_ZOOM)
+        width, height = self.square_size()
+        self.left = gx - sx / width
+        self.bottom = gy - sy / height
+        self.clamp()
+
+    def pan(self, dx, dy) -> None:
+        """
+        Move the view by (dx, dy) screen pixels, as far as the edges of the grid allow.
+        Args:
+        -dx, dy: distance to move, positive moves the view right and up
+        Raises: None
+        Returns: None
+        Complexity:
+        - Always O(1)
+        """
+        width, height = self.square_size()
+        self.left += dx / width
+        self.bottom += dy / height
+        self.clamp()